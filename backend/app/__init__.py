@@ -1,3 +1,4 @@
+import imaging
 from flask import Flask
 from config import Config
 from flask_sqlalchemy import SQLAlchemy
@@ -13,5 +14,17 @@ app.config.from_object(Config)
 db = SQLAlchemy(app)
 migrate = Migrate(app,db)
 moment = Moment(app)
-CORS(app)
-from app import routes,models
\ No newline at end of file
+CORS(app, expose_headers=['X-Trace-Id', 'Retry-After', 'Server-Timing', 'X-Profile-Id', 'ETag'])
+from app import tracing, profiling, serialization
+tracing.init_app(app)
+profiling.init_app(app)
+serialization.init_app(app)
+from app import routes,models,commands
+
+# Background threads belong to the serving process, not to pool workers
+if app.config['RETENTION_ENABLED'] and not imaging.in_pool_worker():
+    from app.retention import start_background
+    start_background(app)
+if app.config['CAMERA_PROBE_ENABLED'] and not imaging.in_pool_worker():
+    from app import camera_health
+    camera_health.start_background(app)
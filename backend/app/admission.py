@@ -0,0 +1,237 @@
+import functools
+import math
+import threading
+import time
+from flask import request, jsonify
+from app import app, db
+from app.models import Cameras
+from app.metrics import metrics
+from app import tracing
+from config import Config
+
+
+class Rejected(Exception):
+    """Work was not admitted; `status` is 429 (rate limit) or 503 (overload)"""
+
+    def __init__(self, message, status, retry_after):
+        super().__init__(message)
+        self.status = status
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """
+    Bounded in-flight work with a bounded wait queue. Up to `max_in_flight`
+    units run at once; up to `max_queue` requests wait, each at most
+    `queue_timeout` seconds. Anything beyond that is rejected immediately so
+    accepted requests keep a bounded latency under overload.
+    """
+
+    def __init__(self, max_in_flight, max_queue, queue_timeout, name='admission'):
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.name = name
+        self.in_flight = 0
+        self.waiting = 0
+        # Smoothed time a unit of work holds its slot, for Retry-After estimates
+        self.service_time = 1.0
+        self._condition = threading.Condition()
+        metrics.gauge(f'{name}.in_flight', lambda: self.in_flight)
+        metrics.gauge(f'{name}.queue_depth', lambda: self.waiting)
+
+    def retry_after(self):
+        """Seconds until the current queue should have drained, at least 1"""
+        backlog = self.waiting + 1
+        return max(1, math.ceil(backlog * self.service_time / self.max_in_flight))
+
+    def acquire(self, cost=1):
+        cost = max(1, min(cost, self.max_in_flight))
+        with self._condition:
+            if self.in_flight + cost <= self.max_in_flight and not self.waiting:
+                self.in_flight += cost
+                metrics.inc(f'{self.name}.admitted')
+                metrics.observe(f'{self.name}.wait_ms', 0)
+                return cost
+
+            if self.waiting >= self.max_queue:
+                metrics.inc(f'{self.name}.rejected.queue_full')
+                raise Rejected("Server is busy, try again later", 503, self.retry_after())
+
+            started = time.monotonic()
+            deadline = started + self.queue_timeout
+            self.waiting += 1
+            try:
+                while self.in_flight + cost > self.max_in_flight:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        metrics.inc(f'{self.name}.rejected.timeout')
+                        raise Rejected("Timed out waiting for capacity", 503, self.retry_after())
+                    self._condition.wait(remaining)
+                self.in_flight += cost
+            finally:
+                self.waiting -= 1
+
+        metrics.inc(f'{self.name}.admitted')
+        metrics.observe(f'{self.name}.wait_ms', (time.monotonic() - started) * 1000)
+        return cost
+
+    def release(self, cost, held_seconds):
+        with self._condition:
+            self.in_flight -= cost
+            self.service_time = 0.8 * self.service_time + 0.2 * (held_seconds / cost)
+            self._condition.notify_all()
+
+
+class TokenBucket:
+    """Refills `rate` tokens per second up to `burst`"""
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+
+    def take(self, cost=1):
+        """0 if the tokens were taken, else seconds until they will be available"""
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= cost:
+            self.tokens -= cost
+            return 0
+        return (cost - self.tokens) / self.rate
+
+
+class RateLimiter:
+    """Per-client token buckets; idle buckets are dropped once `max_clients` is reached"""
+
+    def __init__(self, per_minute, burst, max_clients=10000):
+        self.rate = per_minute / 60.0
+        self.burst = burst
+        self.max_clients = max_clients
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def check(self, client, cost=1):
+        cost = min(cost, self.burst)
+        with self._lock:
+            bucket = self._buckets.get(client)
+            if bucket is None:
+                if len(self._buckets) >= self.max_clients:
+                    self._prune()
+                bucket = self._buckets[client] = TokenBucket(self.rate, self.burst)
+            wait = bucket.take(cost)
+        if wait:
+            metrics.inc('admission.rate_limited')
+            raise Rejected("Rate limit exceeded", 429, max(1, math.ceil(wait)))
+
+    def _prune(self):
+        # Full buckets carry no state worth keeping
+        now = time.monotonic()
+        for client, bucket in list(self._buckets.items()):
+            if bucket.tokens + (now - bucket.updated) * self.rate >= bucket.burst:
+                del self._buckets[client]
+
+
+controller = AdmissionController(
+    Config.ADMISSION_MAX_IN_FLIGHT,
+    Config.ADMISSION_MAX_QUEUE,
+    Config.ADMISSION_QUEUE_TIMEOUT
+)
+rate_limiter = RateLimiter(Config.RATE_LIMIT_PER_MINUTE, Config.RATE_LIMIT_BURST) \
+    if Config.RATE_LIMIT_PER_MINUTE else None
+
+
+# Camera ids and names accepted as X-Client-Id, reloaded every KNOWN_CLIENTS_TTL seconds
+KNOWN_CLIENTS_TTL = 60
+_known_cameras = frozenset()
+_known_cameras_at = None
+
+
+def known_cameras():
+    global _known_cameras, _known_cameras_at
+    now = time.monotonic()
+    if _known_cameras_at is None or now - _known_cameras_at >= KNOWN_CLIENTS_TTL:
+        try:
+            rows = db.session.execute(db.select(Cameras.id, Cameras.name)).all()
+            _known_cameras = frozenset(str(value) for row in rows for value in row if value is not None)
+        except Exception as e:
+            print(f"Error loading cameras for rate limiting: {str(e)}")
+        _known_cameras_at = now
+    return _known_cameras
+
+
+def client_key():
+    """
+    Rate limit key. X-Client-Id is only trusted when it is a configured API
+    key or a known camera id or name; anything else could be changed on
+    every request to dodge the limit, so the address is used instead.
+    """
+    client_id = request.headers.get('X-Client-Id')
+    if client_id:
+        if client_id in Config.ADMISSION_CLIENT_KEYS:
+            return f"key:{client_id}"
+        if client_id in known_cameras():
+            return f"camera:{client_id}"
+        metrics.inc('admission.untrusted_client_id')
+    return request.remote_addr or 'unknown'
+
+
+def rejected_response(error):
+    response = jsonify({
+        "success": False,
+        "error": str(error),
+        "retryable": True,
+        "retry_after": error.retry_after
+    })
+    response.status_code = error.status
+    response.headers['Retry-After'] = str(error.retry_after)
+    return response
+
+
+def admit(cost=lambda: 1):
+    """
+    Guard an analysis view: per-client rate limit first (429), then a slot
+    in the in-flight limit (503 when the queue is full). `cost` is evaluated
+    per request, e.g. the number of uploaded images. Streaming responses
+    keep their slot until the stream is closed.
+    """
+
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            if not Config.ADMISSION_ENABLED:
+                return view(*args, **kwargs)
+
+            units = cost()
+            try:
+                if rate_limiter is not None:
+                    rate_limiter.check(client_key(), units)
+                with tracing.span('admission.wait', units=units):
+                    units = controller.acquire(units)
+            except Rejected as e:
+                return rejected_response(e)
+
+            started = time.monotonic()
+            released = []
+
+            def release():
+                if not released:
+                    released.append(True)
+                    controller.release(units, time.monotonic() - started)
+
+            try:
+                response = app.make_response(view(*args, **kwargs))
+            except Exception:
+                release()
+                raise
+            if response.is_streamed:
+                response.call_on_close(release)
+            else:
+                release()
+            return response
+
+        return wrapper
+
+    return decorator
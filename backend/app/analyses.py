@@ -0,0 +1,119 @@
+import hashlib
+import json
+import os
+import uuid
+import imaging
+from app import db, derivatives
+from app.models import Analyses, Detections
+from config import Config
+
+UPLOAD_FOLDER = Config.UPLOAD_FOLDER
+RESULTS_FOLDER = Config.RESULTS_FOLDER
+DERIVATIVES_FOLDER = Config.DERIVATIVES_FOLDER
+
+
+def record_analysis(results, image_name, location=None):
+    """
+    Persist a successful analysis and one Detections row per box, written in
+    a single bulk insert; the caller commits
+    """
+    detections = results.get('detections', [])
+    analysis = Analyses(
+        image_name=image_name,
+        result_name=results['output_image'],
+        model_id=Config.MODEL_ID,
+        predictions=json.dumps(detections),
+        width=results['image_width'],
+        height=results['image_height'],
+        fill_level=results.get('fillLevel') or 0
+    )
+    db.session.add(analysis)
+    db.session.flush()
+
+    if detections:
+        db.session.execute(db.insert(Detections), [{
+            'analysis_id': analysis.id,
+            'class_name': detection['class'],
+            'confidence': detection['confidence'],
+            'x': detection['x'],
+            'y': detection['y'],
+            'width': detection['width'],
+            'height': detection['height'],
+            'location': location
+        } for detection in detections])
+    return analysis
+
+
+def link_report(analysis, report_id):
+    """Attach an analysis and its detections to the report it produced"""
+    analysis.report_id = report_id
+    db.session.execute(
+        db.update(Detections).where(Detections.analysis_id == analysis.id).values(report_id=report_id)
+    )
+
+
+def style_from_args(args):
+    """
+    Rendering options from query parameters, or None for the default style
+    color=RRGGBB, labels=0|1, thickness=1..10
+    """
+    style = {}
+    color = args.get('color')
+    if color:
+        color = color.lstrip('#')
+        if len(color) != 6:
+            raise ValueError('color must be a RRGGBB hex value')
+        red, green, blue = (int(color[i:i + 2], 16) for i in (0, 2, 4))
+        style['color'] = (blue, green, red)
+    if 'labels' in args:
+        style['labels'] = args.get('labels') not in ('0', 'false', 'off')
+    if 'thickness' in args:
+        style['thickness'] = min(10, max(1, int(args.get('thickness'))))
+    return style or None
+
+
+def _style_key(style):
+    return hashlib.sha1(json.dumps(style, sort_keys=True).encode()).hexdigest()[:10]
+
+
+def invalidate_result(result_name):
+    """Drop the resized copies and styled renders of an annotated image"""
+    derivatives.invalidate_variants(f"result-{os.path.splitext(os.path.basename(result_name))[0]}")
+
+
+def ensure_rendered(result_name, style=None):
+    """
+    Return (folder, file name) of the annotated image, drawing it from the
+    stored detections on first request. Default-style renders live in
+    results/; styled variants go to the size-bounded derivative cache.
+    Returns None if there is nothing to render from.
+    """
+    result_name = os.path.basename(result_name)
+    if style:
+        folder = DERIVATIVES_FOLDER
+        name = f"result-{os.path.splitext(result_name)[0]}_{_style_key(style)}.jpg"
+    else:
+        folder = RESULTS_FOLDER
+        name = result_name
+
+    path = os.path.join(folder, name)
+    if os.path.exists(path):
+        return folder, name
+
+    analysis = Analyses.query.filter_by(result_name=result_name).first()
+    if analysis is None:
+        return None
+
+    source_path = os.path.join(UPLOAD_FOLDER, analysis.image_name)
+    if not os.path.exists(source_path):
+        return None
+
+    # Render to a temporary name so concurrent requests never serve a partial file
+    temp_path = f"{path}.{uuid.uuid4().hex}.tmp.jpg"
+    if imaging.annotate(source_path, json.loads(analysis.predictions), temp_path, style) is None:
+        return None
+    os.replace(temp_path, path)
+
+    if style:
+        derivatives.account_file(path)
+    return folder, name
@@ -0,0 +1,200 @@
+import asyncio
+import random
+import threading
+import time
+from urllib.parse import urlsplit
+import aiohttp
+import sqlalchemy as sa
+from app import db
+from app.models import Cameras
+from app.metrics import metrics
+from config import Config
+
+ACTIVE = 1
+INACTIVE = 0
+
+_prober = None
+_prober_lock = threading.Lock()
+
+
+class SweepThrottled(Exception):
+    """An on-demand sweep was refused; one is running or has just finished"""
+
+    def __init__(self, retry_after):
+        super().__init__("A camera sweep ran recently; try again later")
+        self.retry_after = retry_after
+
+
+def probe_target(address, scheme=None, port=None, path=None):
+    """(url, host, port) for a camera address given as a bare IP, host:port or full URL"""
+    address = address.strip()
+    if '://' not in address:
+        address = f"{scheme or Config.CAMERA_PROBE_SCHEME}://{address}"
+    parts = urlsplit(address)
+    default_port = 443 if parts.scheme == 'https' else (port or Config.CAMERA_PROBE_PORT)
+    host, port = parts.hostname, parts.port or default_port
+    netloc = f"[{host}]" if ':' in host else host
+    url = f"{parts.scheme}://{netloc}:{port}{parts.path or path or Config.CAMERA_PROBE_PATH}"
+    return url, host, port
+
+
+class CameraProber:
+    """
+    Probes every camera address concurrently on one event loop. Each probe
+    has its own short timeout and at most `concurrency` run at once, so a
+    sweep takes about ceil(cameras / concurrency) * timeout in the worst
+    case no matter how many cameras are unreachable. A camera is only marked
+    inactive after `failures` consecutive failed probes and active again on
+    the first success; changed statuses are written in one bulk UPDATE.
+    """
+
+    def __init__(self, timeout=None, concurrency=None, failures=None, mode=None):
+        self.timeout = timeout or Config.CAMERA_PROBE_TIMEOUT
+        self.concurrency = concurrency or Config.CAMERA_PROBE_CONCURRENCY
+        self.failures_to_down = failures or Config.CAMERA_PROBE_FAILURES
+        self.mode = mode or Config.CAMERA_PROBE_MODE
+        self.failures = {}
+        self.results = {}
+        self.last_sweep = None
+        self._sweep_lock = threading.Lock()
+
+    async def _probe(self, session, semaphore, camera_id, address):
+        result = {'camera_id': camera_id, 'address': address, 'up': False, 'latency_ms': None, 'error': None}
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                url, host, port = probe_target(address)
+                if self.mode == 'tcp':
+                    _, writer = await asyncio.wait_for(asyncio.open_connection(host, port), self.timeout)
+                    writer.close()
+                    result['up'] = True
+                else:
+                    async with session.get(url, allow_redirects=False) as response:
+                        # Any answer below 5xx means the device is there and serving
+                        result['up'] = response.status < 500
+                        if not result['up']:
+                            result['error'] = f"HTTP {response.status}"
+            except asyncio.TimeoutError:
+                result['error'] = 'timeout'
+            except Exception as e:
+                result['error'] = str(e) or type(e).__name__
+            result['latency_ms'] = round((time.perf_counter() - started) * 1000, 1)
+        result['checked_at'] = time.time()
+        return result
+
+    async def probe_all(self, cameras):
+        """Probe (camera_id, address) pairs concurrently; one result dict per camera"""
+        semaphore = asyncio.Semaphore(self.concurrency)
+        connector = aiohttp.TCPConnector(limit=self.concurrency, force_close=True, ssl=False)
+        timeout = aiohttp.ClientTimeout(total=self.timeout)
+        async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+            return await asyncio.gather(*(
+                self._probe(session, semaphore, camera_id, address)
+                for camera_id, address in cameras
+            ))
+
+    def _next_status(self, camera_id, current, up):
+        if up:
+            self.failures.pop(camera_id, None)
+            return ACTIVE
+        self.failures[camera_id] = self.failures.get(camera_id, 0) + 1
+        if self.failures[camera_id] >= self.failures_to_down:
+            return INACTIVE
+        return current
+
+    def sweep(self, min_interval=0):
+        """
+        Probe every camera once and persist status changes; needs an app
+        context. With `min_interval`, raises SweepThrottled instead of waiting
+        when a sweep is running or finished less than that many seconds ago.
+        """
+        if not self._sweep_lock.acquire(blocking=not min_interval):
+            raise SweepThrottled(min_interval)
+        try:
+            if min_interval and self.last_sweep:
+                age = time.time() - self.last_sweep['finished_at']
+                if age < min_interval:
+                    raise SweepThrottled(min_interval - age)
+
+            started = time.perf_counter()
+            rows = db.session.execute(
+                db.select(Cameras.id, Cameras.ipaddress, Cameras.status)
+            ).all()
+            targets = [(row.id, row.ipaddress) for row in rows if row.ipaddress]
+            current = {row.id: row.status for row in rows}
+
+            results = asyncio.run(self.probe_all(targets)) if targets else []
+
+            changes = []
+            for result in results:
+                camera_id = result['camera_id']
+                status = self._next_status(camera_id, current[camera_id], result['up'])
+                result['status'] = status
+                if status != current[camera_id]:
+                    changes.append({'id': camera_id, 'status': status})
+
+            if changes:
+                # ORM bulk UPDATE by primary key: one executemany for the whole sweep
+                db.session.execute(sa.update(Cameras), changes)
+                db.session.commit()
+
+            known = {camera_id for camera_id, _ in targets}
+            self.failures = {k: v for k, v in self.failures.items() if k in known}
+            self.results = {result['camera_id']: result for result in results}
+            duration_ms = round((time.perf_counter() - started) * 1000, 1)
+            up = sum(1 for result in results if result['up'])
+            self.last_sweep = {
+                'finished_at': time.time(),
+                'duration_ms': duration_ms,
+                'probed': len(results),
+                'up': up,
+                'down': len(results) - up,
+                'changed': len(changes)
+            }
+        finally:
+            self._sweep_lock.release()
+
+        metrics.observe('camera_health.sweep_ms', duration_ms)
+        metrics.set('camera_health.up', up)
+        metrics.set('camera_health.down', len(results) - up)
+        metrics.inc('camera_health.status_changes', len(changes))
+        return dict(self.last_sweep, changes=changes)
+
+    def snapshot(self):
+        return {
+            'last_sweep': self.last_sweep,
+            'cameras': sorted(self.results.values(), key=lambda result: result['camera_id'])
+        }
+
+
+def get_prober():
+    global _prober
+    if _prober is None:
+        with _prober_lock:
+            if _prober is None:
+                _prober = CameraProber()
+    return _prober
+
+
+def start_background(app, interval=None, jitter=None):
+    """Sweep on a daemon thread every `interval` seconds, +/- `jitter` as a fraction"""
+    interval = interval or Config.CAMERA_PROBE_INTERVAL
+    jitter = Config.CAMERA_PROBE_JITTER if jitter is None else jitter
+    prober = get_prober()
+
+    def loop():
+        while True:
+            # Jitter keeps several workers/instances from probing in lockstep
+            time.sleep(interval * random.uniform(1 - jitter, 1 + jitter))
+            with app.app_context():
+                try:
+                    prober.sweep()
+                except Exception as e:
+                    db.session.rollback()
+                    print(f"Error probing cameras: {str(e)}")
+                finally:
+                    db.session.remove()
+
+    thread = threading.Thread(target=loop, name='camera-health', daemon=True)
+    thread.start()
+    return thread
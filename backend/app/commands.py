@@ -0,0 +1,150 @@
+import click
+from app import app
+from app import rollups, export, tiles, camera_health, sla
+from app.retention import RetentionManager
+from config import Config
+
+
+@app.cli.group()
+def analytics():
+    """Analytics maintenance commands"""
+
+
+@analytics.command('backfill')
+@click.option('--granularity', type=click.Choice(['hour', 'day', 'all']), default='all',
+              help='Which rollup table to rebuild')
+@click.option('--batch-size', default=1000, show_default=True, help='Rows fetched per round trip')
+def backfill_rollups(granularity, batch_size):
+    """Rebuild the hourly/daily report rollups from the Reports table"""
+    granularities = None if granularity == 'all' else [granularity]
+    scanned, buckets = rollups.backfill(granularities, batch_size=batch_size)
+    click.echo(f"Scanned {scanned} reports")
+    for name, count in buckets.items():
+        click.echo(f"  {name}: {count} rollup rows")
+
+
+@analytics.command('sla-rebuild')
+def rebuild_sla():
+    """Recompute the SLA histograms from the report status history"""
+    scanned, buckets = sla.rebuild()
+    click.echo(f"Scanned {scanned} status changes into {buckets} histogram rows")
+
+
+@app.cli.group()
+def retention():
+    """Upload/result file retention commands"""
+
+
+@retention.command('run')
+@click.option('--dry-run', is_flag=True, help='Report what would be deleted without deleting')
+@click.option('--max-age-days', type=float, default=None, help='Delete unreferenced files older than this (0 disables)')
+@click.option('--max-bytes', type=int, default=None, help='Total size budget for uploads/ and results/ (0 disables)')
+def run_retention(dry_run, max_age_days, max_bytes):
+    """Evict old or excess files from uploads/ and results/"""
+    summary = RetentionManager(max_age_days=max_age_days, max_bytes=max_bytes, dry_run=dry_run).run()
+    verb = 'Would delete' if dry_run else 'Deleted'
+    click.echo(f"Scanned {summary['scanned']} files in {summary['duration_seconds']}s")
+    click.echo(f"{verb} {summary['deleted']} files ({summary['deleted_by_age']} by age, "
+               f"{summary['deleted_by_size']} by size), {summary['freed_bytes']} bytes")
+    click.echo(f"Remaining: {summary['remaining_bytes']} bytes")
+
+
+@app.cli.group()
+def reports():
+    """Report data commands"""
+
+
+@reports.command('export')
+@click.option('--format', 'fmt', type=click.Choice(list(export.EXPORT_FORMATS)), default='csv', show_default=True)
+@click.option('--output', type=click.Path(dir_okay=False), default='-', help='File to write (default: stdout)')
+@click.option('--status', default=None)
+@click.option('--priority', default=None)
+@click.option('--start', type=click.DateTime(), default=None, help='Reported at or after')
+@click.option('--end', type=click.DateTime(), default=None, help='Reported before')
+@click.option('--batch-size', default=1000, show_default=True, help='Rows fetched per round trip')
+def export_reports(fmt, output, status, priority, start, end, batch_size):
+    """Stream reports to a CSV, NDJSON or Parquet file"""
+    if fmt == 'parquet' and not export.parquet_available():
+        raise click.ClickException('Parquet export requires the pyarrow package')
+
+    clauses = export.report_filters(status=status, priority=priority, start=start, end=end)
+    binary = fmt == 'parquet'
+    with click.open_file(output, 'wb' if binary else 'w') as out:
+        for chunk in export.stream_reports(fmt, clauses, batch_size=batch_size):
+            out.write(chunk)
+
+
+@reports.command('reprocess')
+@click.option('--model-id', default=None, help='Model to score with (default: Config.MODEL_ID)')
+@click.option('--workers', default=4, show_default=True, help='Concurrent inference calls')
+@click.option('--checkpoint', type=click.Path(dir_okay=False), default='reprocess.checkpoint.json',
+              show_default=True, help='Progress file used to resume after interruption')
+@click.option('--limit', type=int, default=None, help='Stop after this many reports')
+@click.option('--commit-every', default=100, show_default=True, help='Scores written per commit')
+@click.option('--allow-annotated', is_flag=True,
+              help='Score the stored annotated image when the original upload is gone')
+def reprocess_reports(model_id, workers, checkpoint, limit, commit_every, allow_annotated):
+    """Re-run inference over stored report images and save the new scores"""
+    from app.reprocessing import Reprocessor
+
+    stats = Reprocessor(
+        model_id or Config.MODEL_ID,
+        workers=workers,
+        commit_every=commit_every,
+        checkpoint_path=checkpoint,
+        limit=limit,
+        progress=click.echo,
+        allow_annotated=allow_annotated
+    ).run()
+    click.echo(f"Done: {stats['processed']} scored, {stats['failed']} failed, "
+               f"{stats['skipped_no_original']} skipped without an original upload")
+
+
+@reports.command('bench-serialize')
+@click.option('--rows', default=10000, show_default=True, help='Synthetic report rows per response')
+@click.option('--repeat', default=5, show_default=True, help='Runs per variant; the median is reported')
+def bench_serialize(rows, repeat):
+    """Time report list serialization and compression on synthetic rows"""
+    from app import routes, serialization
+
+    results = serialization.benchmark(routes.REPORT_LIST_FIELDS, count=rows, repeat=repeat)
+    baseline = results[0]['ms']
+    click.echo(f"{rows} rows, median of {repeat} runs")
+    for result in results:
+        click.echo(f"  {result['name']:<22} {result['ms']:>9.2f} ms  {result['bytes']:>10} bytes"
+                   f"  x{baseline / result['ms']:.1f}")
+
+
+@app.cli.group('tiles')
+def tiles_cli():
+    """Map heatmap tile commands"""
+
+
+@tiles_cli.command('warm')
+@click.option('--max-zoom', type=int, default=None, help='Deepest zoom level to build (default: TILE_MAX_ZOOM)')
+@click.option('--min-zoom', type=int, default=0, show_default=True)
+def warm_tiles(max_zoom, min_zoom):
+    """Precompute every non-empty heatmap tile in one pass over the reports"""
+    written = tiles.warm(max_zoom=max_zoom, min_zoom=min_zoom)
+    for zoom, count in written.items():
+        click.echo(f"zoom {zoom}: {count} tiles")
+
+
+@app.cli.group()
+def cameras():
+    """Camera commands"""
+
+
+@cameras.command('probe')
+@click.option('--mode', type=click.Choice(['http', 'tcp']), default=None, help='Probe type (default: CAMERA_PROBE_MODE)')
+@click.option('--timeout', type=float, default=None, help='Seconds per probe')
+@click.option('--concurrency', type=int, default=None, help='Probes in flight at once')
+def probe_cameras(mode, timeout, concurrency):
+    """Probe every camera once and update their statuses"""
+    prober = camera_health.CameraProber(timeout=timeout, concurrency=concurrency, failures=1, mode=mode)
+    summary = prober.sweep()
+    for result in prober.snapshot()['cameras']:
+        state = 'up' if result['up'] else f"down ({result['error']})"
+        click.echo(f"  camera {result['camera_id']} {result['address']}: {state} in {result['latency_ms']} ms")
+    click.echo(f"Probed {summary['probed']} cameras in {summary['duration_ms']} ms: "
+               f"{summary['up']} up, {summary['down']} down, {summary['changed']} changed")
@@ -0,0 +1,148 @@
+import os
+import threading
+import uuid
+import cv2
+import numpy as np
+from config import Config
+
+DERIVATIVES_FOLDER = Config.DERIVATIVES_FOLDER
+SIZES = Config.DERIVATIVE_SIZES
+FORMATS = {
+    'jpeg': ('.jpg', [cv2.IMWRITE_JPEG_QUALITY, 80], 'image/jpeg'),
+    'webp': ('.webp', [cv2.IMWRITE_WEBP_QUALITY, 80], 'image/webp')
+}
+
+_lock = threading.Lock()
+_cache_bytes = None
+
+
+def choose_format(requested, accept_header):
+    """Use the requested format, else WebP when the client advertises it"""
+    if requested in FORMATS:
+        return requested
+    if accept_header and 'image/webp' in accept_header:
+        return 'webp'
+    return 'jpeg'
+
+
+def derivative_name(source_key, size, fmt):
+    return f"{source_key}_{size}{FORMATS[fmt][0]}"
+
+
+def render(image_bytes, size, fmt):
+    """Downscale encoded image bytes to fit a `size` box and re-encode"""
+    img = cv2.imdecode(np.frombuffer(image_bytes, dtype=np.uint8), cv2.IMREAD_COLOR)
+    if img is None:
+        raise ValueError("Failed to decode image")
+
+    height, width = img.shape[:2]
+    max_side = SIZES[size]
+    scale = max_side / max(height, width)
+    if scale < 1:
+        img = cv2.resize(img, (max(1, int(width * scale)), max(1, int(height * scale))),
+                         interpolation=cv2.INTER_AREA)
+
+    extension, params, _ = FORMATS[fmt]
+    ok, encoded = cv2.imencode(extension, img, params)
+    if not ok:
+        raise ValueError(f"Failed to encode {fmt} derivative")
+    return encoded.tobytes()
+
+
+def get_or_create(source_key, load_source, size, fmt):
+    """
+    Return the cached derivative file name, rendering it on first request.
+    `load_source` is only called on a cache miss and returns the original bytes.
+    """
+    name = derivative_name(source_key, size, fmt)
+    path = os.path.join(DERIVATIVES_FOLDER, name)
+
+    if os.path.exists(path):
+        # Bump mtime so eviction treats the file as recently used
+        os.utime(path)
+        return name
+
+    data = render(load_source(), size, fmt)
+
+    # Write to a temporary name first so readers never see a partial file
+    temp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    with open(temp_path, 'wb') as out:
+        out.write(data)
+    os.replace(temp_path, path)
+
+    _account(len(data))
+    return name
+
+
+def pregenerate(source_key, image_bytes, sizes=('thumb',), fmt='jpeg'):
+    """Warm the cache at report creation so listings never wait on a resize"""
+    for size in sizes:
+        get_or_create(source_key, lambda: image_bytes, size, fmt)
+
+
+def invalidate(source_key):
+    """Drop every cached derivative of a source, e.g. when a report is deleted"""
+    removed = 0
+    for size in SIZES:
+        for fmt in FORMATS:
+            removed += _remove(os.path.join(DERIVATIVES_FOLDER, derivative_name(source_key, size, fmt)))
+    _account(-removed)
+
+
+def invalidate_variants(source_key):
+    """invalidate(), plus every other cached file named after the source (styled renders)"""
+    prefix = f"{source_key}_"
+    removed = 0
+    for entry in os.scandir(DERIVATIVES_FOLDER):
+        if entry.name.startswith(prefix):
+            removed += _remove(entry.path)
+    _account(-removed)
+
+
+def _remove(path):
+    try:
+        size = os.path.getsize(path)
+        os.remove(path)
+        return size
+    except FileNotFoundError:
+        return 0
+
+
+def account_file(path):
+    """Count a file another module wrote into the cache towards the size limit"""
+    _account(os.path.getsize(path))
+
+
+def _account(added_bytes):
+    global _cache_bytes
+    with _lock:
+        if _cache_bytes is None:
+            _cache_bytes = sum(entry.stat().st_size for entry in os.scandir(DERIVATIVES_FOLDER) if entry.is_file())
+        else:
+            _cache_bytes += added_bytes
+
+        if _cache_bytes > Config.DERIVATIVE_CACHE_MAX_BYTES:
+            _cache_bytes = _evict(int(Config.DERIVATIVE_CACHE_MAX_BYTES * 0.9))
+
+
+def _evict(target_bytes):
+    """Delete least recently used derivatives until the cache fits in target_bytes"""
+    entries = []
+    total = 0
+    for entry in os.scandir(DERIVATIVES_FOLDER):
+        if not entry.is_file():
+            continue
+        stat = entry.stat()
+        entries.append((stat.st_mtime, stat.st_size, entry.path))
+        total += stat.st_size
+
+    entries.sort()
+    for _, size, path in entries:
+        if total <= target_bytes:
+            break
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        total -= size
+    return total
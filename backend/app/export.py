@@ -0,0 +1,154 @@
+import csv
+import io
+import json
+from app import db
+from app.models import Reports
+
+EXPORT_FORMATS = {
+    'csv': ('text/csv', 'csv'),
+    'ndjson': ('application/x-ndjson', 'ndjson'),
+    'parquet': ('application/vnd.apache.parquet', 'parquet')
+}
+
+EXPORT_COLUMNS = [
+    ('id', Reports.id),
+    ('location', Reports.location),
+    ('priority', Reports.priority),
+    ('status', Reports.status),
+    ('ai_confidence', Reports.ai_confidence),
+    ('reportedAt', Reports.reportedAt),
+    ('waste_type', Reports.waste_type),
+    ('fill_level', Reports.fill_level),
+    ('image_name', Reports.image_name),
+    ('has_image', Reports.image_data.isnot(None))
+]
+
+
+def report_filters(status=None, priority=None, start=None, end=None):
+    """WHERE clauses shared by the report listing and the export"""
+    clauses = []
+    if status:
+        clauses.append(Reports.status == status)
+    if priority:
+        clauses.append(Reports.priority == priority)
+    if start is not None:
+        clauses.append(Reports.reportedAt >= start)
+    if end is not None:
+        clauses.append(Reports.reportedAt < end)
+    return clauses
+
+
+def iter_report_batches(clauses, batch_size=1000):
+    """
+    Yield lists of row tuples from a server-side cursor. Only the export
+    columns are selected, so image blobs never leave the database.
+    """
+    query = db.select(*[column.label(name) for name, column in EXPORT_COLUMNS]) \
+        .where(*clauses) \
+        .order_by(Reports.id) \
+        .execution_options(yield_per=batch_size)
+    result = db.session.execute(query)
+    for partition in result.partitions():
+        yield partition
+
+
+def _value(value):
+    return value.isoformat() if hasattr(value, 'isoformat') else value
+
+
+def stream_csv(batches):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow([name for name, _ in EXPORT_COLUMNS])
+    for rows in batches:
+        writer.writerows([[_value(value) for value in row] for row in rows])
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def stream_ndjson(batches):
+    names = [name for name, _ in EXPORT_COLUMNS]
+    for rows in batches:
+        yield ''.join(
+            json.dumps({name: _value(value) for name, value in zip(names, row)}) + '\n'
+            for row in rows
+        )
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only file object whose bytes are drained after each row group"""
+
+    def __init__(self):
+        self.chunks = []
+        self.position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def drain(self):
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def stream_parquet(batches):
+    """One Parquet row group per batch; needs the optional pyarrow package"""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = pa.schema([
+        ('id', pa.int64()),
+        ('location', pa.string()),
+        ('priority', pa.string()),
+        ('status', pa.string()),
+        ('ai_confidence', pa.int64()),
+        ('reportedAt', pa.timestamp('us')),
+        ('waste_type', pa.string()),
+        ('fill_level', pa.float64()),
+        ('image_name', pa.string()),
+        ('has_image', pa.bool_())
+    ])
+
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(sink, schema)
+    for rows in batches:
+        columns = list(zip(*rows))
+        table = pa.Table.from_arrays(
+            [pa.array(values, type=field.type) for values, field in zip(columns, schema)],
+            schema=schema
+        )
+        writer.write_table(table)
+        yield sink.drain()
+    writer.close()
+    yield sink.drain()
+
+
+def parquet_available():
+    try:
+        import pyarrow.parquet  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def stream_reports(fmt, clauses, batch_size=1000):
+    """Stream filtered reports as CSV text, NDJSON text or Parquet bytes"""
+    batches = iter_report_batches(clauses, batch_size=batch_size)
+    if fmt == 'csv':
+        return stream_csv(batches)
+    if fmt == 'ndjson':
+        return stream_ndjson(batches)
+    if fmt == 'parquet':
+        return stream_parquet(batches)
+    raise ValueError(f"Unsupported export format: {fmt}")
@@ -0,0 +1,138 @@
+from datetime import datetime, timedelta, timezone
+import numpy as np
+from app import db
+from app.models import FillReading
+
+# Forecasts further out than this are reported as "not filling"
+MAX_FORECAST_HOURS = 24 * 365
+
+
+def resolve_bin_id(form, default_location):
+    """Pick the bin identity for a reading: explicit bin, then camera, then location"""
+    if form.get('bin_id'):
+        return form.get('bin_id')
+    if form.get('camera_id'):
+        return f"camera-{form.get('camera_id')}"
+    return form.get('location', default_location)
+
+
+def record_reading(bin_id, fill_level, camera_id=None):
+    """Queue a fill reading on the current session; the caller commits"""
+    reading = FillReading(
+        bin_id=bin_id,
+        camera_id=int(camera_id) if camera_id else None,
+        fill_level=float(fill_level or 0)
+    )
+    db.session.add(reading)
+    return reading
+
+
+def load_readings(since=None, bin_ids=None, batch_size=5000):
+    """Load readings as flat NumPy arrays (bin ids, epoch hours, fill levels)"""
+    query = db.select(FillReading.bin_id, FillReading.recordedAt, FillReading.fill_level)
+    if since is not None:
+        query = query.where(FillReading.recordedAt >= since)
+    if bin_ids:
+        query = query.where(FillReading.bin_id.in_(bin_ids))
+
+    bins, hours, levels = [], [], []
+    for bin_id, recorded_at, fill_level in db.session.execute(query.execution_options(yield_per=batch_size)):
+        if recorded_at is None:
+            continue
+        bins.append(bin_id)
+        if recorded_at.tzinfo is None:
+            recorded_at = recorded_at.replace(tzinfo=timezone.utc)
+        hours.append(recorded_at.timestamp() / 3600.0)
+        levels.append(fill_level)
+
+    return np.asarray(bins, dtype=object), np.asarray(hours, dtype=float), np.asarray(levels, dtype=float)
+
+
+def forecast_time_to_full(bins, hours, levels, threshold=90.0, model='linear', reset_drop=20.0):
+    """
+    Estimate hours until each bin reaches `threshold` in one vectorized pass.
+
+    Readings are grouped per bin and only the segment since the last emptying
+    (a drop of more than `reset_drop` points) is fitted. `model` is 'linear'
+    (level = a + b*t) or 'exponential' (level = a*exp(b*t)). Either way
+    `trend_per_hour` is in fill points per hour at the latest reading.
+    Returns one dict per bin.
+    """
+    if len(bins) == 0:
+        return []
+
+    names, bin_index = np.unique(bins, return_inverse=True)
+    order = np.lexsort((hours, bin_index))
+    b, t, y = bin_index[order], hours[order], levels[order]
+
+    # Keep only each bin's latest fill cycle
+    new_bin = np.r_[True, b[1:] != b[:-1]]
+    emptied = np.r_[False, np.diff(y) < -reset_drop] & ~new_bin
+    segment = np.cumsum(new_bin | emptied)
+    last_index = np.r_[np.flatnonzero(new_bin)[1:] - 1, len(b) - 1]
+    keep = segment == segment[last_index][b]
+    b, t, y = b[keep], t[keep], y[keep]
+
+    count = len(names)
+    starts = np.r_[True, b[1:] != b[:-1]]
+    last_index = np.r_[np.flatnonzero(starts)[1:] - 1, len(b) - 1]
+    last_time = t[last_index]
+    last_level = y[last_index]
+
+    if model == 'exponential':
+        target = np.log(np.clip(y, 1.0, None))
+        goal = np.log(threshold)
+    else:
+        target = y
+        goal = threshold
+
+    # Time is measured from each bin's last reading, so the intercept is the current level
+    n = np.bincount(b, minlength=count).astype(float)
+    dt = t - last_time[b]
+    s_t = np.bincount(b, dt, count)
+    s_y = np.bincount(b, target, count)
+    s_tt = np.bincount(b, dt * dt, count)
+    s_ty = np.bincount(b, dt * target, count)
+
+    denominator = n * s_tt - s_t * s_t
+    with np.errstate(divide='ignore', invalid='ignore'):
+        slope = np.where((n >= 2) & (denominator > 0), (n * s_ty - s_t * s_y) / denominator, np.nan)
+        intercept = (s_y - slope * s_t) / n
+        current = np.where(np.isnan(slope), target[last_index], intercept)
+        hours_to_full = np.where(slope > 0, (goal - current) / slope, np.inf)
+    hours_to_full = np.where(current >= goal, 0.0, hours_to_full)
+
+    if model == 'exponential':
+        # d/dt a*exp(b*t) = b * level: points per hour at the fitted current level
+        slope_per_hour = slope * np.exp(current)
+    else:
+        slope_per_hour = slope
+
+    results = []
+    for i, name in enumerate(names):
+        last_reading_at = datetime.fromtimestamp(last_time[i] * 3600.0, timezone.utc)
+        eta = float(max(hours_to_full[i], 0.0))
+        finite = bool(np.isfinite(eta)) and eta <= MAX_FORECAST_HOURS
+        results.append({
+            'bin_id': name,
+            'readings': int(n[i]),
+            'model': model,
+            'last_fill_level': round(float(last_level[i]), 1),
+            'last_reading_at': last_reading_at.isoformat(),
+            'trend_per_hour': None if np.isnan(slope_per_hour[i]) else round(float(slope_per_hour[i]), 3),
+            'hours_to_full': round(eta, 2) if finite else None,
+            'expected_full_at': (last_reading_at + timedelta(hours=eta)).isoformat() if finite else None
+        })
+    return results
+
+
+def forecast_bins(window_hours=168, threshold=90.0, model='linear', bin_ids=None, now=None):
+    """Load recent readings and forecast time-to-full for every bin that has them"""
+    since = None
+    if now is not None and window_hours:
+        since = now - timedelta(hours=window_hours)
+
+    bins, hours, levels = load_readings(since=since, bin_ids=bin_ids)
+    results = forecast_time_to_full(bins, hours, levels, threshold=threshold, model=model)
+    results.sort(key=lambda item: (item['hours_to_full'] is None, item['hours_to_full'] or 0))
+    return results
@@ -0,0 +1,343 @@
+import asyncio
+import json
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+import aiohttp
+from inference_sdk.http.utils.loaders import load_static_inference_input
+from inference_sdk.http.utils.post_processing import adjust_prediction_to_client_scaling_factor
+from app.metrics import metrics
+from config import Config
+
+
+class InferenceError(Exception):
+    """The inference upstream failed after retries"""
+
+
+class InferenceTimeout(InferenceError):
+    """The per-call time budget ran out"""
+
+
+class CircuitOpenError(InferenceError):
+    """The breaker is open; calls fail fast until the reset timeout passes"""
+
+    def __init__(self, retry_after):
+        super().__init__(f"Inference service unavailable, retry in {retry_after}s")
+        self.retry_after = retry_after
+
+
+class UpstreamHTTPError(Exception):
+    """Error status from the inference API; `status_code` decides whether it is retried"""
+
+    def __init__(self, status_code, message):
+        super().__init__(f"Inference API returned {status_code}: {message}")
+        self.status_code = status_code
+
+
+def is_transient(error):
+    """Timeouts, connection errors, 429 and 5xx are worth retrying; other errors are not"""
+    status = getattr(error, 'status_code', None)
+    if status is None:
+        status = getattr(getattr(error, 'response', None), 'status_code', None)
+    if status is not None:
+        return status == 429 or status >= 500
+    return isinstance(error, (TimeoutError, ConnectionError, OSError))
+
+
+class CircuitBreaker:
+    """
+    Opens after `failure_threshold` transient failures in a row. Once
+    `reset_timeout` has passed, one probe call is let through (half open)
+    and everything else is still rejected until that probe succeeds (closed)
+    or fails (open again).
+    """
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold=5, reset_timeout=30):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """True if a call may go upstream; after the reset timeout only the one probe is"""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN:
+                if time.monotonic() - self.opened_at < self.reset_timeout:
+                    return False
+                self.state = self.HALF_OPEN
+                metrics.inc('inference.breaker_half_open')
+            if self._probing:
+                return False
+            self._probing = True
+            return True
+
+    def retry_after(self):
+        return max(1, int(self.reset_timeout - (time.monotonic() - self.opened_at)))
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.state = self.CLOSED
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    metrics.inc('inference.breaker_opened')
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+            self._probing = False
+
+    def release(self):
+        """The call ended without telling whether the upstream is healthy; let another probe go"""
+        with self._lock:
+            self._probing = False
+
+
+class ResilientInferenceClient:
+    """
+    Wraps an inference client's `infer(image, model_id)` with a per-call time
+    budget, jittered exponential retry on transient errors, a circuit breaker
+    and optional hedging (a second identical request once `hedge_after`
+    seconds pass without an answer; whichever finishes first wins).
+
+    Calls that time out or lose a hedge are cancelled if they have not
+    started; ones already running keep a worker until the upstream answers,
+    and once every worker is held that way calls fail fast instead of
+    queueing behind them.
+    """
+
+    def __init__(self, client, timeout=None, retries=None, backoff=0.5, backoff_max=5,
+                 breaker=None, hedge_after=None, max_workers=16):
+        self.client = client
+        self.timeout = Config.INFERENCE_TIMEOUT if timeout is None else timeout
+        self.retries = Config.INFERENCE_RETRIES if retries is None else retries
+        self.backoff = backoff
+        self.backoff_max = backoff_max
+        self.hedge_after = Config.INFERENCE_HEDGE_AFTER if hedge_after is None else hedge_after
+        self.breaker = breaker or CircuitBreaker(
+            failure_threshold=Config.INFERENCE_BREAKER_FAILURES,
+            reset_timeout=Config.INFERENCE_BREAKER_RESET
+        )
+        self.max_workers = max_workers
+        self.abandoned = 0
+        self._abandoned_lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='inference')
+        metrics.gauge('inference.breaker_state', lambda: self.breaker.state)
+        metrics.gauge('inference.abandoned', lambda: self.abandoned)
+
+    def infer(self, image, model_id):
+        if not self.breaker.allow():
+            metrics.inc('inference.rejected_open')
+            raise CircuitOpenError(self.breaker.retry_after())
+
+        deadline = time.monotonic() + self.timeout
+        attempt = 0
+        while True:
+            remaining = deadline - time.monotonic()
+            metrics.inc('inference.calls')
+            started = time.monotonic()
+            try:
+                result = self._call(image, model_id, remaining)
+            except Exception as e:
+                transient = isinstance(e, InferenceTimeout) or is_transient(e)
+                if not transient:
+                    metrics.inc('inference.errors')
+                    self.breaker.release()
+                    raise
+
+                metrics.inc('inference.transient_errors')
+                self.breaker.record_failure()
+
+                delay = min(self.backoff_max, self.backoff * (2 ** attempt)) * random.uniform(0.5, 1.0)
+                remaining = deadline - time.monotonic()
+                if attempt >= self.retries or delay >= remaining or not self.breaker.allow():
+                    metrics.inc('inference.failures')
+                    if isinstance(e, InferenceError):
+                        raise
+                    raise InferenceError(f"Inference failed after {attempt + 1} attempt(s): {str(e)}") from e
+
+                attempt += 1
+                metrics.inc('inference.retries')
+                time.sleep(delay)
+                continue
+
+            metrics.observe('inference.latency_ms', (time.monotonic() - started) * 1000)
+            self.breaker.record_success()
+            return result
+
+    async def infer_async(self, image, model_id):
+        """infer() for asyncio callers; retries and backoff run on a worker thread"""
+        return await asyncio.to_thread(self.infer, image, model_id)
+
+    def _call(self, image, model_id, budget):
+        if budget <= 0:
+            raise InferenceTimeout(f"Inference timed out after {self.timeout}s")
+        if self.abandoned >= self.max_workers:
+            metrics.inc('inference.workers_exhausted')
+            raise InferenceTimeout("Every inference worker is held by a timed-out call")
+
+        deadline = time.monotonic() + budget
+        pending = {self._executor.submit(self.client.infer, image, model_id=model_id)}
+        try:
+            if self.hedge_after and self.hedge_after < budget:
+                done, _ = wait(pending, timeout=self.hedge_after)
+                if not done and self.abandoned < self.max_workers - 1:
+                    metrics.inc('inference.hedged')
+                    pending.add(self._executor.submit(self.client.infer, image, model_id=model_id))
+
+            error = None
+            while pending:
+                done, pending = wait(pending, timeout=max(0, deadline - time.monotonic()), return_when=FIRST_COMPLETED)
+                if not done:
+                    break
+                for future in done:
+                    if future.exception() is None:
+                        return future.result()
+                    error = future.exception()
+
+            if error is not None and not pending:
+                raise error
+            raise InferenceTimeout(f"Inference timed out after {self.timeout}s")
+        finally:
+            for future in pending:
+                self._abandon(future)
+
+    def _abandon(self, future):
+        """Drop a call nobody waits for: cancel it if queued, else count it until it ends"""
+        if future.cancel():
+            return
+        with self._abandoned_lock:
+            self.abandoned += 1
+        future.add_done_callback(self._abandoned_done)
+
+    def _abandoned_done(self, future):
+        with self._abandoned_lock:
+            self.abandoned -= 1
+
+
+class PooledInferenceClient:
+    """
+    Inference client over one shared pool of keep-alive connections.
+
+    Requests run on an event loop in a background thread through a single
+    aiohttp connector of at most `pool_size` connections, so threaded
+    callers (`infer`) and asyncio callers on any loop (`infer_async`) reuse
+    the same warm connections instead of paying connection and TLS setup on
+    every call, and parallelism toward the upstream is bounded in one
+    place. Speaks the `/{project}/{version}` API that InferenceHTTPClient
+    uses for hosted models (self-hosted inference servers serve it too).
+    A list of images is sent concurrently and answered with a list.
+    """
+
+    def __init__(self, api_url, api_key, pool_size=None, keepalive=None, timeout=None):
+        self.api_url = api_url.rstrip('/')
+        self.api_key = api_key
+        self.pool_size = pool_size or Config.INFERENCE_POOL_SIZE
+        self.keepalive = keepalive or Config.INFERENCE_KEEPALIVE
+        self.timeout = Config.INFERENCE_TIMEOUT if timeout is None else timeout
+        self.in_flight = 0
+        self._loop = None
+        self._session = None
+        self._pid = None
+        self._lock = threading.Lock()
+        metrics.gauge('inference_pool.in_flight', lambda: self.in_flight)
+
+    def _event_loop(self):
+        """The pool's loop, started on first use (and again in a forked child)"""
+        if self._loop is not None and self._pid == os.getpid():
+            return self._loop
+        with self._lock:
+            if self._loop is None or self._pid != os.getpid():
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name='inference-pool', daemon=True).start()
+                self._session = asyncio.run_coroutine_threadsafe(self._open_session(), loop).result()
+                self._pid = os.getpid()
+                self._loop = loop
+        return self._loop
+
+    async def _open_session(self):
+        trace = aiohttp.TraceConfig()
+        trace.on_connection_create_end.append(self._count('inference_pool.connections_opened'))
+        trace.on_connection_reuseconn.append(self._count('inference_pool.connections_reused'))
+        connector = aiohttp.TCPConnector(limit=self.pool_size, keepalive_timeout=self.keepalive, ttl_dns_cache=300)
+        return aiohttp.ClientSession(
+            connector=connector,
+            timeout=aiohttp.ClientTimeout(total=self.timeout),
+            headers={'Content-Type': 'application/json'},
+            trace_configs=[trace]
+        )
+
+    @staticmethod
+    def _count(name):
+        async def on_event(session, context, params):
+            metrics.inc(name)
+        return on_event
+
+    def _url(self, model_id):
+        parts = model_id.split('/')
+        if len(parts) != 2:
+            raise ValueError(f"Invalid model id: {model_id}. Expected format: project_id/model_version_id.")
+        return f"{self.api_url}/{parts[0]}/{parts[1]}"
+
+    async def _post(self, url, data):
+        self.in_flight += 1
+        try:
+            async with self._session.post(url, params={'api_key': self.api_key}, data=data) as response:
+                body = await response.read()
+                if response.status >= 400:
+                    raise UpstreamHTTPError(response.status, body[:200].decode('utf-8', 'replace'))
+                return json.loads(body)
+        except aiohttp.ClientConnectionError as e:
+            # Connection errors are retried by ResilientInferenceClient
+            raise ConnectionError(str(e) or type(e).__name__) from e
+        finally:
+            self.in_flight -= 1
+
+    async def _infer_encoded(self, url, encoded):
+        results = await asyncio.gather(*(self._post(url, data) for data, _ in encoded))
+        return [adjust_prediction_to_client_scaling_factor(result, scaling_factor)
+                for result, (_, scaling_factor) in zip(results, encoded)]
+
+    def infer(self, image, model_id):
+        """Infer one image (path, URL, base64 string, ndarray or PIL image) or a list of them"""
+        url = self._url(model_id)
+        encoded = load_static_inference_input(image)
+        future = asyncio.run_coroutine_threadsafe(self._infer_encoded(url, encoded), self._event_loop())
+        results = future.result()
+        return results if isinstance(image, list) else results[0]
+
+    async def infer_async(self, image, model_id):
+        url = self._url(model_id)
+        encoded = await asyncio.to_thread(load_static_inference_input, image)
+        future = asyncio.run_coroutine_threadsafe(self._infer_encoded(url, encoded), self._event_loop())
+        results = await asyncio.wrap_future(future)
+        return results if isinstance(image, list) else results[0]
+
+    async def _shutdown(self):
+        # Cancel requests still in flight so their callers are not left waiting on a stopped loop
+        tasks = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        await self._session.close()
+
+    def close(self):
+        with self._lock:
+            if self._loop is None or self._pid != os.getpid():
+                return
+            asyncio.run_coroutine_threadsafe(self._shutdown(), self._loop).result()
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._loop = self._session = None
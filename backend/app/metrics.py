@@ -0,0 +1,60 @@
+import threading
+
+
+class Metrics:
+    """Process-local counters, gauges and histograms exposed at /api/metrics"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._gauges = {}
+        self._gauge_callbacks = {}
+        self._histograms = {}
+
+    def inc(self, name, value=1):
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def set(self, name, value):
+        with self._lock:
+            self._gauges[name] = value
+
+    def gauge(self, name, callback):
+        """Register a gauge whose value is read when metrics are collected"""
+        with self._lock:
+            self._gauge_callbacks[name] = callback
+
+    def observe(self, name, value):
+        with self._lock:
+            histogram = self._histograms.get(name)
+            if histogram is None:
+                histogram = self._histograms[name] = {'count': 0, 'sum': 0, 'min': value, 'max': value}
+            histogram['count'] += 1
+            histogram['sum'] += value
+            histogram['min'] = min(histogram['min'], value)
+            histogram['max'] = max(histogram['max'], value)
+
+    def snapshot(self):
+        with self._lock:
+            gauges = dict(self._gauges)
+            callbacks = dict(self._gauge_callbacks)
+            counters = dict(self._counters)
+            histograms = {
+                name: dict(values, avg=round(values['sum'] / values['count'], 3) if values['count'] else 0)
+                for name, values in self._histograms.items()
+            }
+
+        for name, callback in callbacks.items():
+            try:
+                gauges[name] = callback()
+            except Exception as e:
+                gauges[name] = f"error: {str(e)}"
+
+        return {
+            'counters': counters,
+            'gauges': gauges,
+            'histograms': histograms
+        }
+
+
+metrics = Metrics()
@@ -1,3 +1,4 @@
+import sqlite3
 from app import db
 import sqlalchemy as sa
 import sqlalchemy.orm as so
@@ -5,6 +6,18 @@ from flask_login import UserMixin
 from app import login
 from sqlalchemy.sql import func
 from app import login
+
+
+# SQLite only enforces foreign keys (and their ON DELETE actions) on
+# connections that ask for it
+@sa.event.listens_for(sa.engine.Engine, 'connect')
+def enable_sqlite_foreign_keys(dbapi_connection, connection_record):
+    if isinstance(dbapi_connection, sqlite3.Connection):
+        cursor = dbapi_connection.cursor()
+        cursor.execute('PRAGMA foreign_keys=ON')
+        cursor.close()
+
+
 class User(UserMixin,db.Model):
     id:so.Mapped[int] = so.mapped_column(primary_key=True)
     username: so.Mapped[str] = so.mapped_column(sa.String(64),unique=True)
@@ -45,7 +58,161 @@ class Reports(db.Model):
     reportedAt = db.Column(sa.DateTime(timezone=True), server_default=func.now())
     image_data = db.Column(db.LargeBinary)
     image_name = db.Column(db.String(255))
+    waste_type = db.Column(db.String(128))
+    fill_level = db.Column(sa.Float)
+    latitude = db.Column(sa.Float)
+    longitude = db.Column(sa.Float)
+    # Never reuse a deleted report's id, or rows still keyed by it would
+    # attach to the new report
+    __table_args__ = {'sqlite_autoincrement': True}
     def __repr__(self) -> str:
         return '<Reports {}>'.format(self.id)
+
+
+class ReportRollupHourly(db.Model):
+    id:so.Mapped[int] = so.mapped_column(primary_key=True)
+    bucket = db.Column(sa.DateTime, nullable=False)
+    location: so.Mapped[str]=so.mapped_column(sa.String(128))
+    priority: so.Mapped[str]=so.mapped_column(sa.String(256))
+    status: so.Mapped[str]=so.mapped_column(sa.String(256))
+    waste_type: so.Mapped[str]=so.mapped_column(sa.String(128))
+    count: so.Mapped[int]=so.mapped_column(default=0)
+    confidence_sum: so.Mapped[float]=so.mapped_column(sa.Float, default=0)
+    fill_level_sum: so.Mapped[float]=so.mapped_column(sa.Float, default=0)
+    fill_level_count: so.Mapped[int]=so.mapped_column(default=0)
+    __table_args__ = (
+        sa.UniqueConstraint('bucket', 'location', 'priority', 'status', 'waste_type'),
+    )
+    def __repr__(self) -> str:
+        return '<ReportRollupHourly {} {}>'.format(self.bucket, self.location)
+
+
+class ReportRollupDaily(db.Model):
+    id:so.Mapped[int] = so.mapped_column(primary_key=True)
+    bucket = db.Column(sa.DateTime, nullable=False)
+    location: so.Mapped[str]=so.mapped_column(sa.String(128))
+    priority: so.Mapped[str]=so.mapped_column(sa.String(256))
+    status: so.Mapped[str]=so.mapped_column(sa.String(256))
+    waste_type: so.Mapped[str]=so.mapped_column(sa.String(128))
+    count: so.Mapped[int]=so.mapped_column(default=0)
+    confidence_sum: so.Mapped[float]=so.mapped_column(sa.Float, default=0)
+    fill_level_sum: so.Mapped[float]=so.mapped_column(sa.Float, default=0)
+    fill_level_count: so.Mapped[int]=so.mapped_column(default=0)
+    __table_args__ = (
+        sa.UniqueConstraint('bucket', 'location', 'priority', 'status', 'waste_type'),
+    )
+    def __repr__(self) -> str:
+        return '<ReportRollupDaily {} {}>'.format(self.bucket, self.location)
     
- 
\ No newline at end of file
+ 
+
+
+class ReportStatusChange(db.Model):
+    """Append-only: one row per status a report enters, including its first"""
+    id:so.Mapped[int] = so.mapped_column(primary_key=True)
+    report_id = db.Column(sa.Integer, sa.ForeignKey('reports.id', ondelete='SET NULL'), index=True)
+    from_status = db.Column(sa.String(256))
+    to_status: so.Mapped[str]=so.mapped_column(sa.String(256))
+    location = db.Column(sa.String(128))
+    priority = db.Column(sa.String(256))
+    seconds_since_reported = db.Column(sa.Float)
+    seconds_in_previous = db.Column(sa.Float)
+    changedAt = db.Column(sa.DateTime(timezone=True), server_default=func.now())
+    __table_args__ = (
+        sa.Index('ix_report_status_change_time', 'changedAt'),
+    )
+    def __repr__(self) -> str:
+        return '<ReportStatusChange {} {}>'.format(self.report_id, self.to_status)
+
+
+class ReportSlaHistogram(db.Model):
+    """Log-spaced duration histogram per SLA metric, location and priority"""
+    id:so.Mapped[int] = so.mapped_column(primary_key=True)
+    metric: so.Mapped[str]=so.mapped_column(sa.String(64))
+    location: so.Mapped[str]=so.mapped_column(sa.String(128))
+    priority: so.Mapped[str]=so.mapped_column(sa.String(256))
+    bucket: so.Mapped[int]=so.mapped_column()
+    count: so.Mapped[int]=so.mapped_column(default=0)
+    seconds_sum: so.Mapped[float]=so.mapped_column(sa.Float, default=0)
+    __table_args__ = (
+        sa.UniqueConstraint('metric', 'location', 'priority', 'bucket'),
+    )
+    def __repr__(self) -> str:
+        return '<ReportSlaHistogram {} {} {}>'.format(self.metric, self.location, self.bucket)
+
+
+class FillReading(db.Model):
+    id:so.Mapped[int] = so.mapped_column(primary_key=True)
+    bin_id: so.Mapped[str]=so.mapped_column(sa.String(128))
+    camera_id = db.Column(sa.Integer)
+    fill_level: so.Mapped[float]=so.mapped_column(sa.Float)
+    recordedAt = db.Column(sa.DateTime(timezone=True), server_default=func.now())
+    __table_args__ = (
+        sa.Index('ix_fill_reading_bin_time', 'bin_id', 'recordedAt'),
+        sa.Index('ix_fill_reading_time', 'recordedAt'),
+    )
+    def __repr__(self) -> str:
+        return '<FillReading {} {}>'.format(self.bin_id, self.fill_level)
+
+
+class Analyses(db.Model):
+    id:so.Mapped[int] = so.mapped_column(primary_key=True)
+    image_name: so.Mapped[str]=so.mapped_column(sa.String(255))
+    result_name: so.Mapped[str]=so.mapped_column(sa.String(255), unique=True)
+    model_id: so.Mapped[str]=so.mapped_column(sa.String(128))
+    predictions: so.Mapped[str]=so.mapped_column(sa.Text)
+    width: so.Mapped[int]=so.mapped_column()
+    height: so.Mapped[int]=so.mapped_column()
+    fill_level: so.Mapped[float]=so.mapped_column(sa.Float)
+    report_id = db.Column(sa.Integer, sa.ForeignKey('reports.id', ondelete='SET NULL'))
+    createdAt = db.Column(sa.DateTime(timezone=True), server_default=func.now())
+    def __repr__(self) -> str:
+        return '<Analyses {}>'.format(self.result_name)
+
+
+class Detections(db.Model):
+    id:so.Mapped[int] = so.mapped_column(primary_key=True)
+    analysis_id: so.Mapped[int]=so.mapped_column(sa.ForeignKey('analyses.id', ondelete='CASCADE'), index=True)
+    report_id = db.Column(sa.Integer, sa.ForeignKey('reports.id', ondelete='SET NULL'), index=True)
+    class_name: so.Mapped[str]=so.mapped_column(sa.String(128))
+    confidence: so.Mapped[float]=so.mapped_column(sa.Float)
+    x: so.Mapped[float]=so.mapped_column(sa.Float)
+    y: so.Mapped[float]=so.mapped_column(sa.Float)
+    width: so.Mapped[float]=so.mapped_column(sa.Float)
+    height: so.Mapped[float]=so.mapped_column(sa.Float)
+    location = db.Column(sa.String(128))
+    detectedAt = db.Column(sa.DateTime(timezone=True), server_default=func.now())
+    __table_args__ = (
+        sa.Index('ix_detections_class_time', 'class_name', 'detectedAt', 'confidence'),
+        sa.Index('ix_detections_location_time', 'location', 'detectedAt'),
+    )
+    def __repr__(self) -> str:
+        return '<Detections {} {}>'.format(self.class_name, self.confidence)
+
+
+class ReportScores(db.Model):
+    id:so.Mapped[int] = so.mapped_column(primary_key=True)
+    report_id: so.Mapped[int]=so.mapped_column(sa.ForeignKey('reports.id', ondelete='CASCADE'))
+    model_id: so.Mapped[str]=so.mapped_column(sa.String(128))
+    ai_confidence: so.Mapped[int]=so.mapped_column()
+    fill_level: so.Mapped[float]=so.mapped_column(sa.Float)
+    priority: so.Mapped[str]=so.mapped_column(sa.String(256))
+    waste_type: so.Mapped[str]=so.mapped_column(sa.String(128))
+    predictions: so.Mapped[str]=so.mapped_column(sa.Text)
+    # 'original' upload or 'annotated' stored image; NULL for older scores
+    source = db.Column(sa.String(16))
+    scoredAt = db.Column(sa.DateTime(timezone=True), server_default=func.now())
+    __table_args__ = (
+        sa.UniqueConstraint('report_id', 'model_id'),
+    )
+    def __repr__(self) -> str:
+        return '<ReportScores {} {}>'.format(self.report_id, self.model_id)
+
+
+class DataVersions(db.Model):
+    # Bumped in the same transaction as every committed write to table_name,
+    # so all processes derive the same ETags from it
+    table_name: so.Mapped[str] = so.mapped_column(sa.String(64), primary_key=True)
+    version: so.Mapped[int] = so.mapped_column(sa.Integer, default=0)
+    def __repr__(self) -> str:
+        return '<DataVersions {} {}>'.format(self.table_name, self.version)
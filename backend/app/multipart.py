@@ -0,0 +1,135 @@
+import os
+import uuid
+from werkzeug.sansio.multipart import MultipartDecoder, Field, File, Data, Epilogue, NeedData
+from werkzeug.utils import secure_filename
+from config import Config
+
+UPLOAD_FOLDER = Config.UPLOAD_FOLDER
+
+# Plain form fields (location, bin_id, ...) are small; cap what one may hold
+MAX_FIELD_BYTES = 64 * 1024
+
+# Extensions a saved upload may keep; anything else gets the field's default
+IMAGE_EXTENSIONS = {'jpg', 'jpeg', 'png', 'bmp', 'gif', 'webp', 'tif', 'tiff'}
+VIDEO_EXTENSIONS = {'mp4', 'mov', 'avi', 'mkv', 'webm', 'm4v'}
+
+
+class UploadTooLarge(ValueError):
+    """The whole request went over the per-request cap; nothing more is read"""
+
+    def __init__(self, limit):
+        super().__init__(f"Upload exceeds the {limit} byte request limit")
+        self.limit = limit
+
+
+class Upload:
+    """One uploaded file, spooled to `path`; `error` is set if it was rejected"""
+
+    def __init__(self, field, filename, name, path):
+        self.field = field
+        self.filename = filename
+        self.name = name
+        self.path = path
+        self.size = 0
+        self.error = None
+
+
+def safe_extension(filename, allowed=IMAGE_EXTENSIONS, default='jpg'):
+    """Extension for saving a client-named file: from the sanitised name if allowed, else `default`"""
+    extension = os.path.splitext(secure_filename(filename or ''))[1][1:].lower()
+    return extension if extension in allowed else default
+
+
+def boundary_of(request):
+    if request.mimetype != 'multipart/form-data':
+        return None
+    return request.mimetype_params.get('boundary')
+
+
+def stream_uploads(stream, boundary, form, field='images', folder=None, max_file_bytes=None,
+                   max_request_bytes=None, chunk_size=None, extensions=IMAGE_EXTENSIONS,
+                   default_extension='jpg'):
+    """
+    Parse a multipart body incrementally and yield each `field` file as soon
+    as its last byte has arrived. Files are written to disk chunk by chunk,
+    so memory stays at about one chunk whatever the upload size. Plain form
+    fields are stored in `form` as they arrive, so they must precede the
+    files they apply to. A file over `max_file_bytes` is yielded with
+    `error` set and its data discarded; going over `max_request_bytes`
+    raises UploadTooLarge. Spooled files get a random name and an extension
+    from `extensions` (`default_extension` when the client's is not allowed).
+    """
+    folder = folder or UPLOAD_FOLDER
+    max_file_bytes = max_file_bytes or Config.UPLOAD_MAX_FILE_BYTES
+    max_request_bytes = max_request_bytes or Config.UPLOAD_MAX_REQUEST_BYTES
+    chunk_size = chunk_size or Config.UPLOAD_CHUNK_BYTES
+
+    decoder = MultipartDecoder(boundary.encode())
+    received = 0
+    field_name = None
+    field_value = None
+    upload = None
+    out = None
+
+    def discard():
+        if out is not None:
+            out.close()
+        if upload is not None and os.path.exists(upload.path):
+            os.remove(upload.path)
+
+    try:
+        while True:
+            chunk = stream.read(chunk_size)
+            received += len(chunk)
+            if received > max_request_bytes:
+                raise UploadTooLarge(max_request_bytes)
+
+            decoder.receive_data(chunk or None)
+            event = decoder.next_event()
+
+            while not isinstance(event, NeedData):
+                if isinstance(event, Field):
+                    field_name, field_value = event.name, bytearray()
+
+                elif isinstance(event, File):
+                    field_name = None
+                    if event.name == field and event.filename:
+                        extension = safe_extension(event.filename, extensions, default_extension)
+                        name = f"{uuid.uuid4().hex}.{extension}"
+                        upload = Upload(event.name, event.filename, name, os.path.join(folder, name))
+                        out = open(upload.path, 'wb')
+
+                elif isinstance(event, Data):
+                    if field_name is not None:
+                        field_value += event.data
+                        if len(field_value) > MAX_FIELD_BYTES:
+                            raise ValueError(f"Form field '{field_name}' is too large")
+                        if not event.more_data:
+                            form[field_name] = field_value.decode('utf-8', 'replace')
+                            field_name = None
+                    elif upload is not None:
+                        if upload.error is None:
+                            upload.size += len(event.data)
+                            if upload.size > max_file_bytes:
+                                upload.error = f"File exceeds the {max_file_bytes} byte limit"
+                                discard()
+                                out = None
+                            else:
+                                out.write(event.data)
+                        if not event.more_data:
+                            if out is not None:
+                                out.close()
+                                out = None
+                            completed, upload = upload, None
+                            yield completed
+
+                elif isinstance(event, Epilogue):
+                    return
+
+                event = decoder.next_event()
+
+            if not chunk:
+                raise ValueError("Multipart body ended unexpectedly")
+    finally:
+        # Client disconnected, limit hit, or the consumer stopped early
+        discard()
@@ -0,0 +1,330 @@
+"""On-demand cProfile of matching requests and a sampling profiler of all threads, for admins."""
+import cProfile
+import functools
+import hmac
+import io
+import marshal
+import os
+import pstats
+import sys
+import threading
+import time
+import uuid
+from collections import Counter, OrderedDict
+from flask import g, request, jsonify
+from app.metrics import metrics
+from app import tracing
+from config import Config
+
+# Profiles kept in memory, oldest dropped first
+MAX_PROFILES = 50
+MAX_SAMPLE_SECONDS = 300
+MIN_SAMPLE_INTERVAL_MS = 1
+
+_profiles = OrderedDict()
+_profiles_lock = threading.Lock()
+
+# Only one cProfile may run at a time (and on 3.12+ it is process-wide), so
+# a request that finds it busy simply goes unprofiled
+_cprofile_lock = threading.Lock()
+
+
+class ProfilingError(Exception):
+    """Bad profiling request; `status` is the HTTP status to return"""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+class Profile:
+    def __init__(self, kind, **info):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.created = time.time()
+        self.status = 'running'
+        self.info = info
+        self.stats = None
+        self.stacks = None
+
+    def to_dict(self):
+        return dict(
+            self.info,
+            id=self.id,
+            kind=self.kind,
+            status=self.status,
+            created=self.created,
+            formats=['pstats', 'text'] if self.kind == 'request' else ['collapsed']
+        )
+
+
+def _store(profile):
+    with _profiles_lock:
+        _profiles[profile.id] = profile
+        while len(_profiles) > MAX_PROFILES:
+            _profiles.popitem(last=False)
+
+
+def list_profiles():
+    with _profiles_lock:
+        return [profile.to_dict() for profile in reversed(_profiles.values())]
+
+
+def get_profile(profile_id):
+    with _profiles_lock:
+        return _profiles.get(profile_id)
+
+
+def check_admin_token(token):
+    """True only when ADMIN_TOKEN is configured and `token` matches it"""
+    if not Config.ADMIN_TOKEN or not token:
+        return False
+    return hmac.compare_digest(token.encode(), Config.ADMIN_TOKEN.encode())
+
+
+def admin_only(view):
+    """404 unless profiling is enabled, 403 without a valid X-Admin-Token"""
+
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        if not Config.PROFILING_ENABLED:
+            return jsonify({'error': 'Profiling is disabled'}), 404
+        if not check_admin_token(request.headers.get('X-Admin-Token')):
+            return jsonify({'error': 'Admin token required'}), 403
+        try:
+            return view(*args, **kwargs)
+        except ProfilingError as e:
+            return jsonify({'error': str(e)}), e.status
+
+    return wrapper
+
+
+# Per-request cProfile
+
+class RequestRule:
+    """Profile the next `count` requests matching a path prefix and/or endpoint before `expires`"""
+
+    def __init__(self, path_prefix=None, endpoint=None, count=10, ttl=600):
+        if not path_prefix and not endpoint:
+            raise ProfilingError("Give a path_prefix or an endpoint to match")
+        self.path_prefix = path_prefix
+        self.endpoint = endpoint
+        self.remaining = max(1, int(count))
+        self.expires = time.time() + float(ttl)
+
+    def take(self, path, endpoint):
+        if time.time() > self.expires or self.remaining <= 0:
+            return False
+        if self.path_prefix and not path.startswith(self.path_prefix):
+            return False
+        if self.endpoint and endpoint != self.endpoint:
+            return False
+        self.remaining -= 1
+        return True
+
+    def to_dict(self):
+        return {
+            'path_prefix': self.path_prefix,
+            'endpoint': self.endpoint,
+            'remaining': self.remaining,
+            'expires': self.expires
+        }
+
+
+_rule = None
+_rule_lock = threading.Lock()
+
+
+def arm(path_prefix=None, endpoint=None, count=10, ttl=600):
+    global _rule
+    rule = RequestRule(path_prefix, endpoint, count, ttl)
+    with _rule_lock:
+        _rule = rule
+    return rule.to_dict()
+
+
+def disarm():
+    global _rule
+    with _rule_lock:
+        _rule = None
+
+
+def armed_rule():
+    with _rule_lock:
+        if _rule is None or _rule.remaining <= 0 or time.time() > _rule.expires:
+            return None
+        return _rule.to_dict()
+
+
+def _should_profile():
+    if request.headers.get('X-Profile') == '1' and check_admin_token(request.headers.get('X-Admin-Token')):
+        return True
+    rule = _rule
+    if rule is None:
+        return False
+    with _rule_lock:
+        return rule.take(request.path, request.endpoint)
+
+
+def _finish_request_profile(state, status_code=None):
+    profiler, profile, started = state
+    profiler.disable()
+    _cprofile_lock.release()
+    profile.info['duration_ms'] = round((time.perf_counter() - started) * 1000, 3)
+    profile.info['status_code'] = status_code
+    profile.stats = pstats.Stats(profiler)
+    profile.status = 'done'
+    _store(profile)
+    metrics.inc('profiling.requests')
+
+
+# Sampling profiler
+
+def _frame_stack(frame):
+    stack = []
+    while frame is not None:
+        code = frame.f_code
+        stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}:{code.co_firstlineno}")
+        frame = frame.f_back
+    stack.reverse()
+    return stack
+
+
+class Sampler:
+    """Counts collapsed stacks of every other thread every `interval` seconds"""
+
+    def __init__(self, profile, seconds, interval):
+        self.profile = profile
+        self.seconds = seconds
+        self.interval = interval
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='profiling-sampler', daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        stacks = Counter()
+        own = threading.get_ident()
+        deadline = time.monotonic() + self.seconds
+        try:
+            while not self._stop.is_set() and time.monotonic() < deadline:
+                names = {thread.ident: thread.name for thread in threading.enumerate()}
+                for ident, frame in sys._current_frames().items():
+                    if ident == own:
+                        continue
+                    thread_name = names.get(ident, str(ident)).replace(';', '_')
+                    stacks[';'.join([thread_name] + _frame_stack(frame))] += 1
+                self.samples += 1
+                self._stop.wait(self.interval)
+        finally:
+            self.profile.stacks = stacks
+            self.profile.info['samples'] = self.samples
+            self.profile.status = 'done'
+            metrics.inc('profiling.samples')
+            _end_sampler(self)
+
+
+_sampler = None
+_sampler_lock = threading.Lock()
+
+
+def _end_sampler(sampler):
+    global _sampler
+    with _sampler_lock:
+        if _sampler is sampler:
+            _sampler = None
+
+
+def start_sampling(seconds=10, interval_ms=10):
+    """Sample all threads for `seconds` in the background; returns the pending profile"""
+    global _sampler
+    seconds = float(seconds)
+    interval_ms = float(interval_ms)
+    if not 0 < seconds <= MAX_SAMPLE_SECONDS:
+        raise ProfilingError(f"seconds must be between 0 and {MAX_SAMPLE_SECONDS}")
+    if interval_ms < MIN_SAMPLE_INTERVAL_MS:
+        raise ProfilingError(f"interval_ms must be at least {MIN_SAMPLE_INTERVAL_MS}")
+
+    with _sampler_lock:
+        if _sampler is not None:
+            raise ProfilingError("A sampling profile is already running", 409)
+        profile = Profile('sample', seconds=seconds, interval_ms=interval_ms, pid=os.getpid())
+        _store(profile)
+        _sampler = Sampler(profile, seconds, interval_ms / 1000.0)
+        _sampler.start()
+    return profile
+
+
+def stop_sampling():
+    with _sampler_lock:
+        sampler = _sampler
+    if sampler is None:
+        return False
+    sampler.stop()
+    return True
+
+
+# Output
+
+def render(profile, fmt):
+    """(body, mimetype, filename) of a finished profile in the requested format"""
+    if profile.status != 'done':
+        raise ProfilingError("Profile is still running", 409)
+
+    if profile.kind == 'request' and fmt == 'pstats':
+        # Same layout as Stats.dump_stats, readable by pstats/snakeviz
+        return marshal.dumps(profile.stats.stats), 'application/octet-stream', f"{profile.id}.pstats"
+    if profile.kind == 'request' and fmt == 'text':
+        out = io.StringIO()
+        stats = pstats.Stats(stream=out)
+        stats.add(profile.stats)
+        stats.sort_stats('cumulative').print_stats(50)
+        return out.getvalue(), 'text/plain', f"{profile.id}.txt"
+    if profile.kind == 'sample' and fmt == 'collapsed':
+        lines = [f"{stack} {count}" for stack, count in profile.stacks.most_common()]
+        return '\n'.join(lines) + '\n', 'text/plain', f"{profile.id}.collapsed"
+    raise ProfilingError(f"Format '{fmt}' is not available for {profile.kind} profiles")
+
+
+def init_app(app):
+    """Install the per-request profiling hooks; nothing is installed when disabled"""
+    if not Config.PROFILING_ENABLED:
+        return
+
+    @app.before_request
+    def start_request_profile():
+        if not _should_profile():
+            return
+        if not _cprofile_lock.acquire(blocking=False):
+            metrics.inc('profiling.skipped_busy')
+            return
+        profile = Profile(
+            'request',
+            method=request.method,
+            path=request.path,
+            endpoint=request.endpoint,
+            trace_id=tracing.trace_id()
+        )
+        profiler = cProfile.Profile()
+        g.profiling = (profiler, profile, time.perf_counter())
+        profiler.enable()
+
+    @app.after_request
+    def finish_request_profile(response):
+        state = g.pop('profiling', None)
+        if state is not None:
+            # Streamed bodies are produced after this point and are not included
+            _finish_request_profile(state, response.status_code)
+            response.headers['X-Profile-Id'] = state[1].id
+        return response
+
+    @app.teardown_request
+    def abandon_request_profile(error=None):
+        state = g.pop('profiling', None)
+        if state is not None:
+            _finish_request_profile(state)
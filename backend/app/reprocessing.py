@@ -0,0 +1,214 @@
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+import cv2
+import numpy as np
+from app import db
+from app.models import Reports, Analyses, ReportScores
+from config import Config
+from predict import CLIENT, summarize_predictions
+
+UPLOAD_FOLDER = Config.UPLOAD_FOLDER
+
+# ReportScores.source: what the new model was shown
+SOURCE_ORIGINAL = 'original'
+SOURCE_ANNOTATED = 'annotated'
+
+
+def load_checkpoint(path, model_id):
+    """Last report id known to be fully handled for this model, or 0"""
+    if not path or not os.path.exists(path):
+        return 0
+    with open(path) as checkpoint_file:
+        checkpoint = json.load(checkpoint_file)
+    return checkpoint.get('last_id', 0) if checkpoint.get('model_id') == model_id else 0
+
+
+def save_checkpoint(path, model_id, last_id, stats):
+    if not path:
+        return
+    temp_path = f"{path}.tmp"
+    with open(temp_path, 'w') as checkpoint_file:
+        json.dump({'model_id': model_id, 'last_id': last_id, **stats}, checkpoint_file)
+    os.replace(temp_path, path)
+
+
+def _pending_query(model_id, after_id):
+    """Reports after `after_id` that have no score for `model_id` yet"""
+    scored = db.select(ReportScores.id).where(
+        ReportScores.report_id == Reports.id,
+        ReportScores.model_id == model_id
+    ).exists()
+    return db.select(Reports.id).where(Reports.id > after_id, ~scored)
+
+
+def _load_image(report_id, allow_annotated=False):
+    """
+    (image bytes, source) for a report: the original upload behind it, or,
+    only when `allow_annotated` is set, the stored annotated image, which
+    has the previous model's boxes drawn on it. (None, None) if neither.
+    """
+    row = db.session.execute(
+        db.select(Analyses.image_name).where(Analyses.report_id == report_id).limit(1)
+    ).first()
+    if row is not None:
+        path = os.path.join(UPLOAD_FOLDER, row.image_name)
+        if os.path.exists(path):
+            with open(path, 'rb') as img_file:
+                return img_file.read(), SOURCE_ORIGINAL
+    if not allow_annotated:
+        return None, None
+    image_data = db.session.execute(
+        db.select(Reports.image_data).where(Reports.id == report_id)
+    ).scalar()
+    return (image_data, SOURCE_ANNOTATED) if image_data else (None, None)
+
+
+def score_image(image_bytes, model_id):
+    """Decode and re-run inference for one image; runs on a worker thread"""
+    img = cv2.imdecode(np.frombuffer(image_bytes, dtype=np.uint8), cv2.IMREAD_COLOR)
+    if img is None:
+        raise ValueError("Failed to decode image")
+    height, width = img.shape[:2]
+    result = CLIENT.infer(img, model_id=model_id)
+    preds = result.get("predictions", [])
+    return summarize_predictions(preds, width, height), preds
+
+
+class Reprocessor:
+    """
+    Re-scores stored report images with another model. At most `workers`
+    inferences run at once and at most `workers * 2` images are held in
+    memory. Scores are written next to the old ones in ReportScores. Progress
+    is resumable: already-scored reports are skipped, and the checkpoint
+    records the highest id below which everything is done.
+
+    Reports whose original upload is gone are skipped and counted, since
+    their stored image carries the old model's boxes; `allow_annotated`
+    scores that image instead, recorded with source 'annotated'.
+    """
+
+    def __init__(self, model_id, workers=4, page_size=500, commit_every=100,
+                 checkpoint_path=None, limit=None, progress=None, progress_interval=5,
+                 allow_annotated=False):
+        self.model_id = model_id
+        self.workers = workers
+        self.page_size = page_size
+        self.commit_every = commit_every
+        self.checkpoint_path = checkpoint_path
+        self.limit = limit
+        self.progress = progress or (lambda message: None)
+        self.progress_interval = progress_interval
+        self.allow_annotated = allow_annotated
+        self.stats = {'processed': 0, 'failed': 0, 'skipped_no_original': 0}
+
+    def _report_ids(self, after_id):
+        """Keyset-paginate pending report ids so huge tables are never loaded at once"""
+        yielded = 0
+        while True:
+            ids = db.session.execute(
+                _pending_query(self.model_id, after_id).order_by(Reports.id).limit(self.page_size)
+            ).scalars().all()
+            if not ids:
+                return
+            for report_id in ids:
+                if self.limit is not None and yielded >= self.limit:
+                    return
+                yield report_id
+                yielded += 1
+            after_id = ids[-1]
+
+    def run(self):
+        start_after = load_checkpoint(self.checkpoint_path, self.model_id)
+        total = db.session.execute(
+            db.select(db.func.count()).select_from(_pending_query(self.model_id, start_after).subquery())
+        ).scalar()
+        if self.limit is not None:
+            total = min(total, self.limit)
+
+        self.progress(f"Re-scoring {total} reports with {self.model_id} using {self.workers} workers")
+        started = last_report = time.monotonic()
+        in_flight = {}
+        scores = []
+        checkpoint_id = last_submitted = start_after
+
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            ids = self._report_ids(start_after)
+            exhausted = False
+
+            while in_flight or not exhausted:
+                while not exhausted and len(in_flight) < self.workers * 2:
+                    report_id = next(ids, None)
+                    if report_id is None:
+                        exhausted = True
+                        break
+                    last_submitted = report_id
+                    image_bytes, source = _load_image(report_id, self.allow_annotated)
+                    if not image_bytes:
+                        self.stats['skipped_no_original'] += 1
+                        continue
+                    in_flight[executor.submit(score_image, image_bytes, self.model_id)] = (report_id, source)
+
+                if not in_flight:
+                    break
+
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    report_id, source = in_flight.pop(future)
+                    try:
+                        summary, preds = future.result()
+                    except Exception as e:
+                        self.stats['failed'] += 1
+                        self.progress(f"  report {report_id} failed: {str(e)}")
+                        continue
+                    scores.append({
+                        'report_id': report_id,
+                        'model_id': self.model_id,
+                        'ai_confidence': int(summary['confidence']),
+                        'fill_level': summary['fillLevel'],
+                        'priority': summary['urgency'],
+                        'waste_type': summary['wasteType'],
+                        'predictions': json.dumps(preds),
+                        'source': source
+                    })
+                    self.stats['processed'] += 1
+
+                # Ids are submitted in order, so everything below the oldest in-flight id is finished
+                checkpoint_id = min(report_id for report_id, _ in in_flight.values()) - 1 if in_flight else last_submitted
+
+                if len(scores) >= self.commit_every:
+                    self._flush(scores, checkpoint_id)
+                    scores = []
+
+                now = time.monotonic()
+                if now - last_report >= self.progress_interval:
+                    last_report = now
+                    self._report_progress(total, started)
+
+        self._flush(scores, None)
+        self._report_progress(total, started)
+        return self.stats
+
+    def _flush(self, scores, checkpoint_id):
+        if scores:
+            db.session.execute(db.insert(ReportScores), scores)
+            db.session.commit()
+        if checkpoint_id is not None:
+            save_checkpoint(self.checkpoint_path, self.model_id, checkpoint_id, self.stats)
+        elif self.checkpoint_path and os.path.exists(self.checkpoint_path):
+            # Finished: nothing left below any id, the skip-scored filter covers reruns
+            os.remove(self.checkpoint_path)
+
+    def _report_progress(self, total, started):
+        elapsed = max(time.monotonic() - started, 1e-6)
+        handled = self.stats['processed'] + self.stats['failed'] + self.stats['skipped_no_original']
+        rate = handled / elapsed
+        remaining = max(total - handled, 0)
+        eta = remaining / rate if rate else float('inf')
+        eta_text = time.strftime('%H:%M:%S', time.gmtime(eta)) if eta != float('inf') else '--:--:--'
+        self.progress(
+            f"  {handled}/{total} done ({self.stats['failed']} failed, "
+            f"{self.stats['skipped_no_original']} without an original), "
+            f"{rate:.1f} images/s, ETA {eta_text}"
+        )
@@ -0,0 +1,141 @@
+import heapq
+import os
+import threading
+import time
+from app import db
+from app.models import Reports, Analyses
+from config import Config
+
+
+class RetentionManager:
+    """
+    Age- and size-based eviction for the uploads/ and results/ folders.
+
+    Files named by a report (Reports.image_name) and the original uploads
+    behind reports (Analyses.image_name of analyses linked to one, which
+    styled renders and reprocessing read) are never deleted, and files
+    younger than `min_age_seconds` are skipped so in-flight analyses keep
+    their images. Folders are walked with os.scandir, and the size pass keeps
+    only the files it is about to delete in memory, so the scan stays flat on
+    directories with millions of entries.
+    """
+
+    def __init__(self, folders=None, max_age_days=None, max_bytes=None,
+                 min_age_seconds=None, dry_run=False):
+        self.folders = folders or [Config.UPLOAD_FOLDER, Config.RESULTS_FOLDER]
+        self.max_age_days = Config.RETENTION_MAX_AGE_DAYS if max_age_days is None else max_age_days
+        self.max_bytes = Config.RETENTION_MAX_BYTES if max_bytes is None else max_bytes
+        self.min_age_seconds = Config.RETENTION_MIN_AGE_SECONDS if min_age_seconds is None else min_age_seconds
+        self.dry_run = dry_run
+
+    def referenced_names(self, batch_size=10000):
+        """File names that must survive, streamed from the database"""
+        names = set()
+        query = db.select(Reports.image_name).where(Reports.image_name.isnot(None))
+        for (name,) in db.session.execute(query.execution_options(yield_per=batch_size)):
+            names.add(name)
+        query = db.select(Analyses.image_name).where(Analyses.report_id.isnot(None))
+        for (name,) in db.session.execute(query.execution_options(yield_per=batch_size)):
+            names.add(name)
+        return names
+
+    def _candidates(self, referenced, now):
+        """Yield (mtime, size, path) for every unreferenced file old enough to touch"""
+        for folder in self.folders:
+            with os.scandir(folder) as entries:
+                for entry in entries:
+                    if entry.name in referenced:
+                        continue
+                    try:
+                        if not entry.is_file(follow_symlinks=False):
+                            continue
+                        stat = entry.stat(follow_symlinks=False)
+                    except FileNotFoundError:
+                        continue
+                    if now - stat.st_mtime < self.min_age_seconds:
+                        continue
+                    yield stat.st_mtime, stat.st_size, entry.path
+
+    def _delete(self, path, summary, reason):
+        if not self.dry_run:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                return False
+        summary['deleted'] += 1
+        summary[f'deleted_by_{reason}'] += 1
+        if len(summary['sample']) < 20:
+            summary['sample'].append(os.path.basename(path))
+        return True
+
+    def run(self):
+        """Run one sweep and return a summary of what was (or would be) deleted"""
+        started = time.monotonic()
+        now = time.time()
+        referenced = self.referenced_names()
+        cutoff = now - self.max_age_days * 86400 if self.max_age_days else None
+
+        summary = {
+            'dry_run': self.dry_run,
+            'scanned': 0,
+            'deleted': 0,
+            'deleted_by_age': 0,
+            'deleted_by_size': 0,
+            'freed_bytes': 0,
+            'remaining_bytes': 0,
+            'sample': []
+        }
+
+        # Pass 1: age-based eviction while totalling what remains
+        remaining = 0
+        for mtime, size, path in self._candidates(referenced, now):
+            summary['scanned'] += 1
+            if cutoff is not None and mtime < cutoff:
+                if self._delete(path, summary, 'age'):
+                    summary['freed_bytes'] += size
+                continue
+            remaining += size
+
+        # Pass 2: if still over budget, delete the oldest files covering the overflow.
+        # A max-heap on mtime keeps only the files that will actually be removed.
+        overflow = remaining - self.max_bytes if self.max_bytes else 0
+        if overflow > 0:
+            oldest = []
+            held = 0
+            for mtime, size, path in self._candidates(referenced, now):
+                if cutoff is not None and mtime < cutoff:
+                    continue
+                heapq.heappush(oldest, (-mtime, size, path))
+                held += size
+                while oldest and held - oldest[0][1] >= overflow:
+                    held -= heapq.heappop(oldest)[1]
+
+            for _, size, path in oldest:
+                if self._delete(path, summary, 'size'):
+                    summary['freed_bytes'] += size
+                    remaining -= size
+
+        summary['remaining_bytes'] = remaining
+        summary['duration_seconds'] = round(time.monotonic() - started, 3)
+        return summary
+
+
+def start_background(app, interval=None):
+    """Run retention sweeps on a daemon thread for the life of the process"""
+    interval = interval or Config.RETENTION_INTERVAL_SECONDS
+
+    def loop():
+        while True:
+            time.sleep(interval)
+            with app.app_context():
+                try:
+                    summary = RetentionManager(dry_run=Config.RETENTION_DRY_RUN).run()
+                    print(f"Retention sweep: {summary}")
+                except Exception as e:
+                    print(f"Error running retention sweep: {str(e)}")
+                finally:
+                    db.session.remove()
+
+    thread = threading.Thread(target=loop, name='retention', daemon=True)
+    thread.start()
+    return thread
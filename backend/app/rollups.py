@@ -0,0 +1,184 @@
+from datetime import datetime, timezone
+from app import db
+from app.models import Reports, ReportRollupHourly, ReportRollupDaily
+from sqlalchemy import func
+
+ROLLUPS = {
+    'hour': ReportRollupHourly,
+    'day': ReportRollupDaily
+}
+
+
+def bucket_start(timestamp, granularity):
+    """Truncate a timestamp to the start of its hourly or daily bucket (naive UTC)"""
+    if timestamp is None:
+        timestamp = datetime.now(timezone.utc)
+    if timestamp.tzinfo is not None:
+        timestamp = timestamp.astimezone(timezone.utc).replace(tzinfo=None)
+
+    if granularity == 'day':
+        return timestamp.replace(hour=0, minute=0, second=0, microsecond=0)
+    return timestamp.replace(minute=0, second=0, microsecond=0)
+
+
+def _report_key(report):
+    return {
+        'location': report.location,
+        'priority': report.priority,
+        'status': report.status,
+        'waste_type': report.waste_type or 'Unknown'
+    }
+
+
+class RollupDelta:
+    """
+    Net rollup changes for many reports, applied with one lookup per touched
+    rollup row instead of one per report. Add each report's old state with
+    sign=-1 before changing it and its new state with sign=1 afterwards.
+    """
+
+    def __init__(self):
+        self.rows = {}
+
+    def add(self, report, sign=1):
+        key = _report_key(report)
+        confidence = report.ai_confidence or 0
+        fill_level = report.fill_level
+        for granularity in ROLLUPS:
+            row_key = (granularity, bucket_start(report.reportedAt, granularity), *key.values())
+            entry = self.rows.setdefault(row_key, [0, 0.0, 0.0, 0])
+            entry[0] += sign
+            entry[1] += sign * confidence
+            if fill_level is not None:
+                entry[2] += sign * fill_level
+                entry[3] += sign
+
+    def apply(self):
+        """Write the net changes inside the caller's transaction; the caller commits"""
+        for (granularity, bucket, *values), (count, confidence_sum, fill_level_sum, fill_level_count) \
+                in self.rows.items():
+            if not count and not confidence_sum and not fill_level_sum and not fill_level_count:
+                continue
+            model = ROLLUPS[granularity]
+            key = dict(zip(('location', 'priority', 'status', 'waste_type'), values))
+            row = model.query.filter_by(bucket=bucket, **key).first()
+
+            if row is None:
+                if count < 0:
+                    continue
+                row = model(
+                    bucket=bucket,
+                    count=0,
+                    confidence_sum=0,
+                    fill_level_sum=0,
+                    fill_level_count=0,
+                    **key
+                )
+                db.session.add(row)
+
+            row.count += count
+            row.confidence_sum += confidence_sum
+            row.fill_level_sum += fill_level_sum
+            row.fill_level_count += fill_level_count
+
+            if row.count <= 0:
+                db.session.delete(row)
+        self.rows.clear()
+
+
+def apply_report(report, sign=1):
+    """
+    Add (sign=1) or remove (sign=-1) a report's contribution to every rollup.
+    Runs inside the caller's transaction; the caller commits.
+    """
+    delta = RollupDelta()
+    delta.add(report, sign)
+    delta.apply()
+
+
+def backfill(granularities=None, batch_size=1000):
+    """Rebuild rollups from scratch by streaming Reports once"""
+    granularities = granularities or list(ROLLUPS)
+    totals = {granularity: {} for granularity in granularities}
+
+    rows = db.session.execute(
+        db.select(
+            Reports.reportedAt,
+            Reports.location,
+            Reports.priority,
+            Reports.status,
+            Reports.waste_type,
+            Reports.ai_confidence,
+            Reports.fill_level
+        ).execution_options(yield_per=batch_size)
+    )
+
+    scanned = 0
+    for reported_at, location, priority, status, waste_type, confidence, fill_level in rows:
+        scanned += 1
+        for granularity in granularities:
+            key = (bucket_start(reported_at, granularity), location, priority, status, waste_type or 'Unknown')
+            entry = totals[granularity].setdefault(key, [0, 0.0, 0.0, 0])
+            entry[0] += 1
+            entry[1] += confidence or 0
+            if fill_level is not None:
+                entry[2] += fill_level
+                entry[3] += 1
+
+    for granularity in granularities:
+        model = ROLLUPS[granularity]
+        db.session.execute(db.delete(model))
+        values = [{
+            'bucket': bucket,
+            'location': location,
+            'priority': priority,
+            'status': status,
+            'waste_type': waste_type,
+            'count': count,
+            'confidence_sum': confidence_sum,
+            'fill_level_sum': fill_level_sum,
+            'fill_level_count': fill_level_count
+        } for (bucket, location, priority, status, waste_type),
+              (count, confidence_sum, fill_level_sum, fill_level_count) in totals[granularity].items()]
+        if values:
+            db.session.execute(db.insert(model), values)
+
+    db.session.commit()
+    return scanned, {granularity: len(totals[granularity]) for granularity in granularities}
+
+
+def timeseries(granularity, start=None, end=None, filters=None, group_by=()):
+    """Read aggregated buckets from the rollup table only"""
+    model = ROLLUPS[granularity]
+    group_columns = [getattr(model, column) for column in group_by]
+
+    query = db.session.query(
+        model.bucket,
+        *group_columns,
+        func.sum(model.count),
+        func.sum(model.confidence_sum),
+        func.sum(model.fill_level_sum),
+        func.sum(model.fill_level_count)
+    )
+
+    if start is not None:
+        query = query.filter(model.bucket >= bucket_start(start, granularity))
+    if end is not None:
+        query = query.filter(model.bucket <= bucket_start(end, granularity))
+    for column, value in (filters or {}).items():
+        query = query.filter(getattr(model, column) == value)
+
+    query = query.group_by(model.bucket, *group_columns).order_by(model.bucket)
+
+    points = []
+    for row in query.all():
+        bucket = row[0]
+        groups = row[1:1 + len(group_columns)]
+        count, confidence_sum, fill_level_sum, fill_level_count = row[1 + len(group_columns):]
+        point = {'bucket': bucket.isoformat()}
+        point.update(dict(zip(group_by, groups)))
+        point['count'] = int(count or 0)
+        point['avg_confidence'] = round(confidence_sum / count, 2) if count else 0
+        point['avg_fill_level'] = round(fill_level_sum / fill_level_count, 2) if fill_level_count else None
+        points.append(point)
+    return points
@@ -1,18 +1,23 @@
 import uuid
 from app import app,db
-from app.models import User,Cameras,Statistics,Reports
-from predict import predict_and_annotate
+from app.models import User,Cameras,Statistics,Reports,FillReading,Detections,Analyses,ReportScores,ReportStatusChange
+from app import rollups, fill_levels, derivatives, export, analyses, routing, zones, tiles, admission, multipart, tracing, profiling, camera_health, versions, serialization, sla, video
+from app.metrics import metrics
+from predict import predict_and_annotate, categorize_fullness
 from config import Config
-from flask import request, jsonify, send_from_directory
-from datetime import datetime
+from flask import request, jsonify, send_from_directory, Response, stream_with_context
+from datetime import datetime, timezone
 import base64
+import math
 from sqlalchemy import func
+from sqlalchemy.orm import load_only
 
 import os 
 CLIENT = Config.CLIENT
 MODEL_ID = Config.MODEL_ID
 RESULTS_FOLDER = Config.RESULTS_FOLDER
 UPLOAD_FOLDER = Config.UPLOAD_FOLDER
+DERIVATIVES_FOLDER = Config.DERIVATIVES_FOLDER
 import uuid
 @app.route("/api/health", methods=["GET"])
 def health_check():
@@ -24,7 +29,14 @@ def health_check():
     })
 
 
+@app.route("/api/metrics", methods=["GET"])
+def get_metrics():
+    """Process-local counters, gauges and histograms"""
+    return jsonify(metrics.snapshot())
+
+
 @app.route("/api/analyze", methods=["POST"])
+@admission.admit()
 def analyze_image():
     """
     Main analysis endpoint for React frontend
@@ -46,7 +58,7 @@ def analyze_image():
         }), 400
 
     # Save uploaded file
-    file_ext = file.filename.rsplit('.', 1)[1].lower() if '.' in file.filename else 'jpg'
+    file_ext = multipart.safe_extension(file.filename)
     filename = f"{uuid.uuid4().hex}.{file_ext}"
     filepath = os.path.join(UPLOAD_FOLDER, filename)
     file.save(filepath)
@@ -69,19 +81,38 @@ def analyze_image():
         # Determine priority based on fullness
        
         
+        # Keep every fill reading and the raw detections, not just the ones that become reports
+        analysis = None
+        try:
+            with tracing.span('save_analysis'):
+                analysis = analyses.record_analysis(results, filename, location=request.form.get('location', 'Nairobi'))
+                fill_levels.record_reading(
+                    fill_levels.resolve_bin_id(request.form, 'Nairobi'),
+                    fullness,
+                    camera_id=request.form.get('camera_id')
+                )
+                db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            analysis = None
+            print(f"Error saving analysis: {str(e)}")
+        
         # Only save report if fullness > 50%
-        report_saved = False
         report_id = None
         
         if fullness > 50:
             try:
-                # Read the annotated image file
-                annotated_image_path = os.path.join(RESULTS_FOLDER, results['output_image'])
-                with open(annotated_image_path, 'rb') as img_file:
+                # Reports keep their annotated image, so render it now
+                with tracing.span('render_annotated'):
+                    rendered = analyses.ensure_rendered(results['output_image'])
+                if rendered is None:
+                    raise ValueError("Failed to render annotated image")
+                with open(os.path.join(*rendered), 'rb') as img_file:
                     img_byte_arr = img_file.read()
                 
                 # Extract location from request if provided
                 location = request.form.get('location', 'Nairobi')
+                latitude, longitude = routing.coordinates_from(request.form)
                 
                 # Create new report
                 new_report = Reports(
@@ -90,15 +121,32 @@ def analyze_image():
                     status="Pending",
                     ai_confidence=int(confidence_percent),
                     image_data=img_byte_arr,
-                    image_name=results['output_image']
+                    image_name=results['output_image'],
+                    waste_type=detected_class,
+                    fill_level=fullness,
+                    latitude=latitude,
+                    longitude=longitude
                 )
                 
                 db.session.add(new_report)
+                db.session.flush()
+                rollups.apply_report(new_report)
+                sla.record_status(new_report, None)
+                if analysis is not None:
+                    analyses.link_report(analysis, new_report.id)
                 db.session.commit()
                 
-                report_saved = True
                 report_id = new_report.id
                 
+                # Urgent stops are slotted into the live routes straight away
+                if latitude is not None:
+                    with tracing.span('dispatch'):
+                        results["route"] = dispatch_report_change(report_id, new_report)
+                
+                # Thumbnail is what listings show first, so render it now
+                with tracing.span('thumbnail'):
+                    derivatives.pregenerate(f"report-{report_id}", img_byte_arr)
+                
                 # Update statistics
                 update_statistics()
                 
@@ -107,128 +155,330 @@ def analyze_image():
                 print(f"Error saving report: {str(e)}")
                 # Continue even if report saving fails
         
-        # Prepare response
-        response_data = {
-            'success': True,
-            'data': {
-                'results': results,
-                'fullness': fullness,
-                'detected_class': detected_class,
-                'confidence': f"{confidence_percent:.2f}%",
-                'confidence_value': confidence_percent,
-                'priority': priority,
-                'annotated_image_url': results["annotated_image_url"],
-                'report_saved': report_saved,
-                'report_id': report_id,
-                'save_threshold': 50,
-                'message': f"Report {'saved' if report_saved else 'not saved'} - Fullness: {fullness}%"
-            }
-        }
-        print(response_data)
-        return jsonify(results), 200
+        return serialization.json_response(results)
     else:
+        return analysis_failed(results)
+
+
+def analysis_failed(results):
+    """Upstream inference outages are 503 with Retry-After; anything else is a 500"""
+    if not results.get("retryable"):
         return jsonify(results), 500
+    
+    response = jsonify(results)
+    response.status_code = 503
+    response.headers['Retry-After'] = str(results.get("retry_after", 5))
+    return response
 
 
 @app.route("/api/results/<filename>", methods=["GET"])
 def get_result_image(filename):
-    """Serve annotated result images"""
-    return send_from_directory(RESULTS_FOLDER, filename)
+    """
+    Serve annotated result images
+    Optional query: size=thumb|medium, format=jpeg|webp,
+    color=RRGGBB, labels=0|1, thickness=1..10
+    """
+    try:
+        style = analyses.style_from_args(request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    size = request.args.get('size')
+    if not size:
+        # Annotated images are drawn from the stored detections on first view
+        rendered = analyses.ensure_rendered(filename, style)
+        if rendered is None:
+            return jsonify({'error': 'Image not found'}), 404
+        return send_from_directory(*rendered)
+    
+    def load_source():
+        rendered = analyses.ensure_rendered(filename)
+        if rendered is None:
+            raise LookupError(filename)
+        with open(os.path.join(*rendered), 'rb') as img_file:
+            return img_file.read()
+    
+    return serve_derivative(f"result-{os.path.splitext(os.path.basename(filename))[0]}", load_source, size)
+
+
+def serve_derivative(source_key, load_source, size):
+    """Resolve a cached derivative and send it with long-lived cache headers"""
+    if size not in derivatives.SIZES:
+        return jsonify({'error': f"size must be one of: {', '.join(derivatives.SIZES)}"}), 400
+    
+    fmt = derivatives.choose_format(request.args.get('format'), request.headers.get('Accept'))
+    
+    try:
+        name = derivatives.get_or_create(source_key, load_source, size, fmt)
+    except (LookupError, FileNotFoundError):
+        return jsonify({'error': 'Image not found'}), 404
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 422
+    
+    response = send_from_directory(
+        DERIVATIVES_FOLDER,
+        name,
+        mimetype=derivatives.FORMATS[fmt][2],
+        max_age=Config.DERIVATIVE_MAX_AGE
+    )
+    if not request.args.get('format'):
+        response.vary.add('Accept')
+    return response
 
 
 @app.route("/api/batch-analyze", methods=["POST"])
+@admission.admit()
 def batch_analyze():
     """
     Batch analysis endpoint for multiple images
+    The multipart body is parsed as it arrives: each image is spooled to disk
+    and analysed before the next one is read, so memory does not grow with
+    the upload. With Accept: application/x-ndjson (or ?stream=1) one JSON
+    line is sent per image as soon as it is done, followed by a summary line.
     """
-    if 'images' not in request.files:
+    boundary = multipart.boundary_of(request)
+    if boundary is None:
         return jsonify({
             "success": False,
             "error": "No images provided"
         }), 400
+    
+    if request.content_length and request.content_length > Config.UPLOAD_MAX_REQUEST_BYTES:
+        return jsonify({
+            "success": False,
+            "error": f"Upload exceeds the {Config.UPLOAD_MAX_REQUEST_BYTES} byte request limit"
+        }), 413
+
+    form = {}
+    uploads = multipart.stream_uploads(request.stream, boundary, form, field='images')
+    summary = {"count": 0, "failed": 0, "reports_saved": 0}
+    aborted = {}
+
+    def batch_results():
+        try:
+            for upload in uploads:
+                yield analyze_batch_upload(upload, form, summary)
+        except multipart.UploadTooLarge as e:
+            summary["error"] = str(e)
+            aborted["status"] = 413
+        except ValueError as e:
+            summary["error"] = str(e)
+            aborted["status"] = 400
+        finally:
+            # Update statistics once after batch processing
+            if summary["reports_saved"] > 0:
+                update_statistics()
+
+    if request.args.get('stream') in ('1', 'true') or \
+            request.accept_mimetypes.best == 'application/x-ndjson':
+        def generate():
+            for result in batch_results():
+                yield serialization.dumps(result) + b"\n"
+            yield serialization.dumps(dict(summary, success="error" not in summary, done=True)) + b"\n"
+        
+        return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+    
+    results = [result for result in batch_results() if result.get("success")]
+    if aborted:
+        return serialization.json_response(dict(summary, success=False, results=results), aborted["status"])
+    
+    return serialization.json_response({
+        "success": True,
+        "count": len(results),
+        "reports_saved": summary["reports_saved"],
+        "results": results
+    })
+
+
+# Per-frame fields returned by the video endpoint
+VIDEO_FRAME_FIELDS = ('frame', 'seconds', 'success', 'fillLevel', 'urgency', 'wasteType', 'confidence', 'predictions', 'error')
 
-    files = request.files.getlist('images')
+
+@app.route("/api/analyze-video", methods=["POST"])
+@admission.admit(cost=lambda: Config.VIDEO_CONCURRENCY)
+def analyze_video():
+    """
+    Video analysis endpoint for recorded clips
+    Expects: multipart/form-data with a 'video' file (form fields first)
+    Frames are sampled every ?interval= seconds (mode=interval, the default)
+    or on scene changes (mode=scene, ?threshold=), at most ?max_frames=,
+    and analysed concurrently. Returns each frame's fill level and a verdict
+    for the clip; the verdict's frame is saved like a batch image (fill
+    reading, and a report when over half full). With Accept:
+    application/x-ndjson (or ?stream=1) frames are sent as they are done.
+    """
+    boundary = multipart.boundary_of(request)
+    if boundary is None:
+        return jsonify({
+            "success": False,
+            "error": "No video provided"
+        }), 400
+    
+    try:
+        mode, interval, threshold, max_frames = video.sampling_options(request.args)
+    except ValueError as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+    
+    form = {}
+    uploads = multipart.stream_uploads(request.stream, boundary, form, field='video',
+                                       max_file_bytes=Config.VIDEO_MAX_FILE_BYTES,
+                                       extensions=multipart.VIDEO_EXTENSIONS, default_extension='mp4')
+    try:
+        upload = next(uploads, None)
+    except multipart.UploadTooLarge as e:
+        return jsonify({"success": False, "error": str(e)}), 413
+    except ValueError as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+    finally:
+        uploads.close()
+    
+    if upload is None:
+        return jsonify({"success": False, "error": "No video provided"}), 400
+    if upload.error:
+        return jsonify({"success": False, "error": upload.error}), 413
+    
+    summary = {"frames": 0, "failed": 0, "reports_saved": 0}
     results = []
-    reports_saved = 0
 
-    for file in files:
-        if file.filename == '':
-            continue
+    def remove_output(result):
+        if result.get("output_image"):
+            video.remove_file(os.path.join(RESULTS_FOLDER, result["output_image"]))
 
-        # Save and analyze each file
-        file_ext = file.filename.rsplit('.', 1)[1].lower() if '.' in file.filename else 'jpg'
-        filename = f"{uuid.uuid4().hex}.{file_ext}"
-        filepath = os.path.join(UPLOAD_FOLDER, filename)
-        file.save(filepath)
+    def frame_results():
+        keep = None
+        try:
+            with tracing.span('video', filename=upload.filename, bytes=upload.size, mode=mode):
+                for result in video.analyze_clip(upload.path, predict_and_annotate, mode, interval, threshold,
+                                                 max_frames, discard=remove_output):
+                    results.append(result)
+                    summary["frames"] += 1
+                    if not result.get("success"):
+                        summary["failed"] += 1
+                    yield {field: result.get(field) for field in VIDEO_FRAME_FIELDS}
+            
+            clip, representative = video.verdict(results, categorize_fullness)
+            if representative is not None:
+                keep = representative["frame_image"]
+                save_batch_analysis(representative, keep, form, summary, default_location='Video Analysis')
+                clip["annotated_image_url"] = representative["annotated_image_url"]
+                clip["report_saved"] = representative["report_saved"]
+                clip["report_id"] = representative.get("report_id")
+                if summary["reports_saved"] > 0:
+                    update_statistics()
+            summary["verdict"] = clip
+        except video.VideoError as e:
+            summary["error"] = str(e)
+        finally:
+            # Only the verdict's frame and its annotated image are kept
+            video.remove_file(upload.path)
+            for result in results:
+                if result["frame_image"] != keep:
+                    video.remove_file(os.path.join(UPLOAD_FOLDER, result["frame_image"]))
+                    remove_output(result)
 
-        analysis = predict_and_annotate(filepath)
-        
-        if analysis.get("success"):
-            analysis["annotated_image_url"] = f"/api/results/{analysis['output_image']}"
-            analysis["original_filename"] = file.filename
+    if request.args.get('stream') in ('1', 'true') or \
+            request.accept_mimetypes.best == 'application/x-ndjson':
+        def generate():
+            for frame in frame_results():
+                yield serialization.dumps(frame) + b"\n"
+            yield serialization.dumps(dict(summary, success=summary.get("verdict") is not None, done=True)) + b"\n"
+        
+        return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+    
+    frames = list(frame_results())
+    if summary.get("verdict") is None:
+        failed = [result for result in results if not result.get("success")]
+        if failed:
+            return analysis_failed(failed[-1])
+        return serialization.json_response(dict(summary, success=False, error=summary.get("error", "No frames could be sampled")), 422)
+    
+    return serialization.json_response(dict(summary, success=True, results=frames))
+
+
+def analyze_batch_upload(upload, form, summary):
+    """Analyse one spooled batch image, save its analysis and maybe a report"""
+    if upload.error:
+        summary["failed"] += 1
+        return {"success": False, "original_filename": upload.filename, "error": upload.error}
+
+    with tracing.span('batch_image', filename=upload.filename, bytes=upload.size):
+        analysis = predict_and_annotate(upload.path)
+    analysis["original_filename"] = upload.filename
+    if not analysis.get("success"):
+        summary["failed"] += 1
+        return analysis
+    
+    summary["count"] += 1
+    return save_batch_analysis(analysis, upload.name, form, summary)
+
+
+def save_batch_analysis(analysis, image_name, form, summary, default_location='Batch Analysis'):
+    """Save a successful analysis and its fill reading, and a report if the bin is over half full"""
+    analysis["annotated_image_url"] = f"/api/results/{analysis['output_image']}"
+    
+    confidence_percent = float(analysis.get("confidence") or 0)
+    fullness = analysis.get("fillLevel") or 0
+    priority = analysis.get("urgency")
+    location = form.get('location', default_location)
+    
+    analysis["priority"] = priority
+    analysis["confidence_percent"] = f"{confidence_percent:.2f}%"
+    
+    try:
+        analysis_row = analyses.record_analysis(analysis, image_name, location=location)
+        fill_levels.record_reading(
+            fill_levels.resolve_bin_id(form, location),
+            fullness,
+            camera_id=form.get('camera_id')
+        )
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        analysis_row = None
+        print(f"Error saving batch analysis: {str(e)}")
+    
+    # Save report if fullness > 50%
+    analysis["report_saved"] = False
+    if fullness > 50:
+        try:
+            rendered = analyses.ensure_rendered(analysis['output_image'])
+            if rendered is None:
+                raise ValueError("Failed to render annotated image")
+            with open(os.path.join(*rendered), 'rb') as img_file:
+                img_byte_arr = img_file.read()
             
-            # Extract details for report
-            first_prediction = analysis.get("predictions", [{}])[0]
-            confidence = first_prediction.get("confidence", 0.0)
-            confidence_percent = float(confidence) * 100
-            fullness = analysis.get("fullness", 0)
+            new_report = Reports(
+                location=location,
+                priority=priority,
+                status="Pending",
+                ai_confidence=int(confidence_percent),
+                image_data=img_byte_arr,
+                image_name=analysis['output_image'],
+                waste_type=analysis.get('wasteType'),
+                fill_level=fullness
+            )
             
-            # Determine priority
-            if fullness <= 20:
-                priority = "Low"
-            elif fullness <= 60:
-                priority = "Medium"
-            else:
-                priority = "High"
+            db.session.add(new_report)
+            db.session.flush()
+            rollups.apply_report(new_report)
+            sla.record_status(new_report, None)
+            if analysis_row is not None:
+                analyses.link_report(analysis_row, new_report.id)
+            db.session.commit()
             
-            analysis["priority"] = priority
-            analysis["confidence_percent"] = f"{confidence_percent:.2f}%"
+            derivatives.pregenerate(f"report-{new_report.id}", img_byte_arr)
             
-            # Save report if fullness > 50%
-            if fullness > 50:
-                try:
-                    annotated_image_path = os.path.join(RESULTS_FOLDER, analysis['output_image'])
-                    with open(annotated_image_path, 'rb') as img_file:
-                        img_byte_arr = img_file.read()
-                    
-                    new_report = Reports(
-                        location='Batch Analysis',
-                        priority=priority,
-                        status="Pending",
-                        ai_confidence=int(confidence_percent),
-                        image_data=img_byte_arr,
-                        image_name=analysis['output_image']
-                    )
-                    
-                    db.session.add(new_report)
-                    db.session.commit()
-                    
-                    analysis["report_saved"] = True
-                    analysis["report_id"] = new_report.id
-                    reports_saved += 1
-                    
-                except Exception as e:
-                    db.session.rollback()
-                    print(f"Error saving batch report: {str(e)}")
-                    analysis["report_saved"] = False
-            else:
-                analysis["report_saved"] = False
+            analysis["report_saved"] = True
+            analysis["report_id"] = new_report.id
+            summary["reports_saved"] += 1
             
-            results.append(analysis)
+        except Exception as e:
+            db.session.rollback()
+            print(f"Error saving batch report: {str(e)}")
     
-    # Update statistics once after batch processing
-    if reports_saved > 0:
-        update_statistics()
-
-    return jsonify({
-        "success": True,
-        "count": len(results),
-        "reports_saved": reports_saved,
-        "results": results
-    }), 200
+    return analysis
     
 
-
 def update_statistics():
     """Helper function to update statistics based on reports"""
     try:
@@ -342,28 +592,33 @@ def add_camera():
 
 
 @app.route('/api/cameras', methods=['GET'])
+@versions.conditional(Cameras)
 def view_cameras():
-    """Get all cameras from the database"""
+    """
+    Get all cameras from the database
+    Query: format=records (default) | compact | columnar for the row layout
+    """
     try:
-        cameras = Cameras.query.all()
+        try:
+            fmt = serialization.requested_format(request.args)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
         
-        cameras_list = [{
-            'id': camera.id,
-            'name': camera.name,
-            'location': camera.location,
-            'status': camera.status,
-            'ipaddress': camera.ipaddress
-        } for camera in cameras]
+        rows = db.session.execute(db.select(
+            Cameras.id, Cameras.name, Cameras.location, Cameras.status, Cameras.ipaddress
+        )).all()
         
-        return jsonify({
-            'count': len(cameras_list),
-            'cameras': cameras_list
-        }), 200
+        return serialization.json_response(
+            serialization.rows_payload(CAMERA_FIELDS, rows, fmt, key='cameras')
+        )
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 
+CAMERA_FIELDS = ('id', 'name', 'location', 'status', 'ipaddress')
+
+
 @app.route('/api/cameras/<int:camera_id>', methods=['GET'])
 def get_camera(camera_id):
     """Get a specific camera by ID"""
@@ -431,37 +686,84 @@ def delete_camera(camera_id):
         return jsonify({'error': str(e)}), 500
 
 
+@app.route('/api/cameras/health', methods=['GET'])
+def camera_health_status():
+    """Latest probe result per camera and a summary of the last sweep"""
+    try:
+        return jsonify(camera_health.get_prober().snapshot()), 200
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/api/cameras/probe', methods=['POST'])
+def probe_cameras():
+    """Probe every camera now and write back any status changes (admin only)"""
+    if not profiling.check_admin_token(request.headers.get('X-Admin-Token')):
+        return jsonify({'error': 'Admin token required'}), 403
+    
+    try:
+        return jsonify(camera_health.get_prober().sweep(min_interval=Config.CAMERA_PROBE_MIN_INTERVAL)), 200
+        
+    except camera_health.SweepThrottled as e:
+        response = jsonify({'error': str(e), 'retry_after': math.ceil(e.retry_after)})
+        response.headers['Retry-After'] = str(math.ceil(e.retry_after))
+        return response, 429
+        
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+
 # ===========================
 # REPORTS ROUTES
 # ===========================
 
 @app.route('/api/reports', methods=['POST'])
 def create_report():
-    """Create a new waste report"""
+    """
+    Create a new waste report
+    Accepts JSON with an optional base64 'image', or multipart/form-data with
+    the same fields and the image as an 'image' file part, which is streamed
+    instead of being held in memory as text.
+    """
     try:
-        data = request.get_json()
+        image_data = None
+        image_name = None
+        
+        if multipart.boundary_of(request) is not None:
+            try:
+                data, image_data, image_name = report_from_multipart()
+            except multipart.UploadTooLarge as e:
+                return jsonify({'error': str(e)}), 413
+            except ValueError as e:
+                return jsonify({'error': str(e)}), 400
+        else:
+            if request.content_length and request.content_length > Config.REPORT_JSON_MAX_BYTES:
+                return jsonify({'error': f'Request exceeds the {Config.REPORT_JSON_MAX_BYTES} byte limit; '
+                                         'send large images as multipart/form-data'}), 413
+            data = request.get_json()
         
         # Validate required fields
         if not data.get('location'):
             return jsonify({'error': 'Location is required'}), 400
         
-        # Handle image data (base64)
-        image_data = None
-        image_name = None
-        
-        if 'image' in data and data['image']:
+        if data.get('image'):
             # Decode base64 image
             try:
                 # Remove data:image/...;base64, prefix if present
-                image_string = data['image']
+                image_string = data.pop('image')
                 if 'base64,' in image_string:
-                    image_string = image_string.split('base64,')[1]
+                    image_string = image_string.partition('base64,')[2]
                 
                 image_data = base64.b64decode(image_string)
+                del image_string
                 image_name = data.get('image_name', f'report_{datetime.now().strftime("%Y%m%d_%H%M%S")}.jpg')
             except Exception as img_error:
                 return jsonify({'error': f'Invalid image data: {str(img_error)}'}), 400
         
+        latitude, longitude = routing.coordinates_from(data)
+        
         # Create new report
         new_report = Reports(
             location=data['location'],
@@ -469,12 +771,22 @@ def create_report():
             status=data.get('status', 'Pending'),
             ai_confidence=data.get('ai_confidence', 0),
             image_data=image_data,
-            image_name=image_name
+            image_name=image_name,
+            waste_type=data.get('waste_type'),
+            fill_level=data.get('fill_level'),
+            latitude=latitude,
+            longitude=longitude
         )
         
         db.session.add(new_report)
+        db.session.flush()
+        rollups.apply_report(new_report)
+        sla.record_status(new_report, None)
         db.session.commit()
         
+        if latitude is not None:
+            dispatch_report_change(new_report.id, new_report)
+        
         # Update statistics after creating report
         update_statistics()
         
@@ -496,21 +808,57 @@ def create_report():
         return jsonify({'error': str(e)}), 500
 
 
+def report_from_multipart():
+    """(fields, image bytes, image name) from a streamed multipart report upload"""
+    data = {}
+    image_data = None
+    image_name = None
+    for upload in multipart.stream_uploads(request.stream, multipart.boundary_of(request), data, field='image'):
+        try:
+            if upload.error:
+                raise multipart.UploadTooLarge(Config.UPLOAD_MAX_FILE_BYTES)
+            with open(upload.path, 'rb') as img_file:
+                image_data = img_file.read()
+            image_name = upload.filename
+        finally:
+            if os.path.exists(upload.path):
+                os.remove(upload.path)
+    
+    # Form values arrive as text
+    if 'ai_confidence' in data:
+        data['ai_confidence'] = int(float(data['ai_confidence']))
+    if 'fill_level' in data:
+        data['fill_level'] = float(data['fill_level'])
+    return data, image_data, data.get('image_name', image_name)
+
+
 @app.route('/api/reports', methods=['GET'])
+@versions.conditional(Reports)
 def get_reports():
-    """Get all reports with optional filtering"""
+    """
+    Get all reports with optional filtering
+    Query: format=records (default) | compact | columnar for the row layout
+    """
     try:
         # Query parameters for filtering
-        status = request.args.get('status')
-        priority = request.args.get('priority')
         limit = request.args.get('limit', type=int)
-        
-        query = Reports.query
-        
-        if status:
-            query = query.filter(Reports.status == status)
-        if priority:
-            query = query.filter(Reports.priority == priority)
+        try:
+            clauses = report_filters_from_args(request.args)
+        except ValueError:
+            return jsonify({'error': 'start and end must be ISO 8601 timestamps'}), 400
+        try:
+            fmt = serialization.requested_format(request.args)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        # Plain columns only: the image blob is never loaded, just tested for NULL
+        query = db.select(
+            Reports.id, Reports.location, Reports.priority, Reports.status,
+            Reports.ai_confidence, Reports.reportedAt,
+            Reports.image_data.isnot(None).label('has_image'),
+            Reports.image_name, Reports.waste_type, Reports.fill_level,
+            Reports.latitude, Reports.longitude
+        ).where(*clauses)
         
         # Order by most recent first
         query = query.order_by(Reports.reportedAt.desc())
@@ -518,28 +866,66 @@ def get_reports():
         if limit:
             query = query.limit(limit)
         
-        reports = query.all()
-        
-        reports_list = [{
-            'id': report.id,
-            'location': report.location,
-            'priority': report.priority,
-            'status': report.status,
-            'ai_confidence': report.ai_confidence,
-            'reportedAt': report.reportedAt.isoformat() if report.reportedAt else None,
-            'has_image': report.image_data is not None,
-            'image_name': report.image_name
-        } for report in reports]
+        rows = [(
+            row.id, row.location, row.priority, row.status, row.ai_confidence,
+            row.reportedAt, row.has_image, row.image_name,
+            f"/api/reports/{row.id}/image/thumb" if row.has_image else None,
+            row.waste_type, row.fill_level, row.latitude, row.longitude
+        ) for row in db.session.execute(query)]
         
-        return jsonify({
-            'count': len(reports_list),
-            'reports': reports_list
-        }), 200
+        return serialization.json_response(
+            serialization.rows_payload(REPORT_LIST_FIELDS, rows, fmt, key='reports')
+        )
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 
+REPORT_LIST_FIELDS = (
+    'id', 'location', 'priority', 'status', 'ai_confidence', 'reportedAt', 'has_image',
+    'image_name', 'thumbnail_url', 'waste_type', 'fill_level', 'latitude', 'longitude'
+)
+
+
+def report_filters_from_args(args):
+    """status/priority/start/end query parameters as report WHERE clauses"""
+    start = args.get('start')
+    end = args.get('end')
+    return export.report_filters(
+        status=args.get('status'),
+        priority=args.get('priority'),
+        start=datetime.fromisoformat(start) if start else None,
+        end=datetime.fromisoformat(end) if end else None
+    )
+
+
+@app.route('/api/reports/export', methods=['GET'])
+def export_reports():
+    """
+    Stream reports as CSV, NDJSON or Parquet with constant memory
+    Query: format=csv|ndjson|parquet plus the get_reports filters and start/end
+    """
+    fmt = request.args.get('format', 'csv')
+    if fmt not in export.EXPORT_FORMATS:
+        return jsonify({'error': f"format must be one of: {', '.join(export.EXPORT_FORMATS)}"}), 400
+    if fmt == 'parquet' and not export.parquet_available():
+        return jsonify({'error': 'Parquet export requires the pyarrow package'}), 501
+    
+    try:
+        clauses = report_filters_from_args(request.args)
+    except ValueError:
+        return jsonify({'error': 'start and end must be ISO 8601 timestamps'}), 400
+    
+    mimetype, extension = export.EXPORT_FORMATS[fmt]
+    filename = f"reports_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{extension}"
+    
+    return Response(
+        stream_with_context(export.stream_reports(fmt, clauses)),
+        mimetype=mimetype,
+        headers={'Content-Disposition': f'attachment; filename="{filename}"'}
+    )
+
+
 @app.route('/api/reports/<int:report_id>', methods=['GET'])
 def get_report(report_id):
     """Get a specific report by ID"""
@@ -553,7 +939,11 @@ def get_report(report_id):
             'status': report.status,
             'ai_confidence': report.ai_confidence,
             'reportedAt': report.reportedAt.isoformat() if report.reportedAt else None,
-            'image_name': report.image_name
+            'image_name': report.image_name,
+            'waste_type': report.waste_type,
+            'fill_level': report.fill_level,
+            'latitude': report.latitude,
+            'longitude': report.longitude
         }
         
         # Include base64 encoded image if requested
@@ -573,6 +963,11 @@ def update_report(report_id):
         report = Reports.query.get_or_404(report_id)
         data = request.get_json()
         
+        # Move the report's rollup contribution from its old key to the new one
+        rollups.apply_report(report, sign=-1)
+        old_coordinates = (report.latitude, report.longitude)
+        old_status = report.status
+        
         if 'location' in data:
             report.location = data['location']
         if 'priority' in data:
@@ -581,9 +976,19 @@ def update_report(report_id):
             report.status = data['status']
         if 'ai_confidence' in data:
             report.ai_confidence = data['ai_confidence']
-        
+        if 'waste_type' in data:
+            report.waste_type = data['waste_type']
+        if 'fill_level' in data:
+            report.fill_level = data['fill_level']
+        if 'latitude' in data or 'lat' in data:
+            report.latitude, report.longitude = routing.coordinates_from(data)
+        
+        rollups.apply_report(report)
+        sla.record_status(report, old_status)
         db.session.commit()
         
+        dispatch_report_change(report_id, report, old_coordinates)
+        
         # Update statistics
         update_statistics()
         
@@ -604,14 +1009,221 @@ def update_report(report_id):
         return jsonify({'error': str(e)}), 500
 
 
+def dispatch_report_change(report_id, report, old_coordinates=(None, None)):
+    """
+    Pass a committed report change on to routing, zones and map tiles and
+    return the route update. The change is already saved, so a failure here
+    is logged and gives None.
+    """
+    try:
+        route = routing.report_changed(report)
+        zones.report_changed(report)
+        tiles.invalidate_point(*old_coordinates)
+        if (report.latitude, report.longitude) != tuple(old_coordinates):
+            tiles.invalidate_point(report.latitude, report.longitude)
+        return route
+    except Exception as e:
+        db.session.rollback()
+        print(f"Error dispatching report {report_id} change: {str(e)}")
+        return None
+
+
+REPORT_STATUSES = ('Pending', 'In Progress', 'Resolved')
+REPORT_PRIORITIES = ('Low', 'Medium', 'High', 'Critical')
+COORDINATE_FIELDS = ('latitude', 'longitude', 'lat', 'lng')
+BULK_UPDATE_FIELDS = ('location', 'priority', 'status', 'ai_confidence', 'waste_type', 'fill_level') + COORDINATE_FIELDS
+
+
+def is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def bulk_update_errors(changes):
+    """Why a set of field changes can't be applied, or None"""
+    unknown = [field for field in changes if field not in BULK_UPDATE_FIELDS]
+    if unknown:
+        return f"Unknown fields: {', '.join(sorted(unknown))}"
+    if 'status' in changes and changes['status'] not in REPORT_STATUSES:
+        return f"status must be one of: {', '.join(REPORT_STATUSES)}"
+    if 'priority' in changes and changes['priority'] not in REPORT_PRIORITIES:
+        return f"priority must be one of: {', '.join(REPORT_PRIORITIES)}"
+    if 'location' in changes and not (isinstance(changes['location'], str) and changes['location'].strip()):
+        return "location must be a non-empty string"
+    if 'waste_type' in changes and not (changes['waste_type'] is None or isinstance(changes['waste_type'], str)):
+        return "waste_type must be a string or null"
+    if 'ai_confidence' in changes:
+        value = changes['ai_confidence']
+        if not (is_number(value) and value == int(value) and 0 <= value <= 100):
+            return "ai_confidence must be a whole number from 0 to 100"
+    if 'fill_level' in changes:
+        value = changes['fill_level']
+        if not (value is None or (is_number(value) and value >= 0)):
+            return "fill_level must be a non-negative number or null"
+    if any(field in changes for field in COORDINATE_FIELDS):
+        # Both null clears the location; anything else must be a valid pair
+        latitude = changes.get('latitude', changes.get('lat'))
+        longitude = changes.get('longitude', changes.get('lng'))
+        if (latitude is not None or longitude is not None) and routing.coordinates_from(changes) == (None, None):
+            return "latitude and longitude must be given together, as numbers in range"
+    return None
+
+
+@app.route('/api/reports', methods=['PATCH'])
+def bulk_update_reports():
+    """
+    Update many reports in one transaction
+    JSON: {"ids": [...], "changes": {...}} to apply the same changes to every
+    id, and/or {"updates": [{"id": 1, "status": "Resolved"}, ...]} for
+    per-report changes. Failures are reported per id and the rest are still
+    applied, unless "atomic": true, in which case nothing is applied (409).
+    Everything, statistics included, is written in a single commit.
+    """
+    try:
+        data = request.get_json(silent=True) or {}
+        if not isinstance(data, dict):
+            return jsonify({'error': 'Body must be a JSON object'}), 400
+        if not isinstance(data.get('ids') or [], list) or not isinstance(data.get('updates') or [], list):
+            return jsonify({'error': 'ids and updates must be lists'}), 400
+        if not isinstance(data.get('changes') or {}, dict):
+            return jsonify({'error': 'changes must be an object'}), 400
+        updates = [dict(data.get('changes') or {}, id=report_id) for report_id in data.get('ids') or []]
+        updates += data.get('updates') or []
+        if not updates:
+            return jsonify({'error': 'Give ids with changes, or updates'}), 400
+        if len(updates) > Config.BULK_UPDATE_MAX:
+            return jsonify({'error': f'At most {Config.BULK_UPDATE_MAX} reports per call'}), 413
+        
+        ids = [update.get('id') for update in updates
+               if isinstance(update, dict) and isinstance(update.get('id'), int)]
+        reports = {report.id: report for report in Reports.query.filter(Reports.id.in_(ids))} if ids else {}
+        
+        # Validate every entry before changing anything
+        results = []
+        valid = []
+        seen = set()
+        for update in updates:
+            if not isinstance(update, dict):
+                results.append({'id': None, 'success': False, 'error': 'Each update must be an object'})
+                continue
+            report_id = update.get('id')
+            changes = {field: value for field, value in update.items() if field != 'id'}
+            report = reports.get(report_id) if isinstance(report_id, int) else None
+            
+            error = None
+            if not isinstance(report_id, int) or isinstance(report_id, bool):
+                error = 'id must be an integer'
+            elif report_id in seen:
+                error = 'Duplicate id'
+            elif report is None:
+                error = 'Report not found'
+            elif not changes:
+                error = 'No changes given'
+            else:
+                error = bulk_update_errors(changes)
+            if error:
+                results.append({'id': report_id, 'success': False, 'error': error})
+                continue
+            seen.add(report_id)
+            valid.append((report, changes))
+            results.append({'id': report_id, 'success': True})
+        
+        failed = len(results) - len(valid)
+        if failed and data.get('atomic'):
+            return jsonify({
+                'success': False,
+                'updated': 0,
+                'failed': failed,
+                'results': [result for result in results if not result['success']]
+            }), 409
+        
+        applied = []
+        delta = rollups.RollupDelta()
+        for report, changes in valid:
+            delta.add(report, -1)
+            old = (report.status, report.latitude, report.longitude)
+            for field in ('location', 'priority', 'status', 'ai_confidence', 'waste_type', 'fill_level'):
+                if field in changes:
+                    setattr(report, field, changes[field])
+            if any(field in changes for field in COORDINATE_FIELDS):
+                report.latitude, report.longitude = routing.coordinates_from(changes)
+            delta.add(report, 1)
+            applied.append((report, old))
+        
+        if applied:
+            delta.apply()
+            sla.record_statuses([(report, old[0]) for report, old in applied])
+            # Statistics once per call, in the same commit
+            refresh_statistics()
+            applied_ids = [report.id for report, _ in applied]
+            db.session.commit()
+            
+            # Reload what dispatch needs for every report in one query, not one each
+            try:
+                db.session.execute(
+                    db.select(Reports)
+                    .options(load_only(Reports.location, Reports.priority, Reports.status,
+                                       Reports.latitude, Reports.longitude))
+                    .where(Reports.id.in_(applied_ids))
+                ).all()
+            except Exception as e:
+                db.session.rollback()
+                print(f"Error reloading updated reports: {str(e)}")
+            for report_id, (report, (_, old_latitude, old_longitude)) in zip(applied_ids, applied):
+                dispatch_report_change(report_id, report, (old_latitude, old_longitude))
+        
+        return jsonify({
+            'success': not failed,
+            'updated': len(applied),
+            'failed': failed,
+            'results': results
+        }), 200
+        
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/api/reports/<int:report_id>/history', methods=['GET'])
+def get_report_history(report_id):
+    """Status transitions of a report, oldest first"""
+    try:
+        return jsonify({'report_id': report_id, 'history': sla.history(report_id)}), 200
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
 @app.route('/api/reports/<int:report_id>', methods=['DELETE'])
 def delete_report(report_id):
     """Delete a report"""
     try:
         report = Reports.query.get_or_404(report_id)
+        rollups.apply_report(report, sign=-1)
+        coordinates = (report.latitude, report.longitude)
+        result_names = db.session.execute(
+            db.select(Analyses.result_name).where(
+                (Analyses.report_id == report_id) | (Analyses.result_name == report.image_name)
+            )
+        ).scalars().all()
+        # Analyses, detections and status history outlive their report, unlinked
+        for model in (Analyses, Detections, ReportStatusChange):
+            db.session.execute(
+                db.update(model).where(model.report_id == report_id).values(report_id=None)
+            )
+        db.session.execute(db.delete(ReportScores).where(ReportScores.report_id == report_id))
         db.session.delete(report)
         db.session.commit()
         
+        derivatives.invalidate(f"report-{report_id}")
+        for result_name in result_names:
+            analyses.invalidate_result(result_name)
+        try:
+            routing.report_deleted(report_id)
+            zones.report_deleted(report_id)
+            tiles.invalidate_point(*coordinates)
+        except Exception as e:
+            print(f"Error dispatching report {report_id} deletion: {str(e)}")
+        
         # Update statistics
         update_statistics()
         
@@ -640,11 +1252,27 @@ def get_report_image(report_id):
         return jsonify({'error': str(e)}), 404
 
 
+@app.route('/api/reports/<int:report_id>/image/<size>', methods=['GET'])
+def get_report_image_derivative(report_id, size):
+    """
+    Serve a resized report image as a binary response (size=thumb|medium)
+    Optional query: format=jpeg|webp, otherwise negotiated from Accept
+    """
+    def load_source():
+        report = db.session.get(Reports, report_id)
+        if report is None or not report.image_data:
+            raise LookupError(report_id)
+        return report.image_data
+    
+    return serve_derivative(f"report-{report_id}", load_source, size)
+
+
 # ===========================
 # STATISTICS ROUTES
 # ===========================
 
 @app.route('/api/statistics', methods=['GET'])
+@versions.conditional(Statistics)
 def get_statistics():
     """Get current statistics"""
     try:
@@ -684,40 +1312,11 @@ def manual_update_statistics():
         return jsonify({'error': str(e)}), 500
 
 
+@tracing.traced()
 def update_statistics():
     """Helper function to update statistics based on reports"""
     try:
-        # Get or create statistics record
-        stats = Statistics.query.first()
-        if not stats:
-            stats = Statistics(
-                imganalyzed=0,
-                wastedected=0,
-                avgconfidence=0,
-                detectionrate=0
-            )
-            db.session.add(stats)
-        
-        # Calculate statistics from reports
-        total_reports = Reports.query.count()
-        reports_with_images = Reports.query.filter(Reports.image_data.isnot(None)).count()
-        
-        # Calculate average confidence
-        avg_confidence_result = db.session.query(func.avg(Reports.ai_confidence)).scalar()
-        avg_confidence = int(avg_confidence_result) if avg_confidence_result else 0
-        
-        # Count waste detected (reports with confidence > 0)
-        waste_detected = Reports.query.filter(Reports.ai_confidence > 0).count()
-        
-        # Calculate detection rate (percentage of reports with high confidence)
-        detection_rate = int((waste_detected / total_reports * 100)) if total_reports > 0 else 0
-        
-        # Update statistics
-        stats.imganalyzed = reports_with_images
-        stats.wastedected = waste_detected
-        stats.avgconfidence = avg_confidence
-        stats.detectionrate = detection_rate
-        
+        refresh_statistics()
         db.session.commit()
         
     except Exception as e:
@@ -725,11 +1324,46 @@ def update_statistics():
         print(f"Error updating statistics: {str(e)}")
 
 
+def refresh_statistics():
+    """Recompute the statistics row in the current transaction; the caller commits"""
+    # Get or create statistics record
+    stats = Statistics.query.first()
+    if not stats:
+        stats = Statistics(
+            imganalyzed=0,
+            wastedected=0,
+            avgconfidence=0,
+            detectionrate=0
+        )
+        db.session.add(stats)
+    
+    # Calculate statistics from reports
+    total_reports = Reports.query.count()
+    reports_with_images = Reports.query.filter(Reports.image_data.isnot(None)).count()
+    
+    # Calculate average confidence
+    avg_confidence_result = db.session.query(func.avg(Reports.ai_confidence)).scalar()
+    avg_confidence = int(avg_confidence_result) if avg_confidence_result else 0
+    
+    # Count waste detected (reports with confidence > 0)
+    waste_detected = Reports.query.filter(Reports.ai_confidence > 0).count()
+    
+    # Calculate detection rate (percentage of reports with high confidence)
+    detection_rate = int((waste_detected / total_reports * 100)) if total_reports > 0 else 0
+    
+    # Update statistics
+    stats.imganalyzed = reports_with_images
+    stats.wastedected = waste_detected
+    stats.avgconfidence = avg_confidence
+    stats.detectionrate = detection_rate
+
+
 # ===========================
 # DASHBOARD/SUMMARY ROUTES
 # ===========================
 
 @app.route('/api/dashboard/summary', methods=['GET'])
+@versions.conditional(Cameras, Reports, Statistics)
 def dashboard_summary():
     """Get dashboard summary with key metrics"""
     try:
@@ -764,3 +1398,397 @@ def dashboard_summary():
         return jsonify({'error': str(e)}), 500
 
 
+# ===========================
+# ANALYTICS ROUTES
+# ===========================
+
+ROLLUP_DIMENSIONS = ('location', 'priority', 'status', 'waste_type')
+
+
+@app.route('/api/analytics/timeseries', methods=['GET'])
+def analytics_timeseries():
+    """
+    Report counts and averages per hour/day, read from the rollup tables only
+    Query: granularity=hour|day, start/end (ISO 8601), any of location/priority/
+    status/waste_type as filters, group_by=comma separated dimensions
+    """
+    try:
+        granularity = request.args.get('granularity', 'day')
+        if granularity not in rollups.ROLLUPS:
+            return jsonify({'error': 'granularity must be one of: hour, day'}), 400
+
+        try:
+            start = request.args.get('start')
+            end = request.args.get('end')
+            start = datetime.fromisoformat(start) if start else None
+            end = datetime.fromisoformat(end) if end else None
+        except ValueError:
+            return jsonify({'error': 'start and end must be ISO 8601 timestamps'}), 400
+
+        group_by = [column for column in request.args.get('group_by', '').split(',') if column]
+        invalid = [column for column in group_by if column not in ROLLUP_DIMENSIONS]
+        if invalid:
+            return jsonify({'error': f"Cannot group by: {', '.join(invalid)}"}), 400
+
+        filters = {column: request.args[column] for column in ROLLUP_DIMENSIONS if request.args.get(column)}
+
+        points = rollups.timeseries(granularity, start, end, filters, group_by)
+
+        return jsonify({
+            'granularity': granularity,
+            'count': len(points),
+            'points': points
+        }), 200
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/api/analytics/sla', methods=['GET'])
+def analytics_sla():
+    """
+    Time from report to start/resolution (count, mean, p50/p90/p95 seconds),
+    read from the SLA histograms only, plus the current open backlog
+    Query: metric=time_to_start|time_to_resolve, location/priority as
+    filters, group_by=comma separated location,priority
+    """
+    try:
+        metric = request.args.get('metric', 'time_to_resolve')
+        if metric not in sla.SLA_METRICS:
+            return jsonify({'error': f"metric must be one of: {', '.join(sla.SLA_METRICS)}"}), 400
+
+        group_by = [column for column in request.args.get('group_by', '').split(',') if column]
+        invalid = [column for column in group_by if column not in sla.GROUP_COLUMNS]
+        if invalid:
+            return jsonify({'error': f"Cannot group by: {', '.join(invalid)}"}), 400
+
+        filters = {column: request.args[column] for column in sla.GROUP_COLUMNS if request.args.get(column)}
+
+        return jsonify({
+            'metric': metric,
+            'bucket_ratio': round(sla.BUCKET_RATIO, 4),
+            'groups': sla.summary(metric, group_by, filters),
+            'backlog': sla.backlog(group_by, filters)
+        }), 200
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+# ===========================
+# BIN FILL-LEVEL ROUTES
+# ===========================
+
+@app.route('/api/bins/<bin_id>/readings', methods=['GET'])
+def get_bin_readings(bin_id):
+    """Get the fill-level time series for one bin, most recent first"""
+    try:
+        limit = request.args.get('limit', 500, type=int)
+        
+        readings = FillReading.query.filter(FillReading.bin_id == bin_id) \
+            .order_by(FillReading.recordedAt.desc()) \
+            .limit(limit).all()
+        
+        return jsonify({
+            'bin_id': bin_id,
+            'count': len(readings),
+            'readings': [{
+                'fill_level': reading.fill_level,
+                'camera_id': reading.camera_id,
+                'recordedAt': reading.recordedAt.isoformat() if reading.recordedAt else None
+            } for reading in readings]
+        }), 200
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/api/bins/forecast', methods=['GET'])
+def forecast_bins():
+    """
+    Forecast time-to-full for every bin with recent readings
+    Query: window_hours (default 168), threshold (default 90),
+    model=linear|exponential, bin_id=comma separated ids
+    """
+    try:
+        window_hours = request.args.get('window_hours', 168, type=float)
+        threshold = request.args.get('threshold', 90, type=float)
+        model = request.args.get('model', 'linear')
+        bin_ids = [bin_id for bin_id in request.args.get('bin_id', '').split(',') if bin_id]
+        
+        if model not in ('linear', 'exponential'):
+            return jsonify({'error': 'model must be one of: linear, exponential'}), 400
+        
+        forecasts = fill_levels.forecast_bins(
+            window_hours=window_hours,
+            threshold=threshold,
+            model=model,
+            bin_ids=bin_ids,
+            now=datetime.now(timezone.utc).replace(tzinfo=None)
+        )
+        
+        return jsonify({
+            'threshold': threshold,
+            'model': model,
+            'count': len(forecasts),
+            'bins': forecasts
+        }), 200
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+# ===========================
+# DETECTION ROUTES
+# ===========================
+
+def detection_filters_from_args(args):
+    """class/min_confidence/location/start/end query parameters as WHERE clauses"""
+    clauses = []
+    if args.get('class'):
+        clauses.append(Detections.class_name == args.get('class'))
+    if args.get('min_confidence'):
+        clauses.append(Detections.confidence >= float(args.get('min_confidence')))
+    if args.get('location'):
+        clauses.append(Detections.location == args.get('location'))
+    if args.get('start'):
+        clauses.append(Detections.detectedAt >= datetime.fromisoformat(args.get('start')))
+    if args.get('end'):
+        clauses.append(Detections.detectedAt < datetime.fromisoformat(args.get('end')))
+    if args.get('report_id'):
+        clauses.append(Detections.report_id == int(args.get('report_id')))
+    return clauses
+
+
+@app.route('/api/detections', methods=['GET'])
+def get_detections():
+    """
+    Query individual detected boxes without touching images or inference
+    Query: class, min_confidence (0-1), location, start/end (ISO 8601),
+    report_id, limit (default 1000)
+    """
+    try:
+        try:
+            clauses = detection_filters_from_args(request.args)
+        except ValueError as e:
+            return jsonify({'error': f'Invalid filter: {str(e)}'}), 400
+        limit = request.args.get('limit', 1000, type=int)
+        
+        detections = Detections.query.filter(*clauses) \
+            .order_by(Detections.detectedAt.desc()) \
+            .limit(limit).all()
+        
+        return jsonify({
+            'count': len(detections),
+            'detections': [{
+                'id': detection.id,
+                'analysis_id': detection.analysis_id,
+                'report_id': detection.report_id,
+                'class': detection.class_name,
+                'confidence': detection.confidence,
+                'box': {
+                    'x': detection.x,
+                    'y': detection.y,
+                    'width': detection.width,
+                    'height': detection.height
+                },
+                'location': detection.location,
+                'detectedAt': detection.detectedAt.isoformat() if detection.detectedAt else None
+            } for detection in detections]
+        }), 200
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/api/detections/summary', methods=['GET'])
+def detections_summary():
+    """Per-class counts and confidence for detections matching the same filters"""
+    try:
+        try:
+            clauses = detection_filters_from_args(request.args)
+        except ValueError as e:
+            return jsonify({'error': f'Invalid filter: {str(e)}'}), 400
+        
+        rows = db.session.query(
+            Detections.class_name,
+            func.count(Detections.id),
+            func.avg(Detections.confidence),
+            func.avg(Detections.width * Detections.height)
+        ).filter(*clauses).group_by(Detections.class_name).all()
+        
+        return jsonify({
+            'classes': [{
+                'class': class_name,
+                'count': count,
+                'avg_confidence': round(avg_confidence or 0, 4),
+                'avg_box_area': round(avg_area or 0, 1)
+            } for class_name, count, avg_confidence, avg_area in rows]
+        }), 200
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+# ===========================
+# MAP ROUTES (COLLECTION ROUTES, ZONES, TILES)
+# ===========================
+
+@app.route('/api/routes', methods=['GET'])
+def get_routes():
+    """Current in-memory collection routes, one per truck"""
+    try:
+        return jsonify(routing.get_dispatcher().snapshot()), 200
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/api/routes/plan', methods=['POST'])
+def plan_routes():
+    """Re-plan the day from scratch from all pending reports with coordinates"""
+    try:
+        return jsonify(routing.get_dispatcher().plan(routing.pending_stops())), 200
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/api/routes/reoptimize', methods=['POST'])
+def reoptimize_routes():
+    """Run the background full re-optimisation now"""
+    try:
+        return jsonify(routing.get_dispatcher().reoptimize()), 200
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/api/zones', methods=['GET'])
+def get_zones():
+    """
+    Collection zones of pending reports. Passing eps_km or min_weight
+    clusters from scratch with those settings instead of the live zones.
+    """
+    try:
+        include_reports = request.args.get('include_reports') in ('1', 'true')
+        eps_km = request.args.get('eps_km', type=float)
+        min_weight = request.args.get('min_weight', type=float)
+        
+        if eps_km is None and min_weight is None:
+            return jsonify(zones.get_index().zones(include_reports=include_reports)), 200
+        
+        if (eps_km is not None and eps_km <= 0) or (min_weight is not None and min_weight <= 0):
+            return jsonify({'error': 'eps_km and min_weight must be positive'}), 400
+        index = zones.ZoneIndex(eps_km=eps_km, min_weight=min_weight)
+        index.load(routing.pending_stops())
+        return jsonify(index.zones(include_reports=include_reports)), 200
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/api/tiles/<int:z>/<int:x>/<int:y>', methods=['GET'])
+def get_tile(z, x, y):
+    """
+    Heatmap tile: report count, open count and severity per grid cell, so the
+    map payload is bounded by the grid size rather than the number of reports
+    """
+    if not tiles.valid_tile(z, x, y):
+        return jsonify({'error': f'Tile out of range (max zoom {tiles.MAX_ZOOM})'}), 404
+    
+    try:
+        path, payload = tiles.get_or_build(z, x, y)
+        if path is None:
+            response = jsonify(payload)
+            response.cache_control.public = True
+            response.cache_control.max_age = 60
+            return response, 200
+        return send_from_directory(
+            os.path.dirname(path),
+            os.path.basename(path),
+            mimetype='application/json',
+            max_age=60
+        )
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+# ===========================
+# ADMIN ROUTES (PROFILING)
+# ===========================
+
+@app.route('/api/admin/profiling', methods=['GET'])
+@profiling.admin_only
+def get_profiling():
+    """Armed request rule and the profiles kept in memory, newest first"""
+    return jsonify({
+        'rule': profiling.armed_rule(),
+        'profiles': profiling.list_profiles()
+    }), 200
+
+
+@app.route('/api/admin/profiling/requests', methods=['POST'])
+@profiling.admin_only
+def arm_request_profiling():
+    """
+    cProfile the next `count` requests matching `path_prefix` and/or
+    `endpoint` within `ttl` seconds. Profiled responses carry X-Profile-Id.
+    """
+    data = request.get_json(silent=True) or {}
+    try:
+        rule = profiling.arm(
+            path_prefix=data.get('path_prefix'),
+            endpoint=data.get('endpoint'),
+            count=data.get('count', 10),
+            ttl=data.get('ttl', 600)
+        )
+    except (TypeError, ValueError):
+        return jsonify({'error': 'count and ttl must be numbers'}), 400
+    return jsonify({'rule': rule}), 200
+
+
+@app.route('/api/admin/profiling/requests', methods=['DELETE'])
+@profiling.admin_only
+def disarm_request_profiling():
+    profiling.disarm()
+    return jsonify({'rule': None}), 200
+
+
+@app.route('/api/admin/profiling/sample', methods=['POST'])
+@profiling.admin_only
+def start_sampling_profile():
+    """Sample every thread's stack for `seconds`; fetch the result once it is done"""
+    data = request.get_json(silent=True) or {}
+    try:
+        profile = profiling.start_sampling(data.get('seconds', 10), data.get('interval_ms', 10))
+    except (TypeError, ValueError):
+        return jsonify({'error': 'seconds and interval_ms must be numbers'}), 400
+    return jsonify(profile.to_dict()), 202
+
+
+@app.route('/api/admin/profiling/sample', methods=['DELETE'])
+@profiling.admin_only
+def stop_sampling_profile():
+    return jsonify({'stopped': profiling.stop_sampling()}), 200
+
+
+@app.route('/api/admin/profiling/profiles/<profile_id>', methods=['GET'])
+@profiling.admin_only
+def download_profile(profile_id):
+    """
+    Download a profile: format=pstats (default) or text for request
+    profiles, format=collapsed (default) for sampling profiles
+    """
+    profile = profiling.get_profile(profile_id)
+    if profile is None:
+        return jsonify({'error': 'Profile not found'}), 404
+    
+    default = 'pstats' if profile.kind == 'request' else 'collapsed'
+    body, mimetype, filename = profiling.render(profile, request.args.get('format', default))
+    return Response(
+        body,
+        mimetype=mimetype,
+        headers={'Content-Disposition': f'attachment; filename={filename}'}
+    )
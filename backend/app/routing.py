@@ -0,0 +1,357 @@
+import threading
+import time
+import numpy as np
+from app import db
+from app.metrics import metrics
+from app.models import Reports
+from config import Config
+
+EARTH_RADIUS_KM = 6371.0
+
+# Urgent stops are always served before routine ones on the same truck
+URGENT_PRIORITIES = ('Critical', 'High')
+PRIORITY_RANK = {'Critical': 0, 'High': 1, 'Medium': 2, 'Low': 3}
+
+_dispatcher = None
+_dispatcher_lock = threading.Lock()
+
+
+def haversine(a, b):
+    """Great-circle distance in km between (lat, lng) arrays; broadcasts like NumPy"""
+    a = np.radians(np.asarray(a, dtype=float))
+    b = np.radians(np.asarray(b, dtype=float))
+    dlat = b[..., 0] - a[..., 0]
+    dlng = b[..., 1] - a[..., 1]
+    h = np.sin(dlat / 2) ** 2 + np.cos(a[..., 0]) * np.cos(b[..., 0]) * np.sin(dlng / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(h, 1.0)))
+
+
+def two_opt(path, first, last, max_passes=20):
+    """
+    2-opt over path[first:last + 1] with path[first - 1] and path[last + 1]
+    held fixed. Returns the improved order as indices into path.
+    """
+    order = np.arange(first - 1, last + 2)
+    if len(order) < 4:
+        return order[1:-1]
+
+    points = path[order]
+    dist = haversine(points[:, None, :], points[None, :, :])
+    perm = np.arange(len(order))
+
+    for _ in range(max_passes):
+        improved = False
+        for s in range(1, len(perm) - 2):
+            t = np.arange(s + 1, len(perm) - 1)
+            # Reversing perm[s..t] swaps edges (s-1, s) and (t, t+1) for (s-1, t) and (s, t+1)
+            gain = dist[perm[s - 1], perm[s]] + dist[perm[t], perm[t + 1]] \
+                - dist[perm[s - 1], perm[t]] - dist[perm[s], perm[t + 1]]
+            best = int(np.argmax(gain))
+            if gain[best] > 1e-9:
+                end = t[best]
+                perm[s:end + 1] = perm[s:end + 1][::-1].copy()
+                improved = True
+        if not improved:
+            break
+    return order[perm[1:-1]]
+
+
+class Route:
+    """
+    One truck's day: depot -> stops -> depot. The first `visited` stops have
+    been collected and are never moved; pending urgent stops come next,
+    followed by routine ones.
+    """
+
+    def __init__(self, vehicle_id, depot):
+        self.vehicle_id = vehicle_id
+        self.depot = depot
+        self.stops = []
+        self.visited = 0
+
+    def copy(self):
+        route = Route(self.vehicle_id, self.depot)
+        route.stops = list(self.stops)
+        route.visited = self.visited
+        return route
+
+    def path(self):
+        return np.array([self.depot] + [(stop['lat'], stop['lng']) for stop in self.stops] + [self.depot])
+
+    def distance_km(self, start=0):
+        """Length from stop index `start` (0 = the depot) back to the depot"""
+        path = self.path()[start:]
+        return float(haversine(path[:-1], path[1:]).sum())
+
+    def urgent_end(self):
+        """Index of the first pending routine stop (insertion boundary between the two classes)"""
+        index = self.visited
+        while index < len(self.stops) and self.stops[index]['urgent']:
+            index += 1
+        return index
+
+    def insertion_range(self, stop):
+        if stop['urgent']:
+            return self.visited, self.urgent_end()
+        return self.urgent_end(), len(self.stops)
+
+    def insertion_cost(self, stop):
+        """(added km, stop index) of the cheapest allowed position"""
+        lo, hi = self.insertion_range(stop)
+        path = self.path()
+        point = (stop['lat'], stop['lng'])
+        before, after = path[lo:hi + 1], path[lo + 1:hi + 2]
+        added = haversine(before, point) + haversine(point, after) - haversine(before, after)
+        best = int(np.argmin(added))
+        return float(added[best]), lo + best
+
+    def optimize(self, lo, hi):
+        """2-opt the stops in [lo, hi) without crossing a collected/urgent/routine boundary"""
+        boundaries = sorted({lo, hi, max(lo, min(hi, self.visited)), max(lo, min(hi, self.urgent_end()))})
+        path = self.path()
+        for start, end in zip(boundaries, boundaries[1:]):
+            if end - start < 2:
+                continue
+            order = two_opt(path, start + 1, end)
+            self.stops[start:end] = [self.stops[index - 1] for index in order]
+
+    def to_dict(self):
+        return {
+            'vehicle_id': self.vehicle_id,
+            'depot': {'lat': self.depot[0], 'lng': self.depot[1]},
+            'visited': self.visited,
+            'stops': self.stops,
+            'distance_km': round(self.distance_km(), 3),
+            'remaining_km': round(self.distance_km(self.visited), 3)
+        }
+
+
+def stop_from_report(report):
+    return {
+        'report_id': report.id,
+        'lat': report.latitude,
+        'lng': report.longitude,
+        'priority': report.priority,
+        'urgent': report.priority in URGENT_PRIORITIES
+    }
+
+
+def coordinates_from(data):
+    """(latitude, longitude) from form/JSON fields, or (None, None) if absent or out of range"""
+    try:
+        lat = float(data.get('latitude', data.get('lat')))
+        lng = float(data.get('longitude', data.get('lng')))
+    except (TypeError, ValueError):
+        return None, None
+    if not (-90 <= lat <= 90 and -180 <= lng <= 180):
+        return None, None
+    return lat, lng
+
+
+def _insertion_order(stops):
+    return sorted(stops, key=lambda stop: (PRIORITY_RANK.get(stop['priority'], 4), stop['report_id']))
+
+
+def build_routes(routes, stops):
+    """Cheapest-insertion of `stops` into copies of `routes`, then a full 2-opt pass"""
+    routes = [route.copy() for route in routes]
+    for stop in _insertion_order(stops):
+        cost, index, route = min(
+            (route.insertion_cost(stop) + (route,) for route in routes),
+            key=lambda option: option[:2]
+        )
+        route.stops.insert(index, stop)
+    for route in routes:
+        route.optimize(route.visited, len(route.stops))
+    return routes
+
+
+class Dispatcher:
+    """
+    Keeps the day's routes in memory. New stops are placed by cheapest
+    insertion and only the stops around them are re-optimised, so an urgent
+    report is routed in milliseconds; reoptimize() re-plans everything and is
+    meant to run periodically in the background.
+    """
+
+    def __init__(self, depot=None, vehicles=None, repair_window=None):
+        self.depot = tuple(depot or Config.ROUTING_DEPOT)
+        self.vehicles = vehicles or Config.ROUTING_VEHICLES
+        self.repair_window = repair_window if repair_window is not None else Config.ROUTING_REPAIR_WINDOW
+        self.routes = []
+        self.version = 0
+        self.planned_at = None
+        self._lock = threading.Lock()
+
+    def _locate(self, report_id):
+        for route in self.routes:
+            for index, stop in enumerate(route.stops):
+                if stop['report_id'] == report_id:
+                    return route, index
+        return None, None
+
+    def plan(self, stops):
+        """Start a fresh day: every truck at the depot, all stops pending"""
+        started = time.perf_counter()
+        empty = [Route(vehicle_id, self.depot) for vehicle_id in range(1, self.vehicles + 1)]
+        routes = build_routes(empty, stops)
+        with self._lock:
+            self.routes = routes
+            self.version += 1
+            self.planned_at = time.time()
+        metrics.observe('routing.plan_ms', (time.perf_counter() - started) * 1000)
+        return self.snapshot()
+
+    def insert(self, stop):
+        """Add or move a stop; returns where it went and how long routing took"""
+        started = time.perf_counter()
+        with self._lock:
+            self._remove(stop['report_id'])
+            cost, index, route = min(
+                (route.insertion_cost(stop) + (route,) for route in self.routes),
+                key=lambda option: option[:2]
+            )
+            route.stops.insert(index, stop)
+            # Repair only the neighbourhood of the new stop
+            route.optimize(
+                max(route.visited, index - self.repair_window),
+                min(len(route.stops), index + self.repair_window + 1)
+            )
+            self.version += 1
+            position = next(i for i, s in enumerate(route.stops) if s['report_id'] == stop['report_id'])
+            result = {
+                'vehicle_id': route.vehicle_id,
+                'position': position,
+                'added_km': round(cost, 3),
+                'version': self.version
+            }
+        elapsed = (time.perf_counter() - started) * 1000
+        metrics.observe('routing.insert_ms', elapsed)
+        result['elapsed_ms'] = round(elapsed, 3)
+        return result
+
+    def _remove(self, report_id):
+        route, index = self._locate(report_id)
+        if route is None:
+            return False
+        del route.stops[index]
+        if index < route.visited:
+            route.visited -= 1
+        return True
+
+    def remove(self, report_id):
+        with self._lock:
+            removed = self._remove(report_id)
+            if removed:
+                self.version += 1
+        return removed
+
+    def visit(self, report_id):
+        """Mark a stop collected; the truck is now there and pending stops are re-ordered from it"""
+        with self._lock:
+            route, index = self._locate(report_id)
+            if route is None or index < route.visited:
+                return False
+            route.stops.insert(route.visited, route.stops.pop(index))
+            route.visited += 1
+            route.optimize(route.visited, len(route.stops))
+            self.version += 1
+        return True
+
+    def reoptimize(self):
+        """
+        Re-plan every pending stop from each truck's current position. The
+        heavy work runs without the lock; the result is dropped if routes
+        changed meanwhile, and kept only if it is shorter.
+        """
+        started = time.perf_counter()
+        with self._lock:
+            version = self.version
+            current = [route.copy() for route in self.routes]
+
+        collected = []
+        pending = []
+        for route in current:
+            prefix = route.copy()
+            prefix.stops = route.stops[:route.visited]
+            collected.append(prefix)
+            pending.extend(route.stops[route.visited:])
+
+        candidate = build_routes(collected, pending)
+        before = sum(route.distance_km(route.visited) for route in current)
+        after = sum(route.distance_km(route.visited) for route in candidate)
+
+        applied = False
+        with self._lock:
+            if self.version == version and after < before - 1e-6:
+                self.routes = candidate
+                self.version += 1
+                applied = True
+        metrics.observe('routing.reoptimize_ms', (time.perf_counter() - started) * 1000)
+        return {'applied': applied, 'before_km': round(before, 3), 'after_km': round(after, 3)}
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'version': self.version,
+                'planned_at': self.planned_at,
+                'routes': [route.to_dict() for route in self.routes],
+                'total_km': round(sum(route.distance_km() for route in self.routes), 3)
+            }
+
+
+def pending_stops():
+    """Pending reports that have coordinates, without loading image blobs"""
+    rows = db.session.execute(
+        db.select(Reports.id, Reports.latitude, Reports.longitude, Reports.priority).where(
+            Reports.status == 'Pending',
+            Reports.latitude.isnot(None),
+            Reports.longitude.isnot(None)
+        )
+    ).all()
+    return [stop_from_report(row) for row in rows]
+
+
+def get_dispatcher():
+    """The process-wide dispatcher, planned from the database on first use"""
+    global _dispatcher
+    if _dispatcher is None:
+        with _dispatcher_lock:
+            if _dispatcher is None:
+                dispatcher = Dispatcher()
+                dispatcher.plan(pending_stops())
+                if Config.ROUTING_REOPTIMIZE_SECONDS:
+                    start_background(dispatcher, Config.ROUTING_REOPTIMIZE_SECONDS)
+                _dispatcher = dispatcher
+    return _dispatcher
+
+
+def report_changed(report):
+    """Keep the routes in step with a created or updated report"""
+    dispatcher = get_dispatcher()
+    if report.status == 'Resolved':
+        return dispatcher.visit(report.id)
+    if report.status != 'Pending' or report.latitude is None or report.longitude is None:
+        return dispatcher.remove(report.id)
+    return dispatcher.insert(stop_from_report(report))
+
+
+def report_deleted(report_id):
+    if _dispatcher is not None:
+        _dispatcher.remove(report_id)
+
+
+def start_background(dispatcher, interval):
+    """Periodic full re-optimisation on a daemon thread"""
+
+    def loop():
+        while True:
+            time.sleep(interval)
+            try:
+                dispatcher.reoptimize()
+            except Exception as e:
+                print(f"Error re-optimising routes: {str(e)}")
+
+    thread = threading.Thread(target=loop, name='routing', daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,196 @@
+"""JSON responses (orjson when installed), row layouts for tabular results, and gzip/brotli compression."""
+import gzip
+import json
+import random
+import statistics
+import time
+import uuid
+from datetime import date, datetime, timedelta
+from flask import Response, request, jsonify
+from app.metrics import metrics
+from config import Config
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+FORMATS = ('records', 'compact', 'columnar')
+
+COMPRESSIBLE_MIMETYPES = {
+    'application/json', 'application/x-ndjson', 'application/javascript',
+    'text/plain', 'text/html', 'text/csv', 'image/svg+xml'
+}
+
+
+def orjson_available():
+    return orjson is not None
+
+
+def brotli_available():
+    return brotli is not None
+
+
+def _default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, uuid.UUID):
+        return str(value)
+    if isinstance(value, (set, frozenset)):
+        return list(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(payload):
+    """Compact JSON bytes for `payload`"""
+    if orjson is not None:
+        return orjson.dumps(payload, default=_default, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(payload, default=_default, separators=(',', ':')).encode()
+
+
+def json_response(payload, status=200):
+    return Response(dumps(payload), status=status, mimetype='application/json')
+
+
+def requested_format(args, default='records'):
+    """`format` query parameter; raises ValueError for unknown values"""
+    fmt = args.get('format', default)
+    if fmt not in FORMATS:
+        raise ValueError(f"format must be one of {', '.join(FORMATS)}")
+    return fmt
+
+
+def rows_payload(fields, rows, fmt='records', key='rows'):
+    """
+    {'count': n, key: ...} for `rows` (sequences ordered like `fields`):
+    a list of objects for records, a list of arrays (with 'fields') for
+    compact, or one array per field for columnar
+    """
+    rows = rows if isinstance(rows, list) else list(rows)
+    if fmt == 'compact':
+        return {'count': len(rows), 'fields': list(fields), key: [list(row) for row in rows]}
+    if fmt == 'columnar':
+        columns = zip(*rows) if rows else [()] * len(fields)
+        return {'count': len(rows), key: {field: list(column) for field, column in zip(fields, columns)}}
+    return {'count': len(rows), key: [dict(zip(fields, row)) for row in rows]}
+
+
+# Compression
+
+def _choose_encoding():
+    accepted = request.accept_encodings
+    if brotli is not None and accepted['br']:
+        return 'br'
+    if accepted['gzip']:
+        return 'gzip'
+    return None
+
+
+def compress(data, encoding):
+    if encoding == 'br':
+        return brotli.compress(data, quality=Config.COMPRESS_BROTLI_QUALITY)
+    return gzip.compress(data, compresslevel=Config.COMPRESS_GZIP_LEVEL, mtime=0)
+
+
+def init_app(app):
+    """Compress eligible responses according to Accept-Encoding"""
+    if not Config.COMPRESS_ENABLED:
+        return
+
+    @app.after_request
+    def compress_response(response):
+        if (response.status_code < 200 or response.status_code in (204, 206, 304)
+                or response.direct_passthrough or response.is_streamed
+                or 'Content-Encoding' in response.headers
+                or response.mimetype not in COMPRESSIBLE_MIMETYPES):
+            return response
+
+        response.vary.add('Accept-Encoding')
+        if (response.content_length or 0) < Config.COMPRESS_MIN_BYTES:
+            return response
+        encoding = _choose_encoding()
+        if encoding is None:
+            return response
+
+        data = response.get_data()
+        compressed = compress(data, encoding)
+        response.set_data(compressed)
+        response.headers['Content-Encoding'] = encoding
+        # The encoded body differs byte-for-byte, so its validator is weak
+        etag, weak = response.get_etag()
+        if etag and not weak:
+            response.set_etag(etag, weak=True)
+        metrics.inc(f'compression.{encoding}')
+        metrics.observe('compression.ratio', len(compressed) / len(data))
+        return response
+
+
+# Benchmark
+
+def _sample_rows(count):
+    """Synthetic rows shaped like the get_reports listing"""
+    rng = random.Random(0)
+    start = datetime(2025, 1, 1, 6, 0, 0)
+    rows = []
+    for report_id in range(1, count + 1):
+        has_image = rng.random() < 0.9
+        rows.append((
+            report_id,
+            rng.choice(['Nairobi', 'Westlands', 'Kibera', 'Embakasi', 'Karen']),
+            rng.choice(['Low', 'Medium', 'High', 'Critical']),
+            rng.choice(['Pending', 'In Progress', 'Resolved']),
+            rng.randint(40, 99),
+            start + timedelta(seconds=report_id * 97, microseconds=rng.randint(0, 999999)),
+            has_image,
+            f"{uuid.UUID(int=rng.getrandbits(128)).hex}.jpg",
+            f"/api/reports/{report_id}/image/thumb" if has_image else None,
+            'garbage',
+            round(rng.uniform(0, 100), 1),
+            -1.2921 + rng.uniform(-0.1, 0.1),
+            36.8219 + rng.uniform(-0.1, 0.1)
+        ))
+    return rows
+
+
+def benchmark(fields, count=10000, repeat=5):
+    """
+    Median time and size of serializing `count` report rows: the previous
+    per-row dict + isoformat() + jsonify path against each format here, and
+    gzip/brotli of the records and columnar bodies. Needs an app context for jsonify.
+    """
+    rows = _sample_rows(count)
+
+    def timed(fn):
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            result = fn()
+            timings.append((time.perf_counter() - started) * 1000)
+        return round(statistics.median(timings), 2), result
+
+    def baseline():
+        records = []
+        for row in rows:
+            record = dict(zip(fields, row))
+            record['reportedAt'] = record['reportedAt'].isoformat()
+            records.append(record)
+        return jsonify({'count': len(records), 'reports': records}).get_data()
+
+    results = []
+    ms, body = timed(baseline)
+    results.append({'name': 'jsonify (previous)', 'ms': ms, 'bytes': len(body)})
+    for fmt in FORMATS:
+        ms, body = timed(lambda: dumps(rows_payload(fields, rows, fmt, key='reports')))
+        results.append({'name': f"{'orjson' if orjson else 'json'} {fmt}", 'ms': ms, 'bytes': len(body)})
+
+    for fmt in ('records', 'columnar'):
+        data = dumps(rows_payload(fields, rows, fmt, key='reports'))
+        for encoding in ('gzip', 'br') if brotli is not None else ('gzip',):
+            ms, body = timed(lambda: compress(data, encoding))
+            results.append({'name': f"{fmt} + {encoding}", 'ms': ms, 'bytes': len(body)})
+    return results
@@ -0,0 +1,276 @@
+import math
+from datetime import datetime, timezone
+from app import db
+from app.models import Reports, ReportStatusChange, ReportSlaHistogram
+from sqlalchemy import func
+from sqlalchemy.orm import aliased
+
+# Buckets grow by 2^(1/4), so a quantile read from the histogram is within
+# about 10% of the exact value whatever the scale (seconds to weeks)
+BUCKET_RATIO = 2 ** 0.25
+_LOG_RATIO = math.log(BUCKET_RATIO)
+
+CLOSED_STATUS = 'Resolved'
+
+# metric -> (statuses it is measured from, status it is measured to); the
+# duration is always counted from when the report was made
+SLA_METRICS = {
+    'time_to_start': (('Pending',), 'In Progress'),
+    'time_to_resolve': (('Pending', 'In Progress'), 'Resolved'),
+}
+
+GROUP_COLUMNS = ('location', 'priority')
+QUANTILES = (0.5, 0.9, 0.95)
+
+
+def _utc_naive(timestamp):
+    if timestamp is None:
+        return None
+    if timestamp.tzinfo is not None:
+        timestamp = timestamp.astimezone(timezone.utc).replace(tzinfo=None)
+    return timestamp
+
+
+def _now():
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def bucket_of(seconds):
+    return int(math.floor(math.log(max(seconds, 1.0)) / _LOG_RATIO))
+
+
+def bucket_bounds(bucket):
+    """[low, high) seconds covered by a bucket; the first also holds everything under a second"""
+    low = 0.0 if bucket == 0 else BUCKET_RATIO ** bucket
+    return low, BUCKET_RATIO ** (bucket + 1)
+
+
+def _metrics_for(from_status, to_status):
+    return [name for name, (sources, target) in SLA_METRICS.items()
+            if to_status == target and from_status in sources]
+
+
+def _apply_histogram(deltas):
+    """Fold {(metric, location, priority, bucket): [count, seconds]} into the histogram rows"""
+    for (metric, location, priority, bucket), (count, seconds_sum) in deltas.items():
+        key = dict(metric=metric, location=location, priority=priority, bucket=bucket)
+        row = ReportSlaHistogram.query.filter_by(**key).first()
+        if row is None:
+            row = ReportSlaHistogram(count=0, seconds_sum=0, **key)
+            db.session.add(row)
+        row.count += count
+        row.seconds_sum += seconds_sum
+
+
+def _since_creation():
+    """
+    Condition keeping a report's history from its creation row on: before
+    ids stopped being reused, rows of a deleted report could carry the id
+    of a newer one. Reports from before history was kept have no creation
+    row, so all of theirs count.
+    """
+    creation = aliased(ReportStatusChange)
+    created_id = db.select(func.coalesce(func.max(creation.id), 0)).where(
+        creation.report_id == ReportStatusChange.report_id,
+        creation.from_status.is_(None)
+    ).scalar_subquery()
+    return ReportStatusChange.id >= created_id
+
+
+def record_statuses(changes, at=None):
+    """
+    Append each report's move from its previous status (None when it was
+    just created) to its current one, and fold any SLA durations completed
+    into the histograms. `changes` is a list of (report, from_status); ones
+    whose status did not change are skipped. The previous transition times
+    are read in one query, the history rows are inserted in one statement
+    and each histogram row is touched once. Runs inside the caller's
+    transaction; the caller commits.
+    """
+    at = at or _now()
+    changes = [(report, from_status) for report, from_status in changes if report.status != from_status]
+    if not changes:
+        return []
+
+    previous_ids = [report.id for report, from_status in changes if from_status is not None]
+    previous = {}
+    if previous_ids:
+        latest = db.select(
+            ReportStatusChange.report_id, func.max(ReportStatusChange.id).label('id')
+        ).where(
+            ReportStatusChange.report_id.in_(previous_ids), _since_creation()
+        ).group_by(ReportStatusChange.report_id).subquery()
+        previous = dict(db.session.execute(
+            db.select(ReportStatusChange.report_id, ReportStatusChange.changedAt)
+            .join(latest, ReportStatusChange.id == latest.c.id)
+        ).all())
+
+    rows = []
+    deltas = {}
+    for report, from_status in changes:
+        reported_at = _utc_naive(report.reportedAt)
+        since_reported = since_previous = None
+        if reported_at is not None:
+            since_reported = max((at - reported_at).total_seconds(), 0.0)
+        if from_status is not None:
+            entered = _utc_naive(previous.get(report.id)) or reported_at
+            if entered is not None:
+                since_previous = max((at - entered).total_seconds(), 0.0)
+
+        rows.append({
+            'report_id': report.id,
+            'from_status': from_status,
+            'to_status': report.status,
+            'location': report.location,
+            'priority': report.priority,
+            'seconds_since_reported': since_reported,
+            'seconds_in_previous': since_previous,
+            'changedAt': at
+        })
+
+        if since_reported is not None:
+            for metric in _metrics_for(from_status, report.status):
+                key = (metric, report.location or 'Unknown', report.priority or 'Unknown', bucket_of(since_reported))
+                entry = deltas.setdefault(key, [0, 0.0])
+                entry[0] += 1
+                entry[1] += since_reported
+
+    # One executemany for the whole batch rather than an ORM insert per row
+    db.session.execute(db.insert(ReportStatusChange), rows)
+    _apply_histogram(deltas)
+    return rows
+
+
+def record_status(report, from_status, at=None):
+    """record_statuses() for a single report; returns the new history values or None"""
+    rows = record_statuses([(report, from_status)], at=at)
+    return rows[0] if rows else None
+
+
+def history(report_id):
+    changes = ReportStatusChange.query.filter(
+        ReportStatusChange.report_id == report_id, _since_creation()
+    ).order_by(ReportStatusChange.id).all()
+    return [{
+        'from_status': change.from_status,
+        'to_status': change.to_status,
+        'location': change.location,
+        'priority': change.priority,
+        'seconds_since_reported': change.seconds_since_reported,
+        'seconds_in_previous': change.seconds_in_previous,
+        'changedAt': change.changedAt.isoformat() if change.changedAt else None
+    } for change in changes]
+
+
+def _quantile(buckets, total, q):
+    """Interpolated quantile from sorted (bucket, count) pairs"""
+    rank = q * total
+    seen = 0
+    for bucket, count in buckets:
+        if seen + count >= rank:
+            low, high = bucket_bounds(bucket)
+            return low + (high - low) * ((rank - seen) / count)
+        seen += count
+    return bucket_bounds(buckets[-1][0])[1]
+
+
+def summary(metric, group_by=(), filters=None):
+    """
+    Count, mean and quantiles of `metric` per group, read from the histogram
+    table only. Cost depends on the number of buckets, not of reports.
+    """
+    group_columns = [getattr(ReportSlaHistogram, column) for column in group_by]
+    query = db.session.query(
+        *group_columns,
+        ReportSlaHistogram.bucket,
+        func.sum(ReportSlaHistogram.count),
+        func.sum(ReportSlaHistogram.seconds_sum)
+    ).filter(ReportSlaHistogram.metric == metric)
+    for column, value in (filters or {}).items():
+        query = query.filter(getattr(ReportSlaHistogram, column) == value)
+    query = query.group_by(*group_columns, ReportSlaHistogram.bucket)
+
+    groups = {}
+    for row in query.all():
+        key = tuple(row[:len(group_columns)])
+        bucket, count, seconds_sum = row[len(group_columns):]
+        entry = groups.setdefault(key, {'buckets': [], 'count': 0, 'seconds_sum': 0.0})
+        entry['buckets'].append((bucket, int(count)))
+        entry['count'] += int(count)
+        entry['seconds_sum'] += seconds_sum or 0.0
+
+    results = []
+    for key, entry in sorted(groups.items(), key=lambda item: tuple(str(value) for value in item[0])):
+        if entry['count'] <= 0:
+            continue
+        buckets = sorted(entry['buckets'])
+        result = dict(zip(group_by, key))
+        result['count'] = entry['count']
+        result['mean_seconds'] = round(entry['seconds_sum'] / entry['count'], 1)
+        for q in QUANTILES:
+            result[f"p{int(q * 100)}_seconds"] = round(_quantile(buckets, entry['count'], q), 1)
+        results.append(result)
+    return results
+
+
+def backlog(group_by=(), filters=None):
+    """Open reports per group with the age of the oldest one"""
+    group_columns = [getattr(Reports, column) for column in group_by]
+    query = db.session.query(
+        *group_columns,
+        func.count(Reports.id),
+        func.min(Reports.reportedAt)
+    ).filter(Reports.status != CLOSED_STATUS)
+    for column, value in (filters or {}).items():
+        query = query.filter(getattr(Reports, column) == value)
+    query = query.group_by(*group_columns)
+
+    now = _now()
+    results = []
+    for row in query.all():
+        count, oldest = row[len(group_columns):]
+        if not count:
+            continue
+        oldest = _utc_naive(oldest)
+        result = dict(zip(group_by, row[:len(group_columns)]))
+        result['open'] = int(count)
+        result['oldest_age_seconds'] = round((now - oldest).total_seconds(), 1) if oldest else None
+        results.append(result)
+    return results
+
+
+def rebuild():
+    """Recompute the histograms from the status history"""
+    db.session.execute(db.delete(ReportSlaHistogram))
+    totals = {}
+    rows = db.session.execute(
+        db.select(
+            ReportStatusChange.from_status,
+            ReportStatusChange.to_status,
+            ReportStatusChange.location,
+            ReportStatusChange.priority,
+            ReportStatusChange.seconds_since_reported
+        ).where(ReportStatusChange.seconds_since_reported.isnot(None))
+        .execution_options(yield_per=1000)
+    )
+    scanned = 0
+    for from_status, to_status, location, priority, seconds in rows:
+        scanned += 1
+        for metric in _metrics_for(from_status, to_status):
+            key = (metric, location or 'Unknown', priority or 'Unknown', bucket_of(seconds))
+            entry = totals.setdefault(key, [0, 0.0])
+            entry[0] += 1
+            entry[1] += seconds
+
+    values = [{
+        'metric': metric,
+        'location': location,
+        'priority': priority,
+        'bucket': bucket,
+        'count': count,
+        'seconds_sum': seconds_sum
+    } for (metric, location, priority, bucket), (count, seconds_sum) in totals.items()]
+    if values:
+        db.session.execute(db.insert(ReportSlaHistogram), values)
+    db.session.commit()
+    return scanned, len(values)
@@ -0,0 +1,264 @@
+import json
+import math
+import os
+import threading
+import time
+import uuid
+import numpy as np
+from app import db
+from app.models import Reports
+from config import Config
+
+TILES_FOLDER = Config.TILES_FOLDER
+GRID = Config.TILE_GRID
+MAX_ZOOM = Config.TILE_MAX_ZOOM
+MAX_LATITUDE = 85.05112878
+
+_lock = threading.Lock()
+_cache_bytes = None
+
+# Severity per report priority; cells keep the max and the mean
+SEVERITY = {'Low': 1, 'Medium': 2, 'High': 3, 'Critical': 4}
+
+CELL_COLUMNS = ['col', 'row', 'count', 'open', 'max_severity', 'mean_severity', 'mean_fill_level']
+
+
+def tile_coords(lat, lng, zoom):
+    """Fractional Web Mercator tile coordinates for arrays of lat/lng"""
+    n = 2 ** zoom
+    lat = np.radians(np.clip(lat, -MAX_LATITUDE, MAX_LATITUDE))
+    x = (np.asarray(lng, dtype=float) + 180.0) / 360.0 * n
+    y = (1.0 - np.log(np.tan(lat) + 1.0 / np.cos(lat)) / math.pi) / 2.0 * n
+    return x, y
+
+
+def tile_bounds(zoom, x, y):
+    """(south, west, north, east) of a tile in degrees"""
+    n = 2 ** zoom
+
+    def latitude(row):
+        return math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * row / n))))
+
+    return latitude(y + 1), x / n * 360.0 - 180.0, latitude(y), (x + 1) / n * 360.0 - 180.0
+
+
+def valid_tile(zoom, x, y):
+    return 0 <= zoom <= MAX_ZOOM and 0 <= x < 2 ** zoom and 0 <= y < 2 ** zoom
+
+
+def tile_path(zoom, x, y):
+    return os.path.join(TILES_FOLDER, str(zoom), str(x), f"{y}.json")
+
+
+def _load_points(bounds=None):
+    """Coordinate, severity, open flag and fill level columns as NumPy arrays"""
+    query = db.select(
+        Reports.latitude, Reports.longitude, Reports.priority, Reports.status, Reports.fill_level
+    ).where(Reports.latitude.isnot(None), Reports.longitude.isnot(None))
+    if bounds is not None:
+        south, west, north, east = bounds
+        query = query.where(
+            Reports.latitude.between(south, north),
+            Reports.longitude.between(west, east)
+        )
+    rows = db.session.execute(query).all()
+
+    lat = np.array([row.latitude for row in rows], dtype=float)
+    lng = np.array([row.longitude for row in rows], dtype=float)
+    severity = np.array([SEVERITY.get(row.priority, 0) for row in rows], dtype=np.int64)
+    is_open = np.array([row.status != 'Resolved' for row in rows], dtype=bool)
+    fill = np.array([row.fill_level if row.fill_level is not None else np.nan for row in rows], dtype=float)
+    return lat, lng, severity, is_open, fill
+
+
+def bin_points(points, zoom):
+    """
+    Aggregate points into GRID x GRID cells for every tile they fall in at
+    `zoom`, in one vectorized pass. Returns {(x, y): tile payload}.
+    """
+    lat, lng, severity, is_open, fill = points
+    if not len(lat):
+        return {}
+
+    fx, fy = tile_coords(lat, lng, zoom)
+    limit = 2 ** zoom - 1
+    tx = np.clip(np.floor(fx), 0, limit).astype(np.int64)
+    ty = np.clip(np.floor(fy), 0, limit).astype(np.int64)
+    col = np.clip(((fx - tx) * GRID).astype(np.int64), 0, GRID - 1)
+    row = np.clip(((fy - ty) * GRID).astype(np.int64), 0, GRID - 1)
+
+    # One key per (tile, cell); aggregate every cell of every tile at once
+    keys = ((tx << zoom) | ty) * (GRID * GRID) + row * GRID + col
+    cells, inverse = np.unique(keys, return_inverse=True)
+    count = np.bincount(inverse)
+    open_count = np.bincount(inverse, weights=is_open)
+    severity_sum = np.bincount(inverse, weights=severity)
+    max_severity = np.zeros(len(cells), dtype=np.int64)
+    np.maximum.at(max_severity, inverse, severity)
+    has_fill = ~np.isnan(fill)
+    fill_sum = np.bincount(inverse, weights=np.where(has_fill, fill, 0))
+    fill_count = np.bincount(inverse, weights=has_fill)
+
+    tile_keys, cell_in_tile = np.divmod(cells, GRID * GRID)
+    cell_row, cell_col = np.divmod(cell_in_tile, GRID)
+    mean_fill = np.divide(fill_sum, fill_count, out=np.full(len(cells), np.nan), where=fill_count > 0)
+
+    tiles = {}
+    boundaries = np.nonzero(np.diff(tile_keys))[0] + 1
+    for chunk in np.split(np.arange(len(cells)), boundaries):
+        tile_key = int(tile_keys[chunk[0]])
+        x, y = tile_key >> zoom, tile_key & limit
+        tiles[(x, y)] = {
+            'z': zoom,
+            'x': x,
+            'y': y,
+            'grid': GRID,
+            'count': int(count[chunk].sum()),
+            'columns': CELL_COLUMNS,
+            'cells': [[
+                int(cell_col[k]),
+                int(cell_row[k]),
+                int(count[k]),
+                int(open_count[k]),
+                int(max_severity[k]),
+                round(float(severity_sum[k] / count[k]), 3),
+                None if np.isnan(mean_fill[k]) else round(float(mean_fill[k]), 1)
+            ] for k in chunk.tolist()]
+        }
+    return tiles
+
+
+def empty_tile(zoom, x, y):
+    return {'z': zoom, 'x': x, 'y': y, 'grid': GRID, 'count': 0, 'columns': CELL_COLUMNS, 'cells': []}
+
+
+def _write(zoom, x, y, payload):
+    """Write a tile; returns how many bytes the cache grew by"""
+    path = tile_path(zoom, x, y)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    with open(temp_path, 'w') as out:
+        json.dump(payload, out, separators=(',', ':'))
+    replaced = _size(path)
+    os.replace(temp_path, path)
+    return os.path.getsize(path) - replaced
+
+
+def _size(path):
+    try:
+        return os.path.getsize(path)
+    except FileNotFoundError:
+        return 0
+
+
+def _remove(path):
+    """Delete a tile; returns its size, 0 if it was not there"""
+    try:
+        size = os.path.getsize(path)
+        os.remove(path)
+        return size
+    except FileNotFoundError:
+        return 0
+
+
+def get_or_build(zoom, x, y):
+    """
+    (path, None) for a cached tile, building it from the reports inside its
+    bounds on a miss, or (None, payload) for an empty tile, which is never
+    written: anyone can ask for any of the billions of empty tiles. Tiles
+    older than TILE_MAX_AGE are rebuilt, which bounds any staleness from a
+    build racing an invalidation.
+    """
+    path = tile_path(zoom, x, y)
+    try:
+        stat = os.stat(path)
+        if time.time() - stat.st_mtime < Config.TILE_MAX_AGE:
+            # Access time marks it recently used for eviction; mtime stays the build time
+            os.utime(path, (time.time(), stat.st_mtime))
+            return path, None
+    except OSError:
+        pass
+
+    points = _load_points(tile_bounds(zoom, x, y))
+    payload = bin_points(points, zoom).get((x, y))
+    if payload is None:
+        _account(-_remove(path))
+        return None, empty_tile(zoom, x, y)
+    _account(_write(zoom, x, y, payload))
+    return path, None
+
+
+def warm(max_zoom=None, min_zoom=0):
+    """Precompute every non-empty tile up to max_zoom from a single scan of the reports"""
+    max_zoom = MAX_ZOOM if max_zoom is None else min(max_zoom, MAX_ZOOM)
+    points = _load_points()
+    written = {}
+    written_bytes = 0
+    for zoom in range(min_zoom, max_zoom + 1):
+        tiles = bin_points(points, zoom)
+        for (x, y), payload in tiles.items():
+            written_bytes += _write(zoom, x, y, payload)
+        written[zoom] = len(tiles)
+    _account(written_bytes)
+    return written
+
+
+def _tile_files():
+    for root, _, files in os.walk(TILES_FOLDER):
+        for name in files:
+            yield os.path.join(root, name)
+
+
+def _account(added_bytes):
+    global _cache_bytes
+    with _lock:
+        if _cache_bytes is None:
+            _cache_bytes = sum(os.path.getsize(path) for path in _tile_files())
+        else:
+            _cache_bytes += added_bytes
+
+        if _cache_bytes > Config.TILE_CACHE_MAX_BYTES:
+            _cache_bytes = _evict(int(Config.TILE_CACHE_MAX_BYTES * 0.9))
+
+
+def _evict(target_bytes):
+    """Delete least recently used tiles until the cache fits in target_bytes"""
+    entries = []
+    total = 0
+    for path in _tile_files():
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            continue
+        entries.append((stat.st_atime, stat.st_size, path))
+        total += stat.st_size
+
+    entries.sort()
+    for _, size, path in entries:
+        if total <= target_bytes:
+            break
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        total -= size
+    return total
+
+
+def invalidate_point(lat, lng):
+    """Drop the one tile per zoom level that contains this point"""
+    if lat is None or lng is None:
+        return 0
+    removed = 0
+    removed_bytes = 0
+    for zoom in range(MAX_ZOOM + 1):
+        fx, fy = tile_coords(np.array([lat]), np.array([lng]), zoom)
+        limit = 2 ** zoom - 1
+        x = int(min(max(math.floor(fx[0]), 0), limit))
+        y = int(min(max(math.floor(fy[0]), 0), limit))
+        size = _remove(tile_path(zoom, x, y))
+        if size:
+            removed += 1
+            removed_bytes += size
+    _account(-removed_bytes)
+    return removed
@@ -0,0 +1,204 @@
+"""
+Per-request trace ids, named spans and SQL timings, with a slow-request log.
+No Flask imports at module level, so predict.py can record spans too.
+"""
+import contextvars
+import functools
+import json
+import logging
+import re
+import sys
+import time
+import uuid
+from contextlib import contextmanager
+from logging.handlers import RotatingFileHandler
+from config import Config
+
+MAX_SPANS = 200
+TRACE_ID_RE = re.compile(r'^[A-Za-z0-9_.-]{8,64}$')
+
+_current = contextvars.ContextVar('trace', default=None)
+
+slow_log = logging.getLogger('smartwaste.slow_requests')
+slow_log.propagate = False
+
+
+class Trace:
+    def __init__(self, trace_id):
+        self.trace_id = trace_id
+        self.started = time.perf_counter()
+        self.spans = []
+        self.stack = []
+        self.dropped = 0
+        self.db_queries = 0
+        self.db_ms = 0.0
+
+    def elapsed_ms(self, since=None):
+        return round((time.perf_counter() - (since or self.started)) * 1000, 3)
+
+    def to_dict(self):
+        return {
+            'trace_id': self.trace_id,
+            'duration_ms': self.elapsed_ms(),
+            'db': {'queries': self.db_queries, 'query_ms': round(self.db_ms, 3)},
+            'spans': self.spans,
+            'dropped_spans': self.dropped
+        }
+
+
+def current():
+    return _current.get()
+
+
+def trace_id():
+    trace = _current.get()
+    return trace.trace_id if trace is not None else None
+
+
+@contextmanager
+def span(name, **attrs):
+    """Time a block as a child of the innermost open span; a no-op outside a trace"""
+    trace = _current.get()
+    if trace is None:
+        yield attrs
+        return
+
+    started = time.perf_counter()
+    record = {
+        'name': name,
+        'parent': trace.stack[-1] if trace.stack else None,
+        'start_ms': trace.elapsed_ms(),
+    }
+    trace.stack.append(name)
+    try:
+        yield attrs
+    except Exception as e:
+        attrs['error'] = type(e).__name__
+        raise
+    finally:
+        trace.stack.pop()
+        record['duration_ms'] = trace.elapsed_ms(started)
+        if attrs:
+            record['attrs'] = attrs
+        if len(trace.spans) < MAX_SPANS:
+            trace.spans.append(record)
+        else:
+            trace.dropped += 1
+
+
+def traced(name=None):
+    """Decorator form of span(), named after the function by default"""
+
+    def decorator(fn):
+        span_name = name or fn.__name__
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(span_name):
+                return fn(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+# SQLAlchemy hooks
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('trace_query_started', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info.get('trace_query_started')
+    if not started:
+        return
+    started = started.pop()
+    trace = _current.get()
+    if trace is not None:
+        trace.db_queries += 1
+        trace.db_ms += (time.perf_counter() - started) * 1000
+
+
+def _before_commit(session):
+    trace = _current.get()
+    if trace is not None:
+        session.info['trace_commit_started'] = trace.elapsed_ms()
+
+
+def _after_commit(session):
+    trace = _current.get()
+    started_ms = session.info.pop('trace_commit_started', None)
+    if trace is not None and started_ms is not None and len(trace.spans) < MAX_SPANS:
+        trace.spans.append({
+            'name': 'db.commit',
+            'parent': trace.stack[-1] if trace.stack else None,
+            'start_ms': started_ms,
+            'duration_ms': round(trace.elapsed_ms() - started_ms, 3)
+        })
+
+
+def _configure_slow_log():
+    if slow_log.handlers:
+        return
+    if Config.SLOW_LOG_PATH:
+        handler = RotatingFileHandler(Config.SLOW_LOG_PATH, maxBytes=10 * 1024 * 1024, backupCount=5)
+    else:
+        handler = logging.StreamHandler(sys.stderr)
+    handler.setFormatter(logging.Formatter('%(message)s'))
+    slow_log.addHandler(handler)
+    slow_log.setLevel(logging.INFO)
+
+
+def init_app(app):
+    """Start a trace per request, return its id, and log slow requests"""
+    if not Config.TRACING_ENABLED:
+        return
+
+    from flask import g, request
+    from sqlalchemy import event
+    from sqlalchemy.engine import Engine
+    from sqlalchemy.orm import Session
+
+    event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+    event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+    event.listen(Session, 'before_commit', _before_commit)
+    event.listen(Session, 'after_commit', _after_commit)
+    _configure_slow_log()
+
+    @app.before_request
+    def start_trace():
+        incoming = request.headers.get('X-Trace-Id', '')
+        trace = Trace(incoming if TRACE_ID_RE.match(incoming) else uuid.uuid4().hex)
+        g.trace_token = _current.set(trace)
+
+    @app.after_request
+    def finish_trace(response):
+        trace = _current.get()
+        if trace is None:
+            return response
+
+        duration_ms = trace.elapsed_ms()
+        response.headers['X-Trace-Id'] = trace.trace_id
+        response.headers['Server-Timing'] = f'app;dur={duration_ms:.1f}, db;dur={trace.db_ms:.1f}'
+
+        if duration_ms >= Config.SLOW_REQUEST_MS:
+            slow_log.info(json.dumps(dict(
+                trace.to_dict(),
+                timestamp=time.time(),
+                method=request.method,
+                path=request.path,
+                endpoint=request.endpoint,
+                status=response.status_code,
+                streamed=response.is_streamed
+            ), default=str))
+        return response
+
+    @app.teardown_request
+    def end_trace(error=None):
+        token = g.pop('trace_token', None)
+        if token is not None:
+            try:
+                _current.reset(token)
+            except ValueError:
+                # Streamed responses may finish in a different context
+                _current.set(None)
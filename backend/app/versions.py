@@ -0,0 +1,174 @@
+"""Per-table data versions kept in the database, the ETags built on them, and a response cache."""
+import functools
+import hashlib
+import threading
+from collections import OrderedDict
+from flask import request, make_response
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from app import db
+from app.metrics import metrics
+from app.models import DataVersions
+from config import Config
+
+VERSIONS_TABLE = DataVersions.__table__
+
+
+def versions(tables):
+    """Current version of each table in `tables`; 0 for tables never written"""
+    rows = db.session.execute(
+        db.select(DataVersions.table_name, DataVersions.version)
+        .where(DataVersions.table_name.in_(tables))
+    ).all()
+    found = dict(rows)
+    return {table: found.get(table, 0) for table in tables}
+
+
+def bump(connection, tables):
+    """Increment the versions of `tables` on `connection`, inside its transaction"""
+    tables = sorted(tables)
+    result = connection.execute(
+        VERSIONS_TABLE.update()
+        .where(VERSIONS_TABLE.c.table_name.in_(tables))
+        .values(version=VERSIONS_TABLE.c.version + 1)
+    )
+    if result.rowcount == len(tables):
+        return
+    existing = set(connection.execute(
+        db.select(VERSIONS_TABLE.c.table_name).where(VERSIONS_TABLE.c.table_name.in_(tables))
+    ).scalars())
+    missing = [{'table_name': table, 'version': 1} for table in tables if table not in existing]
+    if missing:
+        connection.execute(VERSIONS_TABLE.insert(), missing)
+
+
+# Write tracking
+
+def _pending(session):
+    return session.info.setdefault('changed_tables', set())
+
+
+@event.listens_for(Session, 'after_flush')
+def _record_flush(session, flush_context):
+    changed = _pending(session)
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        table = getattr(obj, '__table__', None)
+        if table is not None and table is not VERSIONS_TABLE:
+            changed.add(table.name)
+
+
+@event.listens_for(Session, 'do_orm_execute')
+def _record_statement(orm_execute_state):
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        table = getattr(orm_execute_state.statement, 'table', None)
+        if table is not None and table is not VERSIONS_TABLE:
+            _pending(orm_execute_state.session).add(table.name)
+
+
+@event.listens_for(Session, 'before_commit')
+def _publish(session):
+    # Flush first so the bump sees every change, then write it through the
+    # session's connection so it commits (or rolls back) with them
+    session.flush()
+    changed = session.info.pop('changed_tables', None)
+    if changed:
+        bump(session.connection(), changed)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard(session):
+    session.info.pop('changed_tables', None)
+
+
+# Response cache
+
+class ResponseCache:
+    """LRU of (body, status, mimetype) keyed by ETag, bounded by total body bytes"""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        metrics.gauge('response_cache.bytes', lambda: self.size)
+        metrics.gauge('response_cache.entries', lambda: len(self._entries))
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def put(self, key, body, status, mimetype):
+        if len(body) > self.max_bytes // 4:
+            return
+        with self._lock:
+            if key in self._entries:
+                return
+            self._entries[key] = (body, status, mimetype)
+            self.size += len(body)
+            while self.size > self.max_bytes:
+                _, (evicted, _, _) = self._entries.popitem(last=False)
+                self.size -= len(evicted)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+
+cache = ResponseCache(Config.RESPONSE_CACHE_MAX_BYTES)
+
+
+def etag_for(tables):
+    """ETag for the current request given the versions of the tables it reads"""
+    state = ','.join(f"{table}:{number}" for table, number in versions(tables).items())
+    key = f"{state}|{request.full_path}"
+    return hashlib.blake2b(key.encode(), digest_size=12).hexdigest()
+
+
+def conditional(*models):
+    """
+    Serve a GET view with an ETag built from the data versions of `models`:
+    304 on a matching If-None-Match, a cached body when one exists for the
+    current versions, otherwise the view's response (cached if it is a 200).
+    """
+    tables = sorted(model.__table__.name for model in models)
+
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            if not Config.ETAGS_ENABLED:
+                return view(*args, **kwargs)
+
+            # Read the versions before the view so a concurrent write can
+            # only make the cached body newer than its key, never older
+            etag = etag_for(tables)
+            if request.if_none_match.contains_weak(etag):
+                metrics.inc('conditional.not_modified')
+                response = make_response('', 304)
+                response.set_etag(etag)
+                response.headers['Cache-Control'] = 'no-cache'
+                return response
+
+            cached = cache.get(etag)
+            if cached is not None:
+                metrics.inc('conditional.cache_hits')
+                body, status, mimetype = cached
+                response = make_response(body, status)
+                response.mimetype = mimetype
+            else:
+                metrics.inc('conditional.cache_misses')
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200 or response.is_streamed:
+                    return response
+                cache.put(etag, response.get_data(), response.status_code, response.mimetype)
+
+            response.set_etag(etag)
+            response.headers['Cache-Control'] = 'no-cache'
+            return response
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,186 @@
+"""Video clip analysis: sample frames by interval or scene change and analyse them concurrently."""
+import os
+import statistics
+import uuid
+from collections import Counter, deque
+from concurrent.futures import ThreadPoolExecutor
+import cv2
+import numpy as np
+from app.metrics import metrics
+from config import Config
+
+MODES = ('interval', 'scene')
+
+# Thumbnail compared between frames in scene mode
+SCENE_THUMB_SIZE = (64, 36)
+# Frames looked at per second of video in scene mode
+SCENE_CHECKS_PER_SECOND = 4
+
+
+class VideoError(ValueError):
+    """The clip could not be opened or decoded"""
+
+
+def sampling_options(args):
+    """(mode, interval, threshold, max_frames) from request arguments; raises ValueError"""
+    mode = args.get('mode', 'interval')
+    if mode not in MODES:
+        raise ValueError(f"mode must be one of {', '.join(MODES)}")
+    interval = float(args.get('interval', Config.VIDEO_SAMPLE_SECONDS))
+    threshold = float(args.get('threshold', Config.VIDEO_SCENE_THRESHOLD))
+    max_frames = min(int(args.get('max_frames', Config.VIDEO_MAX_FRAMES)), Config.VIDEO_MAX_FRAMES)
+    if interval <= 0 or threshold <= 0 or max_frames <= 0:
+        raise ValueError("interval, threshold and max_frames must be positive")
+    return mode, interval, threshold, max_frames
+
+
+def _thumbnail(frame):
+    small = cv2.resize(frame, SCENE_THUMB_SIZE, interpolation=cv2.INTER_AREA)
+    return cv2.cvtColor(small, cv2.COLOR_BGR2GRAY).astype(np.int16)
+
+
+def sample_frames(path, mode='interval', interval=None, threshold=None, max_frames=None):
+    """
+    Yield (frame_index, seconds, frame) for the sampled frames of a clip.
+    Skipped frames are only grabbed, not converted to images.
+    """
+    interval = interval or Config.VIDEO_SAMPLE_SECONDS
+    threshold = threshold or Config.VIDEO_SCENE_THRESHOLD
+    max_frames = max_frames or Config.VIDEO_MAX_FRAMES
+
+    capture = cv2.VideoCapture(path)
+    if not capture.isOpened():
+        raise VideoError("Could not open the video")
+    try:
+        fps = capture.get(cv2.CAP_PROP_FPS)
+        if not fps or fps != fps or fps > 1000:
+            fps = 25.0
+        if mode == 'scene':
+            step = max(1, int(round(fps / SCENE_CHECKS_PER_SECOND)))
+        else:
+            step = max(1, int(round(fps * interval)))
+
+        index = -1
+        sampled = 0
+        last = None
+        while sampled < max_frames:
+            if not capture.grab():
+                break
+            index += 1
+            if index % step:
+                continue
+            ok, frame = capture.retrieve()
+            if not ok:
+                break
+
+            if mode == 'scene':
+                thumb = _thumbnail(frame)
+                if last is not None and float(np.mean(np.abs(thumb - last))) < threshold:
+                    continue
+                last = thumb
+
+            sampled += 1
+            yield index, round(index / fps, 3), frame
+
+        if index < 0:
+            raise VideoError("The video has no readable frames")
+    finally:
+        capture.release()
+
+
+def _analyze_frame(analyze, frame_path, frame_index, seconds):
+    result = analyze(frame_path)
+    result['frame'] = frame_index
+    result['seconds'] = seconds
+    return result
+
+
+def analyze_clip(path, analyze, mode='interval', interval=None, threshold=None,
+                 max_frames=None, concurrency=None, folder=None, discard=None):
+    """
+    Yield one result per sampled frame, in frame order, from `analyze(image_path)`.
+    Each result carries 'frame', 'seconds' and 'frame_image' (the JPEG it was
+    made from, in `folder`); the caller removes the frame images it does not keep.
+    If the caller stops early, frames still being analysed are waited for and
+    their results passed to `discard(result)`, so it can remove what they wrote.
+    """
+    concurrency = concurrency or Config.VIDEO_CONCURRENCY
+    folder = folder or Config.UPLOAD_FOLDER
+    pending = deque()
+
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='video') as executor:
+        try:
+            for frame_index, seconds, frame in sample_frames(path, mode, interval, threshold, max_frames):
+                name = f"{uuid.uuid4().hex}.jpg"
+                if not cv2.imwrite(os.path.join(folder, name), frame):
+                    continue
+                del frame
+                metrics.inc('video.frames')
+                future = executor.submit(_analyze_frame, analyze, os.path.join(folder, name), frame_index, seconds)
+                pending.append((name, future))
+                # Stop decoding until a slot frees up; results stay in order
+                while len(pending) >= concurrency:
+                    yield _frame_result(*pending.popleft())
+            while pending:
+                yield _frame_result(*pending.popleft())
+        finally:
+            for name, future in pending:
+                if not future.cancel() and discard is not None:
+                    result = _frame_result(name, future)
+                    if result.get("success"):
+                        discard(result)
+                remove_file(os.path.join(folder, name))
+
+
+def _frame_result(name, future):
+    try:
+        result = future.result()
+    except Exception as e:
+        result = {"success": False, "error": str(e)}
+    result['frame_image'] = name
+    return result
+
+
+def remove_file(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def verdict(results, categorize):
+    """
+    Aggregate per-frame results. The clip's fill level is the (lower) median
+    over analysed frames, so a passer-by or a truck in a few frames does not
+    swing it. Returns (verdict, representative frame result), or (None, None)
+    when no frame was analysed. `categorize(fill_level)` gives (status,
+    fill level, urgency).
+    """
+    analysed = [result for result in results if result.get("success")]
+    if not analysed:
+        return None, None
+
+    levels = [float(result.get("fillLevel") or 0) for result in analysed]
+    median = statistics.median_low(levels)
+    representative = max(
+        (result for result in analysed if float(result.get("fillLevel") or 0) == median),
+        key=lambda result: result.get("confidence") or 0
+    )
+    status, fill_level, urgency = categorize(median)
+    waste_types = Counter(result.get("wasteType") for result in analysed if result.get("wasteType") not in (None, "Unknown"))
+
+    return {
+        "frames": len(results),
+        "frames_analysed": len(analysed),
+        "fillLevel": fill_level,
+        "fullness": status,
+        "urgency": urgency,
+        "wasteType": waste_types.most_common(1)[0][0] if waste_types else "Unknown",
+        "confidence": round(sum(float(result.get("confidence") or 0) for result in analysed) / len(analysed), 2),
+        "fill_min": round(min(levels), 1),
+        "fill_max": round(max(levels), 1),
+        "fill_mean": round(sum(levels) / len(levels), 1),
+        "fill_p90": round(float(np.percentile(levels, 90)), 1),
+        "representative_frame": representative["frame"],
+        "representative_seconds": representative["seconds"]
+    }, representative
@@ -0,0 +1,336 @@
+import math
+import threading
+import time
+from collections import defaultdict
+import numpy as np
+from scipy.sparse import coo_matrix
+from scipy.sparse.csgraph import connected_components
+from app import routing
+from app.metrics import metrics
+from config import Config
+
+EARTH_RADIUS_KM = routing.EARTH_RADIUS_KM
+NOISE = -1
+
+_index = None
+_index_lock = threading.Lock()
+
+
+class ZoneIndex:
+    """
+    Grid-accelerated, weighted DBSCAN over open reports. Points live in a
+    grid of eps-sized cells, so neighbour search only looks at the 3x3
+    surrounding cells. A point is a core point when the priority weights
+    within eps (itself included) reach `min_weight`, which lets a few
+    critical reports form a zone where routine ones would stay unzoned.
+
+    Adding or removing a report only re-clusters the zones it can touch:
+    the zones around it, plus the zones next to any point whose core status
+    it flipped. Zone ids stay stable across updates where possible.
+    """
+
+    def __init__(self, eps_km=None, min_weight=None, priority_weights=None, origin_lat=None):
+        self.eps = eps_km or Config.ZONE_EPS_KM
+        self.min_weight = min_weight or Config.ZONE_MIN_WEIGHT
+        self.priority_weights = priority_weights or Config.ZONE_PRIORITY_WEIGHTS
+        origin_lat = Config.ROUTING_DEPOT[0] if origin_lat is None else origin_lat
+        self.cos_lat = math.cos(math.radians(origin_lat))
+        self.points = {}
+        self.cells = defaultdict(set)
+        self.density = {}
+        self.labels = {}
+        self.members = defaultdict(set)
+        self.version = 0
+        self._next_label = 0
+        self._lock = threading.RLock()
+
+    # Geometry
+
+    def _project(self, lat, lng):
+        """Equirectangular km around the origin latitude; accurate at city scale"""
+        return (
+            EARTH_RADIUS_KM * math.radians(lng) * self.cos_lat,
+            EARTH_RADIUS_KM * math.radians(lat)
+        )
+
+    def _cell(self, x, y):
+        return int(math.floor(x / self.eps)), int(math.floor(y / self.eps))
+
+    def _pairs(self, ids):
+        """
+        (source, target) id arrays for every point within eps of a point in
+        `ids`, self-pairs included; targets may lie anywhere in the index.
+        Work is done one cell at a time as a small dense distance block.
+        """
+        cell_arrays = {}
+
+        def cell_points(cell):
+            if cell not in cell_arrays:
+                members = np.fromiter(self.cells.get(cell, ()), dtype=np.int64)
+                coords = np.array([self.points[i]['xy'] for i in members.tolist()], dtype=float).reshape(-1, 2)
+                cell_arrays[cell] = members, coords
+            return cell_arrays[cell]
+
+        by_cell = defaultdict(list)
+        for point_id in ids:
+            by_cell[self.points[point_id]['cell']].append(point_id)
+
+        eps_squared = self.eps * self.eps
+        sources, targets = [], []
+        for (cx, cy), cell_ids in by_cell.items():
+            source_ids = np.array(cell_ids, dtype=np.int64)
+            source_xy = np.array([self.points[i]['xy'] for i in cell_ids], dtype=float)
+            near = [cell_points((cx + dx, cy + dy)) for dx in (-1, 0, 1) for dy in (-1, 0, 1)]
+            near_ids = np.concatenate([members for members, _ in near])
+            near_xy = np.concatenate([coords for _, coords in near])
+            if not len(near_ids):
+                continue
+            dx = source_xy[:, 0, None] - near_xy[None, :, 0]
+            dy = source_xy[:, 1, None] - near_xy[None, :, 1]
+            a, b = np.nonzero(dx * dx + dy * dy <= eps_squared)
+            sources.append(source_ids[a])
+            targets.append(near_ids[b])
+
+        if not sources:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+        return np.concatenate(sources), np.concatenate(targets)
+
+    def _neighbors(self, point_id):
+        sources, targets = self._pairs([point_id])
+        return [target for target in targets.tolist() if target != point_id]
+
+    def _is_core(self, point_id):
+        return self.density[point_id] >= self.min_weight
+
+    # Clustering
+
+    def _recluster(self, ids, pairs=None):
+        """
+        Recompute labels for `ids`, which must contain every member of each
+        zone it touches. Core status comes from the maintained densities.
+        """
+        ids = np.array(sorted(ids), dtype=np.int64)
+        if not len(ids):
+            return
+        old_labels = np.array([self.labels.get(point_id, NOISE) for point_id in ids.tolist()], dtype=np.int64)
+        for label in set(old_labels.tolist()) - {NOISE}:
+            self.members[label].difference_update(ids.tolist())
+            if not self.members[label]:
+                del self.members[label]
+
+        core = np.array([self._is_core(point_id) for point_id in ids.tolist()], dtype=bool)
+        sources, targets = pairs if pairs is not None else self._pairs(ids.tolist())
+        source_pos = np.searchsorted(ids, sources)
+        target_pos = np.minimum(np.searchsorted(ids, targets), len(ids) - 1)
+        inside = ids[target_pos] == targets
+
+        # Core-to-core links inside the region define the zones
+        linked = inside & core[source_pos] & core[target_pos]
+        graph = coo_matrix(
+            (np.ones(int(linked.sum())), (source_pos[linked], target_pos[linked])),
+            shape=(len(ids), len(ids))
+        )
+        _, component = connected_components(graph, directed=False)
+
+        labels = np.full(len(ids), NOISE, dtype=np.int64)
+        used = set(self.members)
+        core_pos = np.nonzero(core)[0]
+        core_pos = core_pos[np.argsort(component[core_pos], kind='stable')]
+        splits = np.nonzero(np.diff(component[core_pos]))[0] + 1
+        for members in np.split(core_pos, splits) if len(core_pos) else []:
+            label = self._stable_label(old_labels[members], used)
+            labels[members] = label
+            used.add(label)
+
+        # Border points join the zone of the first core point within eps,
+        # which may sit just outside the region in an untouched zone
+        border = ~core[source_pos]
+        target_labels = np.where(inside & core[target_pos], labels[target_pos], NOISE)
+        for k in np.nonzero(border & ~inside)[0].tolist():
+            target = int(targets[k])
+            if self._is_core(target):
+                target_labels[k] = self.labels.get(target, NOISE)
+        candidates = np.nonzero(border & (target_labels != NOISE))[0]
+        first_source, first = np.unique(source_pos[candidates], return_index=True)
+        labels[first_source] = target_labels[candidates[first]]
+
+        for point_id, label in zip(ids.tolist(), labels.tolist()):
+            self.labels[point_id] = label
+            if label != NOISE:
+                self.members[label].add(point_id)
+        self.version += 1
+
+    def _stable_label(self, previous, used):
+        """Keep the most common previous zone id if it is still free, else allocate one"""
+        previous = previous[previous != NOISE]
+        if len(previous):
+            values, counts = np.unique(previous, return_counts=True)
+            for label in values[np.lexsort((values, -counts))].tolist():
+                if label not in used:
+                    return label
+        label = self._next_label
+        self._next_label += 1
+        return label
+
+    def load(self, stops):
+        """Full clustering of `stops` (dicts with report_id, lat, lng, priority)"""
+        with self._lock:
+            self.points.clear()
+            self.cells.clear()
+            self.labels.clear()
+            self.members.clear()
+            for stop in stops:
+                self._place(stop)
+            ids = np.array(sorted(self.points), dtype=np.int64)
+            weights = np.array([self.points[point_id]['weight'] for point_id in ids.tolist()])
+            sources, targets = self._pairs(ids.tolist())
+            density = np.bincount(
+                np.searchsorted(ids, sources),
+                weights=weights[np.searchsorted(ids, targets)],
+                minlength=len(ids)
+            )
+            self.density = dict(zip(ids.tolist(), density.tolist()))
+            self._recluster(ids.tolist(), pairs=(sources, targets))
+
+    def _place(self, stop):
+        xy = self._project(stop['lat'], stop['lng'])
+        cell = self._cell(*xy)
+        self.points[stop['report_id']] = {
+            'xy': xy,
+            'cell': cell,
+            'lat': stop['lat'],
+            'lng': stop['lng'],
+            'priority': stop['priority'],
+            'weight': float(self.priority_weights.get(stop['priority'], 1))
+        }
+        self.cells[cell].add(stop['report_id'])
+
+    def _affected(self, point_ids):
+        """Every member of the zones the given points belong to or touch"""
+        region = set(point_ids)
+        for point_id in point_ids:
+            label = self.labels.get(point_id, NOISE)
+            if label != NOISE:
+                region |= self.members.get(label, set())
+        return region
+
+    def add(self, stop):
+        started = time.perf_counter()
+        with self._lock:
+            if stop['report_id'] in self.points:
+                self._remove(stop['report_id'])
+            self._place(stop)
+            point_id = stop['report_id']
+            weight = self.points[point_id]['weight']
+            neighbors = self._neighbors(point_id)
+
+            self.density[point_id] = weight + sum(self.points[n]['weight'] for n in neighbors)
+            flipped = [point_id] if self._is_core(point_id) else []
+            for neighbor in neighbors:
+                was_core = self._is_core(neighbor)
+                self.density[neighbor] += weight
+                if not was_core and self._is_core(neighbor):
+                    flipped.append(neighbor)
+
+            # A new core point can merge the zones of everything within its reach
+            touched = {point_id, *neighbors}
+            for core_id in flipped:
+                touched.update(self._neighbors(core_id))
+            self._recluster(self._affected(touched))
+        metrics.observe('zones.update_ms', (time.perf_counter() - started) * 1000)
+
+    def _remove(self, point_id):
+        neighbors = self._neighbors(point_id)
+        region = self._affected({point_id, *neighbors})
+        weight = self.points[point_id]['weight']
+        for neighbor in neighbors:
+            self.density[neighbor] -= weight
+
+        label = self.labels.pop(point_id, NOISE)
+        if label != NOISE:
+            self.members[label].discard(point_id)
+            if not self.members[label]:
+                del self.members[label]
+        self.cells[self.points[point_id]['cell']].discard(point_id)
+        del self.points[point_id]
+        del self.density[point_id]
+
+        # Losing a point can only split or shrink the zones around it
+        region.discard(point_id)
+        self._recluster(region)
+
+    def remove(self, point_id):
+        with self._lock:
+            if point_id not in self.points:
+                return False
+            self._remove(point_id)
+            return True
+
+    # Output
+
+    def zones(self, include_reports=False):
+        """Zones ordered by their most urgent report, then by total weight"""
+        with self._lock:
+            zones = []
+            for label, members in self.members.items():
+                members = sorted(members)
+                points = [self.points[point_id] for point_id in members]
+                lats = np.array([point['lat'] for point in points])
+                lngs = np.array([point['lng'] for point in points])
+                weights = np.array([point['weight'] for point in points])
+                priorities = defaultdict(int)
+                for point in points:
+                    priorities[point['priority']] += 1
+                zone = {
+                    'zone_id': label,
+                    'size': len(members),
+                    'weight': float(weights.sum()),
+                    'top_priority': min(priorities, key=lambda p: routing.PRIORITY_RANK.get(p, 4)),
+                    'priorities': dict(priorities),
+                    'centroid': {
+                        'lat': float(np.average(lats, weights=weights)),
+                        'lng': float(np.average(lngs, weights=weights))
+                    },
+                    'bounds': {
+                        'south': float(lats.min()), 'west': float(lngs.min()),
+                        'north': float(lats.max()), 'east': float(lngs.max())
+                    }
+                }
+                if include_reports:
+                    zone['report_ids'] = members
+                zones.append(zone)
+
+            zones.sort(key=lambda zone: (routing.PRIORITY_RANK.get(zone['top_priority'], 4), -zone['weight']))
+            return {
+                'version': self.version,
+                'eps_km': self.eps,
+                'min_weight': self.min_weight,
+                'zones': zones,
+                'unzoned': sum(1 for label in self.labels.values() if label == NOISE)
+            }
+
+
+def get_index():
+    """The process-wide zone index, clustered from pending reports on first use"""
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                index = ZoneIndex()
+                index.load(routing.pending_stops())
+                _index = index
+    return _index
+
+
+def report_changed(report):
+    """Keep zones in step with a created or updated report; only open reports are zoned"""
+    index = get_index()
+    if report.status != 'Pending' or report.latitude is None or report.longitude is None:
+        return index.remove(report.id)
+    index.add(routing.stop_from_report(report))
+    return True
+
+
+def report_deleted(report_id):
+    if _index is not None:
+        _index.remove(report_id)
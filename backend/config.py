@@ -6,16 +6,152 @@ class Config():
     
     UPLOAD_FOLDER = os.path.join(basedir,'app','uploads')
     RESULTS_FOLDER = os.path.join(basedir,'app','results')
+    DERIVATIVES_FOLDER = os.path.join(basedir,'app','derivatives')
+    TILES_FOLDER = os.path.join(basedir,'app','tiles')
     os.makedirs(UPLOAD_FOLDER, exist_ok=True)
     os.makedirs(RESULTS_FOLDER, exist_ok=True)
+    os.makedirs(DERIVATIVES_FOLDER, exist_ok=True)
+    os.makedirs(TILES_FOLDER, exist_ok=True)
+
+    # Resized image cache (thumbnails for listings, medium for modals)
+    DERIVATIVE_SIZES = {'thumb': 160, 'medium': 640}
+    DERIVATIVE_CACHE_MAX_BYTES = int(os.environ.get('DERIVATIVE_CACHE_MAX_BYTES', 512 * 1024 * 1024))
+    DERIVATIVE_MAX_AGE = 30 * 24 * 3600
+
+    # Retention for uploads/ and results/ (files referenced by Reports are never deleted)
+    RETENTION_ENABLED = os.environ.get('RETENTION_ENABLED', 'false').lower() == 'true'
+    RETENTION_DRY_RUN = os.environ.get('RETENTION_DRY_RUN', 'false').lower() == 'true'
+    RETENTION_MAX_AGE_DAYS = float(os.environ.get('RETENTION_MAX_AGE_DAYS', 30))
+    RETENTION_MAX_BYTES = int(os.environ.get('RETENTION_MAX_BYTES', 5 * 1024 * 1024 * 1024))
+    RETENTION_MIN_AGE_SECONDS = 3600
+    RETENTION_INTERVAL_SECONDS = int(os.environ.get('RETENTION_INTERVAL_SECONDS', 3600))
     
     # Roboflow API Setup
 
+    INFERENCE_API_URL = os.environ.get('INFERENCE_API_URL') or "https://serverless.roboflow.com"
+    INFERENCE_API_KEY = os.environ.get('INFERENCE_API_KEY') or "3IU9udNBJgg1CMyaG6Z8"
     CLIENT = InferenceHTTPClient(
-        api_url="https://serverless.roboflow.com",
-        api_key="3IU9udNBJgg1CMyaG6Z8"
+        api_url=INFERENCE_API_URL,
+        api_key=INFERENCE_API_KEY
     )
     MODEL_ID = "garbage-can-overflow/1"
+
+    # Inference resilience: total time budget per call, retries on transient
+    # errors, breaker trip threshold/reset, and optional hedging delay
+    INFERENCE_TIMEOUT = float(os.environ.get('INFERENCE_TIMEOUT', 30))
+    INFERENCE_RETRIES = int(os.environ.get('INFERENCE_RETRIES', 2))
+    INFERENCE_BREAKER_FAILURES = int(os.environ.get('INFERENCE_BREAKER_FAILURES', 5))
+    INFERENCE_BREAKER_RESET = float(os.environ.get('INFERENCE_BREAKER_RESET', 30))
+    INFERENCE_HEDGE_AFTER = float(os.environ.get('INFERENCE_HEDGE_AFTER', 0)) or None
+
+    # Shared inference HTTP pool: at most INFERENCE_POOL_SIZE keep-alive
+    # connections (idle ones kept INFERENCE_KEEPALIVE seconds) used by every
+    # request thread and event loop; disabling it falls back to CLIENT
+    INFERENCE_POOLED = os.environ.get('INFERENCE_POOLED', 'true').lower() == 'true'
+    INFERENCE_POOL_SIZE = int(os.environ.get('INFERENCE_POOL_SIZE', 16))
+    INFERENCE_KEEPALIVE = float(os.environ.get('INFERENCE_KEEPALIVE', 30))
+
+    # Process pool for OpenCV decode/annotate/encode (0 workers = one per core)
+    CV_POOL_ENABLED = os.environ.get('CV_POOL_ENABLED', 'true').lower() == 'true'
+    CV_POOL_WORKERS = int(os.environ.get('CV_POOL_WORKERS', 0))
+
+    # Admission control for analysis endpoints: images processed at once,
+    # requests allowed to wait and for how long, and optional per-client
+    # rate limits (0 per minute disables them). Clients are told apart by
+    # address, or by X-Client-Id when it is a camera id or one of these keys
+    ADMISSION_ENABLED = os.environ.get('ADMISSION_ENABLED', 'true').lower() == 'true'
+    ADMISSION_MAX_IN_FLIGHT = int(os.environ.get('ADMISSION_MAX_IN_FLIGHT', 8))
+    ADMISSION_MAX_QUEUE = int(os.environ.get('ADMISSION_MAX_QUEUE', 16))
+    ADMISSION_QUEUE_TIMEOUT = float(os.environ.get('ADMISSION_QUEUE_TIMEOUT', 10))
+    RATE_LIMIT_PER_MINUTE = float(os.environ.get('RATE_LIMIT_PER_MINUTE', 0))
+    RATE_LIMIT_BURST = int(os.environ.get('RATE_LIMIT_BURST', 10))
+    ADMISSION_CLIENT_KEYS = frozenset(
+        key.strip() for key in os.environ.get('ADMISSION_CLIENT_KEYS', '').split(',') if key.strip()
+    )
+
+    # Upload limits: largest single image, largest request, and the chunk size
+    # multipart bodies are read in. JSON reports carry base64 (4/3 larger)
+    UPLOAD_MAX_FILE_BYTES = int(os.environ.get('UPLOAD_MAX_FILE_BYTES', 20 * 1024 * 1024))
+    UPLOAD_MAX_REQUEST_BYTES = int(os.environ.get('UPLOAD_MAX_REQUEST_BYTES', 500 * 1024 * 1024))
+    UPLOAD_CHUNK_BYTES = 64 * 1024
+    REPORT_JSON_MAX_BYTES = UPLOAD_MAX_FILE_BYTES * 4 // 3 + 64 * 1024
+
+    # Video clips: a frame every VIDEO_SAMPLE_SECONDS, or on scene changes
+    # (mean grey-level difference of a thumbnail above VIDEO_SCENE_THRESHOLD,
+    # 0-255), at most VIDEO_MAX_FRAMES per clip, VIDEO_CONCURRENCY analysed at once
+    VIDEO_MAX_FILE_BYTES = int(os.environ.get('VIDEO_MAX_FILE_BYTES', 200 * 1024 * 1024))
+    VIDEO_SAMPLE_SECONDS = float(os.environ.get('VIDEO_SAMPLE_SECONDS', 2))
+    VIDEO_SCENE_THRESHOLD = float(os.environ.get('VIDEO_SCENE_THRESHOLD', 12))
+    VIDEO_MAX_FRAMES = int(os.environ.get('VIDEO_MAX_FRAMES', 120))
+    VIDEO_CONCURRENCY = int(os.environ.get('VIDEO_CONCURRENCY', 4))
+
+    # Most reports one bulk update call may change
+    BULK_UPDATE_MAX = int(os.environ.get('BULK_UPDATE_MAX', 1000))
+
+    # Request tracing: requests slower than SLOW_REQUEST_MS are written as JSON
+    # lines to SLOW_LOG_PATH (stderr when unset)
+    TRACING_ENABLED = os.environ.get('TRACING_ENABLED', 'true').lower() == 'true'
+    SLOW_REQUEST_MS = float(os.environ.get('SLOW_REQUEST_MS', 1000))
+    SLOW_LOG_PATH = os.environ.get('SLOW_LOG_PATH')
+
+    # On-demand profiling under /api/admin/profiling, for holders of ADMIN_TOKEN
+    # (sent as X-Admin-Token); with it disabled no profiling hooks are installed
+    PROFILING_ENABLED = os.environ.get('PROFILING_ENABLED', 'false').lower() == 'true'
+    ADMIN_TOKEN = os.environ.get('ADMIN_TOKEN')
+
+    # Conditional GET: ETags from the per-table data versions kept in the
+    # database, fresh bodies cached in memory per version
+    ETAGS_ENABLED = os.environ.get('ETAGS_ENABLED', 'true').lower() == 'true'
+    RESPONSE_CACHE_MAX_BYTES = int(os.environ.get('RESPONSE_CACHE_MAX_BYTES', 64 * 1024 * 1024))
+
+    # Response compression (brotli when installed, else gzip) for compressible
+    # bodies of at least COMPRESS_MIN_BYTES
+    COMPRESS_ENABLED = os.environ.get('COMPRESS_ENABLED', 'true').lower() == 'true'
+    COMPRESS_MIN_BYTES = int(os.environ.get('COMPRESS_MIN_BYTES', 1024))
+    # Level 1 compresses a 10k-row report list about 4x at half the cost of level 6
+    COMPRESS_GZIP_LEVEL = int(os.environ.get('COMPRESS_GZIP_LEVEL', 1))
+    COMPRESS_BROTLI_QUALITY = 5
+
+    # Camera health probing: every CAMERA_PROBE_INTERVAL seconds (+/- jitter as
+    # a fraction) each camera address gets an HTTP GET or TCP connect with a
+    # short timeout; CAMERA_PROBE_FAILURES misses in a row mark it inactive.
+    # On-demand sweeps need ADMIN_TOKEN and run at most once per
+    # CAMERA_PROBE_MIN_INTERVAL seconds
+    CAMERA_PROBE_ENABLED = os.environ.get('CAMERA_PROBE_ENABLED', 'false').lower() == 'true'
+    CAMERA_PROBE_INTERVAL = float(os.environ.get('CAMERA_PROBE_INTERVAL', 60))
+    CAMERA_PROBE_JITTER = 0.2
+    CAMERA_PROBE_MIN_INTERVAL = float(os.environ.get('CAMERA_PROBE_MIN_INTERVAL', 10))
+    CAMERA_PROBE_TIMEOUT = float(os.environ.get('CAMERA_PROBE_TIMEOUT', 2))
+    CAMERA_PROBE_CONCURRENCY = int(os.environ.get('CAMERA_PROBE_CONCURRENCY', 100))
+    CAMERA_PROBE_FAILURES = int(os.environ.get('CAMERA_PROBE_FAILURES', 2))
+    CAMERA_PROBE_MODE = os.environ.get('CAMERA_PROBE_MODE', 'http')
+    CAMERA_PROBE_SCHEME = 'http'
+    CAMERA_PROBE_PORT = int(os.environ.get('CAMERA_PROBE_PORT', 80))
+    CAMERA_PROBE_PATH = os.environ.get('CAMERA_PROBE_PATH', '/')
+
+    # Collection routing: depot, trucks on the road, stops either side of an
+    # insertion that get re-optimised, and the background full re-plan interval
+    ROUTING_DEPOT = (
+        float(os.environ.get('ROUTING_DEPOT_LAT', -1.2921)),
+        float(os.environ.get('ROUTING_DEPOT_LNG', 36.8219))
+    )
+    ROUTING_VEHICLES = int(os.environ.get('ROUTING_VEHICLES', 3))
+    ROUTING_REPAIR_WINDOW = int(os.environ.get('ROUTING_REPAIR_WINDOW', 4))
+    ROUTING_REOPTIMIZE_SECONDS = int(os.environ.get('ROUTING_REOPTIMIZE_SECONDS', 300))
+
+    # Collection zones (weighted DBSCAN): neighbourhood radius, summed priority
+    # weight that makes a report a zone core, and the weight of each priority
+    ZONE_EPS_KM = float(os.environ.get('ZONE_EPS_KM', 0.5))
+    ZONE_MIN_WEIGHT = float(os.environ.get('ZONE_MIN_WEIGHT', 3))
+    ZONE_PRIORITY_WEIGHTS = {'Critical': 3, 'High': 2, 'Medium': 1, 'Low': 1}
+
+    # Map heatmap tiles: cells per tile side, deepest zoom served, how long
+    # a cached tile is trusted before it is rebuilt, and the size of the tile
+    # cache (least recently used tiles are evicted past it)
+    TILE_GRID = int(os.environ.get('TILE_GRID', 32))
+    TILE_MAX_ZOOM = int(os.environ.get('TILE_MAX_ZOOM', 18))
+    TILE_MAX_AGE = int(os.environ.get('TILE_MAX_AGE', 300))
+    TILE_CACHE_MAX_BYTES = int(os.environ.get('TILE_CACHE_MAX_BYTES', 256 * 1024 * 1024))
     SECRET_KEY = 'try me'
     SQLALCHEMY_DATABASE_URI =os.environ.get('DATABASE_URL') or \
         'sqlite:///'+os.path.join(basedir,'instances','app.db')
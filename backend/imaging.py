@@ -0,0 +1,155 @@
+"""CPU-bound OpenCV work (decode, draw, encode) in a process pool; no Flask/app imports."""
+import multiprocessing
+import os
+import sys
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import shared_memory
+import cv2
+import numpy as np
+from PIL import Image
+
+DEFAULT_STYLE = {
+    'color': (0, 255, 0),
+    'thickness': 2,
+    'labels': True,
+    'font_scale': 0.6
+}
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def in_pool_worker():
+    """
+    True in a pool worker. parent_process() is only set once the worker has
+    started; while it re-imports the main script, __mp_main__ is a separate
+    module from __main__ (everywhere else multiprocessing aliases the two)
+    """
+    if multiprocessing.parent_process() is not None:
+        return True
+    return sys.modules.get('__mp_main__') is not sys.modules.get('__main__')
+
+
+# Worker side
+
+def _init_worker():
+    # One OpenCV thread per process; the pool provides the parallelism
+    cv2.setNumThreads(1)
+
+
+def draw_predictions(img, predictions, style=None):
+    """Draw boxes (and optionally class/confidence labels) in place"""
+    style = dict(DEFAULT_STYLE, **(style or {}))
+    color = tuple(style['color'])
+    for pred in predictions:
+        x, y, w, h = pred["x"], pred["y"], pred["width"], pred["height"]
+
+        # Convert to box corners
+        x1, y1 = int(x - w / 2), int(y - h / 2)
+        x2, y2 = int(x + w / 2), int(y + h / 2)
+
+        cv2.rectangle(img, (x1, y1), (x2, y2), color, style['thickness'])
+        if style['labels']:
+            cv2.putText(img, f"{pred['class']} {pred['confidence']:.2f}",
+                        (x1, y1 - 5), cv2.FONT_HERSHEY_SIMPLEX,
+                        style['font_scale'], color, style['thickness'])
+    return img
+
+
+def _annotate(img, predictions, output_path, style):
+    if img is None:
+        return None
+    height, width = img.shape[:2]
+    draw_predictions(img, predictions, style)
+    cv2.imwrite(output_path, img)
+    return height, width
+
+
+def annotate_file(source_path, predictions, output_path, style=None):
+    """Decode an image file, draw predictions and write the annotated JPEG"""
+    return _annotate(cv2.imread(source_path), predictions, output_path, style)
+
+
+def annotate_shared(shm_name, size, predictions, output_path, style=None):
+    """Same as annotate_file, decoding encoded bytes from a shared memory block"""
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        buffer = np.ndarray((size,), dtype=np.uint8, buffer=shm.buf)
+        img = cv2.imdecode(buffer, cv2.IMREAD_COLOR)
+        del buffer
+        return _annotate(img, predictions, output_path, style)
+    finally:
+        shm.close()
+
+
+def image_size(source_path):
+    """(height, width) from the file header, without decoding pixels"""
+    try:
+        with Image.open(source_path) as img:
+            return img.height, img.width
+    except (OSError, ValueError):
+        return None
+
+
+# Parent side
+
+def pool_size():
+    from config import Config
+    return Config.CV_POOL_WORKERS or os.cpu_count() or 1
+
+
+def pool_enabled():
+    from config import Config
+    return Config.CV_POOL_ENABLED
+
+
+def get_pool():
+    """Lazily start the shared pool; forkserver keeps request threads out of the workers"""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                context = multiprocessing.get_context('forkserver')
+                context.set_forkserver_preload(['imaging'])
+                _pool = ProcessPoolExecutor(
+                    max_workers=pool_size(),
+                    mp_context=context,
+                    initializer=_init_worker
+                )
+    return _pool
+
+
+def run_in_pool(fn, *args):
+    """Run fn in the pool, replacing the pool once if a worker died"""
+    global _pool
+    try:
+        return get_pool().submit(fn, *args).result()
+    except BrokenProcessPool:
+        with _pool_lock:
+            _pool = None
+        return get_pool().submit(fn, *args).result()
+
+
+def annotate(source, predictions, output_path, style=None):
+    """
+    Annotate `source` (a file path, or encoded image bytes) into output_path.
+    Returns (height, width), or None if the image could not be decoded.
+    """
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        if not pool_enabled():
+            img = cv2.imdecode(np.frombuffer(source, dtype=np.uint8), cv2.IMREAD_COLOR)
+            return _annotate(img, predictions, output_path, style)
+
+        shm = shared_memory.SharedMemory(create=True, size=max(1, len(source)))
+        try:
+            shm.buf[:len(source)] = source
+            return run_in_pool(annotate_shared, shm.name, len(source), predictions, output_path, style)
+        finally:
+            shm.close()
+            shm.unlink()
+
+    if not pool_enabled():
+        return annotate_file(source, predictions, output_path, style)
+    return run_in_pool(annotate_file, source, predictions, output_path, style)
@@ -0,0 +1,50 @@
+"""report ids are never reused
+
+Revision ID: b3e81f6a2c47
+Revises: d67496980bdb
+Create Date: 2026-10-19 18:12:40.511927
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b3e81f6a2c47'
+down_revision = 'd67496980bdb'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    bind = op.get_bind()
+
+    # Highest id any row was ever linked to, so the sequence starts past
+    # reports that were deleted before ids stopped being reused
+    last_id = bind.execute(sa.text(
+        "SELECT max(id) FROM ("
+        " SELECT max(id) AS id FROM reports"
+        " UNION ALL SELECT max(report_id) FROM analyses"
+        " UNION ALL SELECT max(report_id) FROM detections)"
+    )).scalar() or 0
+
+    # Links left behind by deletes made while foreign keys were not enforced
+    for table in ('analyses', 'detections'):
+        op.execute(
+            f"UPDATE {table} SET report_id = NULL "
+            f"WHERE report_id IS NOT NULL AND report_id NOT IN (SELECT id FROM reports)"
+        )
+
+    if bind.dialect.name == 'sqlite':
+        with op.batch_alter_table('reports', recreate='always',
+                                  table_kwargs={'sqlite_autoincrement': True}) as batch_op:
+            pass
+        op.execute("DELETE FROM sqlite_sequence WHERE name = 'reports'")
+        op.execute(sa.text("INSERT INTO sqlite_sequence (name, seq) VALUES ('reports', :seq)").bindparams(seq=last_id))
+
+
+def downgrade():
+    if op.get_bind().dialect.name == 'sqlite':
+        with op.batch_alter_table('reports', recreate='always',
+                                  table_kwargs={'sqlite_autoincrement': False}) as batch_op:
+            pass
@@ -0,0 +1,34 @@
+"""unlink stale status history
+
+Revision ID: e2a7f5c9d164
+Revises: c91d4e7f3a82
+Create Date: 2026-10-19 19:41:05.172936
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e2a7f5c9d164'
+down_revision = 'c91d4e7f3a82'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # History of deleted reports kept its report_id while foreign keys were
+    # not enforced on SQLite, and showed up under the report that reused the
+    # id. Unlink rows whose report is gone and rows older than the current
+    # report's creation row; the histograms are unaffected
+    op.execute(
+        "UPDATE report_status_change SET report_id = NULL"
+        " WHERE report_id IS NOT NULL AND ("
+        " report_id NOT IN (SELECT id FROM reports)"
+        " OR id < (SELECT coalesce(max(created.id), 0) FROM report_status_change AS created"
+        " WHERE created.report_id = report_status_change.report_id AND created.from_status IS NULL))"
+    )
+
+
+def downgrade():
+    pass
@@ -1,96 +1,127 @@
 from datetime import datetime
 from config import Config
-import cv2
+from app.inference import ResilientInferenceClient, PooledInferenceClient, InferenceError, CircuitOpenError
+from app import tracing
+import imaging
 import os 
-CLIENT = Config.CLIENT
+
+# OpenCV pool workers re-import the app through __mp_main__, and this module
+# with it; only the serving process calls inference, so workers don't get
+# the client's executor
+SERVING_PROCESS = not imaging.in_pool_worker()
+
+CLIENT = ResilientInferenceClient(
+    PooledInferenceClient(Config.INFERENCE_API_URL, Config.INFERENCE_API_KEY)
+    if Config.INFERENCE_POOLED else Config.CLIENT
+) if SERVING_PROCESS else None
 MODEL_ID = Config.MODEL_ID
 RESULTS_FOLDER = Config.RESULTS_FOLDER
 import uuid
 
-def predict_and_annotate(image_path):
-    """Run inference and annotate image"""
+
+def categorize_fullness(fullness_pct):
+    """(status, rounded fill level, urgency) for a fill percentage"""
+    if fullness_pct == 0:
+        return "Empty", 0, "Low"
+    fill_level = round(fullness_pct, 1)
+    if fullness_pct < 20:
+        return "Low", fill_level, "Low"
+    if fullness_pct < 60:
+        return "Half Full", fill_level, "Medium"
+    if fullness_pct < 90:
+        return "Almost Full", fill_level, "High"
+    return "Overflow", fill_level, "Critical"
+
+
+def summarize_predictions(preds, width, height):
+    """Turn raw predictions into fill level, urgency, waste type and confidence"""
+    total_garbage_area = 0
+    detected_items = []
+
+    for pred in preds:
+        # Track detected items
+        detected_items.append({
+            "class": pred["class"],
+            "confidence": round(pred["confidence"] * 100, 2)
+        })
+
+        # Add area for fullness estimate
+        total_garbage_area += pred["width"] * pred["height"]
+
+    # Estimate fullness
+    fullness_pct = (total_garbage_area / (width * height)) * 100 if preds else 0
+
+    fullness_status, fill_level, urgency = categorize_fullness(fullness_pct)
+
+    # Determine waste type from detected items
+    waste_types = list(set([item["class"] for item in detected_items]))
+    waste_type = "Mixed Waste" if len(waste_types) > 1 else (waste_types[0] if waste_types else "Unknown")
+
+    return {
+        "wasteType": waste_type,
+        "urgency": urgency,
+        "fillLevel": fill_level,
+        "confidence": round(sum([p["confidence"] for p in preds]) / len(preds) * 100, 2) if preds else 0,
+        "detectedItems": [item["class"] for item in detected_items],
+        "predictions": len(preds)
+    }
+
+
+@tracing.traced()
+def predict_and_annotate(image_path, annotate=False):
+    """
+    Run inference and score the image. The annotated image name is reserved
+    but only drawn when `annotate` is set; otherwise it is rendered on demand
+    from the returned detections.
+    """
     try:
-        result = CLIENT.infer(image_path, model_id=MODEL_ID)
-        img = cv2.imread(image_path)
-        
-        if img is None:
-            return {"error": "Failed to read image"}
-        
-        height, width, _ = img.shape
+        with tracing.span('inference', model_id=MODEL_ID):
+            result = CLIENT.infer(image_path, model_id=MODEL_ID)
         preds = result.get("predictions", [])
-        total_garbage_area = 0
-        detected_items = []
-
-        for pred in preds:
-            x, y, w, h = pred["x"], pred["y"], pred["width"], pred["height"]
-            class_name = pred["class"]
-            conf = pred["confidence"]
-
-            # Convert to box corners
-            x1, y1 = int(x - w / 2), int(y - h / 2)
-            x2, y2 = int(x + w / 2), int(y + h / 2)
-
-            # Draw bounding box
-            cv2.rectangle(img, (x1, y1), (x2, y2), (0, 255, 0), 2)
-            cv2.putText(img, f"{class_name} {conf:.2f}",
-                        (x1, y1 - 5), cv2.FONT_HERSHEY_SIMPLEX,
-                        0.6, (0, 255, 0), 2)
-
-            # Track detected items
-            detected_items.append({
-                "class": class_name,
-                "confidence": round(conf * 100, 2)
-            })
-
-            # Add area for fullness estimate
-            total_garbage_area += w * h
-
-        # Estimate fullness
-        fullness_pct = (total_garbage_area / (width * height)) * 100 if preds else 0
-
-        # Categorize fullness
-        if fullness_pct == 0:
-            fullness_status = "Empty"
-            fill_level = 0
-            urgency = "Low"
-        elif fullness_pct < 20:
-            fullness_status = "Low"
-            fill_level = round(fullness_pct, 1)
-            urgency = "Low"
-        elif fullness_pct < 60:
-            fullness_status = "Half Full"
-            fill_level = round(fullness_pct, 1)
-            urgency = "Medium"
-        elif fullness_pct < 90:
-            fullness_status = "Almost Full"
-            fill_level = round(fullness_pct, 1)
-            urgency = "High"
+
+        output_filename = f"{uuid.uuid4().hex}.jpg"
+        if annotate:
+            # Decode, draw and save the annotated image in the OpenCV process pool
+            with tracing.span('annotate'):
+                size = imaging.annotate(image_path, preds, os.path.join(RESULTS_FOLDER, output_filename))
         else:
-            fullness_status = "Overflow"
-            fill_level = round(fullness_pct, 1)
-            urgency = "Critical"
+            size = imaging.image_size(image_path)
 
-        # Determine waste type from detected items
-        waste_types = list(set([item["class"] for item in detected_items]))
-        waste_type = "Mixed Waste" if len(waste_types) > 1 else (waste_types[0] if waste_types else "Unknown")
+        if size is None:
+            return {"error": "Failed to read image"}
 
-        # Save annotated image
-        output_filename = f"{uuid.uuid4().hex}.jpg"
-        output_path = os.path.join(RESULTS_FOLDER, output_filename)
-        cv2.imwrite(output_path, img)
+        height, width = size
 
         return {
             "success": True,
-            "wasteType": waste_type,
-            "urgency": urgency,
-            "fillLevel": fill_level,
-            "confidence": round(sum([p["confidence"] for p in preds]) / len(preds) * 100, 2) if preds else 0,
-            "detectedItems": [item["class"] for item in detected_items],
-            "predictions": len(preds),
+            **summarize_predictions(preds, width, height),
+            "detections": [{
+                "class": pred["class"],
+                "confidence": pred["confidence"],
+                "x": pred["x"],
+                "y": pred["y"],
+                "width": pred["width"],
+                "height": pred["height"]
+            } for pred in preds],
+            "image_width": width,
+            "image_height": height,
             "output_image": output_filename,
             "timestamp": datetime.now().isoformat()
         }
     
+    except CircuitOpenError as e:
+        return {
+            "success": False,
+            "error": str(e),
+            "retryable": True,
+            "retry_after": e.retry_after
+        }
+    except InferenceError as e:
+        return {
+            "success": False,
+            "error": str(e),
+            "retryable": True
+        }
     except Exception as e:
         return {
             "success": False,
@@ -0,0 +1,79 @@
+import asyncio
+import os
+import tempfile
+import threading
+
+# Configure before the app is imported: a throwaway database and no
+# OpenCV process pool or background work
+_tmp = tempfile.mkdtemp(prefix='waste-tests-')
+os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(_tmp, 'test.db')
+os.environ.setdefault('CV_POOL_ENABLED', 'false')
+os.environ.setdefault('ROUTING_REOPTIMIZE_SECONDS', '0')
+os.environ.setdefault('RETENTION_ENABLED', 'false')
+os.environ.setdefault('CAMERA_PROBE_ENABLED', 'false')
+
+import pytest
+from aiohttp import web
+
+
+class StubServer:
+    """A local aiohttp server on its own event loop thread, standing in for an upstream"""
+
+    def __init__(self, routes):
+        self.routes = routes
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, name='stub-server', daemon=True)
+        self.runner = None
+        self.port = None
+
+    def start(self):
+        self.thread.start()
+        asyncio.run_coroutine_threadsafe(self._start(), self.loop).result()
+        return self
+
+    async def _start(self):
+        application = web.Application()
+        application.add_routes(self.routes)
+        self.runner = web.AppRunner(application)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, '127.0.0.1', 0)
+        await site.start()
+        self.port = site._server.sockets[0].getsockname()[1]
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.port}"
+
+    def stop(self):
+        asyncio.run_coroutine_threadsafe(self.runner.cleanup(), self.loop).result()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join(timeout=5)
+
+
+@pytest.fixture
+def stub_server():
+    """stub_server(routes) starts a StubServer; all are stopped after the test"""
+    servers = []
+
+    def start(routes):
+        server = StubServer(routes).start()
+        servers.append(server)
+        return server
+
+    yield start
+    for server in servers:
+        server.stop()
+
+
+@pytest.fixture(scope='session')
+def flask_app():
+    from app import app, db
+    app.config['TESTING'] = True
+    with app.app_context():
+        db.create_all()
+    return app
+
+
+@pytest.fixture
+def client(flask_app):
+    return flask_app.test_client()
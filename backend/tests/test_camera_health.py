@@ -0,0 +1,121 @@
+import asyncio
+import socket
+import pytest
+from aiohttp import web
+from app import db, camera_health
+from app.camera_health import ACTIVE, INACTIVE, CameraProber
+from app.models import Cameras
+from config import Config
+
+
+async def ok(request):
+    return web.Response(text='ok')
+
+
+async def slow(request):
+    await asyncio.sleep(1)
+    return web.Response(text='late')
+
+
+async def error(request):
+    return web.Response(status=500)
+
+
+@pytest.fixture
+def camera_server(stub_server):
+    return stub_server([web.get('/ok', ok), web.get('/slow', slow), web.get('/error', error)])
+
+
+@pytest.fixture
+def closed_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+@pytest.fixture
+def cameras(flask_app, camera_server):
+    """One camera per stand-in endpoint: name -> id"""
+    with flask_app.app_context():
+        db.session.execute(db.delete(Cameras))
+        rows = {
+            name: Cameras(name=name, location=1, status=ACTIVE, ipaddress=f"127.0.0.1:{camera_server.port}/{name}")
+            for name in ('ok', 'slow', 'error')
+        }
+        db.session.add_all(rows.values())
+        db.session.commit()
+        ids = {name: camera.id for name, camera in rows.items()}
+    yield ids
+    with flask_app.app_context():
+        db.session.execute(db.delete(Cameras))
+        db.session.commit()
+
+
+def statuses(flask_app):
+    with flask_app.app_context():
+        return dict(db.session.execute(db.select(Cameras.name, Cameras.status)).all())
+
+
+def test_probe_all_healthy_slow_and_failing(camera_server, closed_port):
+    prober = CameraProber(timeout=0.2, failures=2, mode='http')
+    results = asyncio.run(prober.probe_all([
+        (1, f"127.0.0.1:{camera_server.port}/ok"),
+        (2, f"127.0.0.1:{camera_server.port}/slow"),
+        (3, f"127.0.0.1:{camera_server.port}/error"),
+        (4, f"127.0.0.1:{closed_port}/"),
+    ]))
+    by_id = {result['camera_id']: result for result in results}
+
+    assert by_id[1]['up'] and by_id[1]['error'] is None
+    assert not by_id[2]['up'] and by_id[2]['error'] == 'timeout'
+    assert by_id[2]['latency_ms'] < 900
+    assert not by_id[3]['up'] and by_id[3]['error'] == 'HTTP 500'
+    assert not by_id[4]['up'] and by_id[4]['error']
+
+
+def test_tcp_mode(camera_server, closed_port):
+    prober = CameraProber(timeout=0.2, mode='tcp')
+    results = asyncio.run(prober.probe_all([
+        (1, f"127.0.0.1:{camera_server.port}"),
+        (2, f"127.0.0.1:{closed_port}"),
+    ]))
+    assert [result['up'] for result in results] == [True, False]
+
+
+def test_sweep_marks_cameras_down_after_repeated_failures(flask_app, cameras):
+    prober = CameraProber(timeout=0.2, failures=2, mode='http')
+    with flask_app.app_context():
+        first = prober.sweep()
+    assert first['probed'] == 3 and first['up'] == 1
+    assert first['changes'] == []
+    assert set(statuses(flask_app).values()) == {ACTIVE}
+
+    with flask_app.app_context():
+        second = prober.sweep()
+    assert sorted(change['id'] for change in second['changes']) == sorted([cameras['slow'], cameras['error']])
+    assert statuses(flask_app) == {'ok': ACTIVE, 'slow': INACTIVE, 'error': INACTIVE}
+
+
+@pytest.fixture
+def probe_endpoint(monkeypatch):
+    monkeypatch.setattr(Config, 'ADMIN_TOKEN', 'test-admin-token')
+    monkeypatch.setattr(Config, 'CAMERA_PROBE_MIN_INTERVAL', 30)
+    monkeypatch.setattr(camera_health, '_prober', CameraProber(timeout=0.2, failures=1, mode='http'))
+
+
+def test_probe_endpoint_requires_admin_token(client, probe_endpoint, cameras):
+    assert client.post('/api/cameras/probe').status_code == 403
+    assert client.post('/api/cameras/probe', headers={'X-Admin-Token': 'wrong'}).status_code == 403
+
+
+def test_probe_endpoint_sweeps_then_throttles(client, flask_app, probe_endpoint, cameras):
+    headers = {'X-Admin-Token': 'test-admin-token'}
+    response = client.post('/api/cameras/probe', headers=headers)
+    assert response.status_code == 200
+    assert response.get_json()['probed'] == 3
+    assert statuses(flask_app) == {'ok': ACTIVE, 'slow': INACTIVE, 'error': INACTIVE}
+
+    response = client.post('/api/cameras/probe', headers=headers)
+    assert response.status_code == 429
+    assert 0 < int(response.headers['Retry-After']) <= 30
+    assert response.get_json()['retry_after'] == int(response.headers['Retry-After'])
@@ -0,0 +1,87 @@
+import math
+import numpy as np
+import pytest
+from app.fill_levels import forecast_time_to_full
+
+START = 480000.0  # epoch hours
+
+
+def forecast(readings, **options):
+    """readings: (bin id, hours after START, level) tuples; one result per bin, by id"""
+    bins = np.asarray([bin_id for bin_id, _, _ in readings], dtype=object)
+    hours = np.asarray([START + offset for _, offset, _ in readings], dtype=float)
+    levels = np.asarray([level for _, _, level in readings], dtype=float)
+    return {result['bin_id']: result for result in forecast_time_to_full(bins, hours, levels, **options)}
+
+
+def test_linear_fit():
+    result = forecast([('a', 0, 10), ('a', 1, 20), ('a', 2, 30)])['a']
+    assert result['model'] == 'linear'
+    assert result['readings'] == 3
+    assert result['last_fill_level'] == 30
+    assert result['trend_per_hour'] == pytest.approx(10)
+    assert result['hours_to_full'] == pytest.approx(6)
+    assert result['expected_full_at'] is not None
+
+
+def test_exponential_fit_reports_points_per_hour():
+    # Doubling every hour: 10, 20, 40
+    result = forecast([('a', 0, 10), ('a', 1, 20), ('a', 2, 40)], model='exponential')['a']
+    assert result['model'] == 'exponential'
+    assert result['trend_per_hour'] == pytest.approx(40 * math.log(2), rel=1e-3)
+    assert result['hours_to_full'] == pytest.approx(math.log2(90 / 40), rel=1e-3)
+
+
+def test_models_agree_on_units_for_steady_growth():
+    readings = [('a', hour, 20 + 2 * hour) for hour in range(6)]
+    linear = forecast(readings)['a']['trend_per_hour']
+    exponential = forecast(readings, model='exponential')['a']['trend_per_hour']
+    # An exponential through straight-line data runs a little steep at the
+    # end, but both are points per hour (growth in percent would be about 8)
+    assert linear == pytest.approx(2)
+    assert 1.5 < exponential < 3
+
+
+@pytest.mark.parametrize('model', ['linear', 'exponential'])
+def test_flat_bin_never_fills(model):
+    result = forecast([('a', 0, 50), ('a', 1, 50), ('a', 2, 50)], model=model)['a']
+    assert result['trend_per_hour'] == pytest.approx(0)
+    assert result['hours_to_full'] is None
+    assert result['expected_full_at'] is None
+
+
+@pytest.mark.parametrize('model', ['linear', 'exponential'])
+def test_falling_bin_never_fills(model):
+    result = forecast([('a', 0, 60), ('a', 1, 55), ('a', 2, 50)], model=model)['a']
+    assert result['trend_per_hour'] < 0
+    assert result['hours_to_full'] is None
+
+
+@pytest.mark.parametrize('model', ['linear', 'exponential'])
+def test_single_reading_has_no_trend(model):
+    result = forecast([('a', 0, 40)], model=model)['a']
+    assert result['readings'] == 1
+    assert result['trend_per_hour'] is None
+    assert result['hours_to_full'] is None
+
+
+def test_full_bin_is_due_now():
+    result = forecast([('a', 0, 80), ('a', 1, 95)])['a']
+    assert result['hours_to_full'] == 0
+
+
+def test_only_the_cycle_since_emptying_is_fitted():
+    result = forecast([('a', 0, 10), ('a', 1, 50), ('a', 2, 85), ('a', 3, 5), ('a', 4, 15)])['a']
+    assert result['readings'] == 2
+    assert result['trend_per_hour'] == pytest.approx(10)
+    assert result['hours_to_full'] == pytest.approx(7.5)
+
+
+def test_bins_are_fitted_independently():
+    results = forecast([('b', 1, 50), ('a', 0, 10), ('b', 0, 60), ('a', 1, 30), ('b', 2, 40)])
+    assert results['a']['trend_per_hour'] == pytest.approx(20)
+    assert results['b']['trend_per_hour'] == pytest.approx(-10)
+
+
+def test_no_readings():
+    assert forecast([]) == {}
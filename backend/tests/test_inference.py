@@ -0,0 +1,186 @@
+import asyncio
+import threading
+import time
+import numpy as np
+import pytest
+from aiohttp import web
+from app.inference import (
+    CircuitBreaker, CircuitOpenError, InferenceTimeout, PooledInferenceClient,
+    ResilientInferenceClient, UpstreamHTTPError
+)
+
+MODEL_ID = 'bins/1'
+IMAGE = np.zeros((8, 8, 3), dtype=np.uint8)
+PREDICTION = {'predictions': [{'x': 4, 'y': 4, 'width': 2, 'height': 2, 'class': 'garbage', 'confidence': 0.9}]}
+
+
+class Upstream:
+    """Inference stand-in: answers each request with the next scripted (status, delay)"""
+
+    def __init__(self, script, default=(200, 0)):
+        self.script = list(script)
+        self.default = default
+        self.requests = 0
+        self._lock = threading.Lock()
+
+    async def handle(self, request):
+        await request.read()
+        with self._lock:
+            self.requests += 1
+            status, delay = self.script.pop(0) if self.script else self.default
+        if delay:
+            await asyncio.sleep(delay)
+        if status != 200:
+            return web.json_response({'message': 'scripted failure'}, status=status)
+        return web.json_response(PREDICTION)
+
+    def routes(self):
+        return [web.post('/bins/1', self.handle)]
+
+
+@pytest.fixture
+def upstream(stub_server):
+    clients = []
+
+    def start(script=(), default=(200, 0), **options):
+        fake = Upstream(script, default)
+        server = stub_server(fake.routes())
+        pooled = PooledInferenceClient(server.url, 'test-key', pool_size=4, timeout=5)
+        clients.append(pooled)
+        options.setdefault('timeout', 2)
+        options.setdefault('retries', 2)
+        options.setdefault('backoff', 0.01)
+        options.setdefault('breaker', CircuitBreaker(failure_threshold=5, reset_timeout=30))
+        return fake, ResilientInferenceClient(pooled, **options)
+
+    yield start
+    for pooled in clients:
+        pooled.close()
+
+
+def test_success(upstream):
+    fake, client = upstream()
+    assert client.infer(IMAGE, model_id=MODEL_ID)['predictions'] == PREDICTION['predictions']
+    assert fake.requests == 1
+
+
+def test_list_input_returns_list(upstream):
+    fake, client = upstream()
+    results = client.infer([IMAGE, IMAGE], model_id=MODEL_ID)
+    assert len(results) == 2
+    assert fake.requests == 2
+
+
+def test_transient_errors_are_retried(upstream):
+    fake, client = upstream(script=[(503, 0), (429, 0)])
+    assert client.infer(IMAGE, model_id=MODEL_ID)['predictions']
+    assert fake.requests == 3
+    assert client.breaker.state == CircuitBreaker.CLOSED
+
+
+def test_client_errors_are_not_retried(upstream):
+    fake, client = upstream(default=(400, 0))
+    with pytest.raises(UpstreamHTTPError) as error:
+        client.infer(IMAGE, model_id=MODEL_ID)
+    assert error.value.status_code == 400
+    assert fake.requests == 1
+    assert client.breaker.failures == 0
+
+
+def test_gives_up_after_retries(upstream):
+    fake, client = upstream(default=(502, 0), retries=1)
+    with pytest.raises(Exception):
+        client.infer(IMAGE, model_id=MODEL_ID)
+    assert fake.requests == 2
+
+
+def test_timeout_bounds_the_call(upstream):
+    fake, client = upstream(default=(200, 1.0), timeout=0.2, retries=0)
+    started = time.monotonic()
+    with pytest.raises(InferenceTimeout):
+        client.infer(IMAGE, model_id=MODEL_ID)
+    assert time.monotonic() - started < 0.6
+
+
+def test_breaker_opens_and_fails_fast(upstream):
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=30)
+    fake, client = upstream(default=(503, 0), retries=0, breaker=breaker)
+    for _ in range(2):
+        with pytest.raises(Exception):
+            client.infer(IMAGE, model_id=MODEL_ID)
+    assert breaker.state == CircuitBreaker.OPEN
+
+    with pytest.raises(CircuitOpenError) as error:
+        client.infer(IMAGE, model_id=MODEL_ID)
+    assert error.value.retry_after >= 1
+    assert fake.requests == 2
+
+
+def test_half_open_admits_one_probe_then_closes(upstream):
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.2)
+    fake, client = upstream(script=[(503, 0)], default=(200, 0.3), retries=0, breaker=breaker)
+    with pytest.raises(Exception):
+        client.infer(IMAGE, model_id=MODEL_ID)
+    assert breaker.state == CircuitBreaker.OPEN
+    time.sleep(0.25)
+
+    outcomes = []
+
+    def call():
+        try:
+            outcomes.append(client.infer(IMAGE, model_id=MODEL_ID))
+        except CircuitOpenError as e:
+            outcomes.append(e)
+
+    threads = [threading.Thread(target=call) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sum(isinstance(outcome, dict) for outcome in outcomes) == 1
+    assert sum(isinstance(outcome, CircuitOpenError) for outcome in outcomes) == 3
+    assert fake.requests == 2
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert client.infer(IMAGE, model_id=MODEL_ID)['predictions']
+
+
+def test_failed_probe_reopens(upstream):
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.1)
+    fake, client = upstream(default=(503, 0), retries=0, breaker=breaker)
+    with pytest.raises(Exception):
+        client.infer(IMAGE, model_id=MODEL_ID)
+    time.sleep(0.15)
+    with pytest.raises(Exception):
+        client.infer(IMAGE, model_id=MODEL_ID)
+    assert breaker.state == CircuitBreaker.OPEN
+    with pytest.raises(CircuitOpenError):
+        client.infer(IMAGE, model_id=MODEL_ID)
+    assert fake.requests == 2
+
+
+def test_hedge_answers_from_the_faster_request(upstream):
+    fake, client = upstream(script=[(200, 1.0)], default=(200, 0), hedge_after=0.1)
+    started = time.monotonic()
+    assert client.infer(IMAGE, model_id=MODEL_ID)['predictions']
+    assert time.monotonic() - started < 0.6
+    assert fake.requests == 2
+
+
+def test_timed_out_calls_do_not_queue_later_ones(upstream):
+    fake, client = upstream(script=[(200, 0.5)], timeout=0.1, retries=0, max_workers=1)
+    with pytest.raises(InferenceTimeout):
+        client.infer(IMAGE, model_id=MODEL_ID)
+    assert client.abandoned == 1
+
+    # The only worker is still held, so this fails fast rather than waiting
+    started = time.monotonic()
+    with pytest.raises(InferenceTimeout):
+        client.infer(IMAGE, model_id=MODEL_ID)
+    assert time.monotonic() - started < 0.05
+    assert fake.requests == 1
+
+    time.sleep(0.5)
+    assert client.abandoned == 0
+    client.breaker.record_success()
+    assert client.infer(IMAGE, model_id=MODEL_ID)['predictions']
@@ -0,0 +1,47 @@
+import io
+import os
+import pytest
+from app import multipart
+
+BOUNDARY = 'test-boundary'
+
+
+def body(filename, data=b'\xff\xd8image', field='images'):
+    return io.BytesIO(
+        f"--{BOUNDARY}\r\n"
+        f'Content-Disposition: form-data; name="{field}"; filename="{filename}"\r\n'
+        f"Content-Type: application/octet-stream\r\n\r\n".encode()
+        + data + f"\r\n--{BOUNDARY}--\r\n".encode()
+    )
+
+
+def upload_of(tmp_path, filename, **options):
+    uploads = multipart.stream_uploads(body(filename, field=options.get('field', 'images')),
+                                       BOUNDARY, {}, folder=str(tmp_path), **options)
+    upload = next(uploads)
+    assert os.path.exists(upload.path)
+    return upload
+
+
+@pytest.mark.parametrize('filename, extension', [
+    ('bin.JPG', 'jpg'),
+    ('bin.png', 'png'),
+    ('bin', 'jpg'),
+    ('bin.php', 'jpg'),
+    ('bin.jpg/../../../etc/passwd', 'jpg'),
+    ('x.png/../../evil', 'jpg'),
+    ('..\\..\\bin.png', 'png'),
+    ('bin.pég', 'jpg'),
+])
+def test_saved_name_is_random_with_an_allowed_extension(tmp_path, filename, extension):
+    upload = upload_of(tmp_path, filename)
+    assert os.path.dirname(upload.path) == str(tmp_path)
+    stem, saved_extension = os.path.splitext(upload.name)
+    assert saved_extension == f".{extension}"
+    assert len(stem) == 32 and stem.isalnum()
+
+
+def test_video_extensions(tmp_path):
+    options = dict(field='video', extensions=multipart.VIDEO_EXTENSIONS, default_extension='mp4')
+    assert upload_of(tmp_path, 'clip.MOV', **options).name.endswith('.mov')
+    assert upload_of(tmp_path, 'clip.jpg', **options).name.endswith('.mp4')
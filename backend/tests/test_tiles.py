@@ -0,0 +1,61 @@
+import os
+import pytest
+from app import db, tiles
+from app.models import Reports
+from config import Config
+
+LAT, LNG = -1.2921, 36.8219
+
+
+@pytest.fixture
+def tile_cache(flask_app, tmp_path, monkeypatch):
+    monkeypatch.setattr(tiles, 'TILES_FOLDER', str(tmp_path))
+    monkeypatch.setattr(tiles, '_cache_bytes', None)
+    with flask_app.app_context():
+        report = Reports(location='Test', priority='High', status='Pending', ai_confidence=80,
+                         fill_level=75, latitude=LAT, longitude=LNG)
+        db.session.add(report)
+        db.session.commit()
+        yield
+        db.session.delete(report)
+        db.session.commit()
+
+
+def tile_at(zoom):
+    fx, fy = tiles.tile_coords([LAT], [LNG], zoom)
+    return zoom, int(fx[0]), int(fy[0])
+
+
+def on_disk():
+    return sum(os.path.getsize(path) for path in tiles._tile_files())
+
+
+def test_counter_tracks_builds_rebuilds_and_invalidation(tile_cache, monkeypatch):
+    for zoom in range(4):
+        path, payload = tiles.get_or_build(*tile_at(zoom))
+        assert payload is None and os.path.exists(path)
+    assert tiles._cache_bytes == on_disk() > 0
+
+    # A stale tile is rewritten in place, not counted twice
+    monkeypatch.setattr(Config, 'TILE_MAX_AGE', 0)
+    tiles.get_or_build(*tile_at(0))
+    assert tiles._cache_bytes == on_disk()
+
+    assert tiles.invalidate_point(LAT, LNG) == 4
+    assert tiles._cache_bytes == on_disk() == 0
+
+
+def test_empty_tiles_are_not_written(tile_cache):
+    zoom, x, y = tile_at(10)
+    path, payload = tiles.get_or_build(zoom, x + 5, y + 5)
+    assert path is None
+    assert payload['count'] == 0 and payload['cells'] == []
+    assert list(tiles._tile_files()) == []
+
+
+def test_cache_is_bounded(tile_cache, monkeypatch):
+    monkeypatch.setattr(Config, 'TILE_CACHE_MAX_BYTES', 1000)
+    for zoom in range(tiles.MAX_ZOOM + 1):
+        tiles.get_or_build(*tile_at(zoom))
+    assert on_disk() <= 1000
+    assert tiles._cache_bytes == on_disk()
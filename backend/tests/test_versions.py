@@ -0,0 +1,68 @@
+import pytest
+import sqlalchemy as sa
+import sqlalchemy.orm as so
+from app import db
+from app.models import Cameras, DataVersions
+from app.versions import cache
+
+
+@pytest.fixture
+def other_process(flask_app):
+    """A session on its own engine, standing in for another worker or CLI process"""
+    engine = sa.create_engine(flask_app.config['SQLALCHEMY_DATABASE_URI'])
+    with so.Session(engine) as session:
+        yield session
+    engine.dispose()
+
+
+@pytest.fixture
+def empty_cameras(flask_app):
+    with flask_app.app_context():
+        db.session.execute(db.delete(Cameras))
+        db.session.commit()
+    cache.clear()
+    yield
+    with flask_app.app_context():
+        db.session.execute(db.delete(Cameras))
+        db.session.commit()
+
+
+def camera_version(flask_app):
+    with flask_app.app_context():
+        return db.session.get(DataVersions, 'cameras').version
+
+
+def test_commit_bumps_version_in_the_same_transaction(flask_app, empty_cameras):
+    before = camera_version(flask_app)
+    with flask_app.app_context():
+        db.session.add(Cameras(name='a', location=1, status=1, ipaddress='127.0.0.1'))
+        db.session.commit()
+    assert camera_version(flask_app) == before + 1
+
+    with flask_app.app_context():
+        db.session.add(Cameras(name='b', location=1, status=1, ipaddress='127.0.0.1'))
+        db.session.flush()
+        db.session.rollback()
+    assert camera_version(flask_app) == before + 1
+
+
+def test_etag_changes_on_a_write_from_another_process(client, empty_cameras, other_process):
+    first = client.get('/api/cameras')
+    etag = first.headers['ETag']
+    assert client.get('/api/cameras', headers={'If-None-Match': etag}).status_code == 304
+
+    other_process.add(Cameras(name='elsewhere', location=1, status=1, ipaddress='127.0.0.1'))
+    other_process.commit()
+
+    response = client.get('/api/cameras', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
+    assert b'elsewhere' in response.get_data()
+
+
+def test_bulk_statements_bump_versions(flask_app, client, empty_cameras):
+    etag = client.get('/api/cameras').headers['ETag']
+    with flask_app.app_context():
+        db.session.execute(db.insert(Cameras).values(name='bulk', location=1, status=1, ipaddress='127.0.0.1'))
+        db.session.commit()
+    assert client.get('/api/cameras', headers={'If-None-Match': etag}).status_code == 200
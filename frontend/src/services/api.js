@@ -284,6 +284,15 @@ export const getReportImage = async (reportId) => {
     return request(`/reports/${reportId}/image`, { method: 'GET' });
 };
 
+export const getReportImageUrl = (reportId, size = 'thumb') => {
+    return `${config.baseURL}/reports/${reportId}/image/${size}`;
+};
+
+// Heatmap tile template for the map layer ({z}/{x}/{y} filled in by the map library)
+export const getHeatmapTileUrl = (z = '{z}', x = '{x}', y = '{y}') => {
+    return `${config.baseURL}/tiles/${z}/${x}/${y}`;
+};
+
 // ===========================
 // STATISTICS
 // ===========================
@@ -471,6 +480,8 @@ const apiService = {
     updateReport,
     deleteReport,
     getReportImage,
+    getReportImageUrl,
+    getHeatmapTileUrl,
     
     // Statistics
     getStatistics,